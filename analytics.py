@@ -0,0 +1,198 @@
+"""
+Seller analytics rollups for VisionCraft
+Keeps ArtworkDailyStat current from likes and orders, and reads dashboard numbers from it
+"""
+import math
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from sqlalchemy import func
+from models import db, Artwork, ArtworkDailyStat, Like, Order, OrderItem
+
+# Columns owned by this module; the AR columns are rebuilt from the event spool instead
+ROLLUP_COLUMNS = ('views', 'likes', 'units_sold', 'revenue')
+
+# Series returned by the timeseries API
+SERIES_COLUMNS = ('views', 'likes', 'ar_sessions', 'units_sold', 'revenue')
+BUCKETS = ('day', 'week', 'month')
+MAX_RANGE_DAYS = 3 * 366
+DEFAULT_POINTS = 60
+MAX_POINTS = 200
+
+
+def utc_today():
+    return datetime.utcnow().date()
+
+
+# ==================== INCREMENTAL UPDATES ====================
+# Each runs in the caller's transaction, so the rollup commits or rolls back with its source row
+
+def record_like(artwork_id, delta):
+    """Count a like (+1) or unlike (-1) on today's row"""
+    ArtworkDailyStat.add_counts({(artwork_id, utc_today()): {'likes': delta}})
+
+
+def record_order(order, sign=1):
+    """Add an order's lines to its order day; sign=-1 takes them back out when cancelled"""
+    day = (order.created_at or datetime.utcnow()).date()
+    counts = defaultdict(lambda: {'units_sold': 0, 'revenue': 0.0})
+    for item in order.items:
+        counts[(item.artwork_id, day)]['units_sold'] += sign * item.quantity
+        counts[(item.artwork_id, day)]['revenue'] += sign * item.subtotal
+    ArtworkDailyStat.add_counts(counts)
+
+
+# ==================== DASHBOARD READS ====================
+
+def seller_totals(seller_id):
+    """Lifetime totals for a seller from one indexed range read"""
+    views, likes, ar_sessions, revenue = db.session.query(
+        func.sum(ArtworkDailyStat.views),
+        func.sum(ArtworkDailyStat.likes),
+        func.sum(ArtworkDailyStat.ar_sessions),
+        func.sum(ArtworkDailyStat.revenue)
+    ).filter(ArtworkDailyStat.seller_id == seller_id).one()
+
+    return {
+        'views': views or 0,
+        'likes': likes or 0,
+        'ar_sessions': ar_sessions or 0,
+        'revenue': revenue or 0
+    }
+
+
+def top_artworks(seller_id, limit=5):
+    """Seller's active artworks with the most views, as (artwork, stats) pairs"""
+    totals = db.session.query(
+        ArtworkDailyStat.artwork_id,
+        func.sum(ArtworkDailyStat.views).label('views'),
+        func.sum(ArtworkDailyStat.likes).label('likes'),
+        func.sum(ArtworkDailyStat.ar_sessions).label('ar_sessions')
+    ).filter(
+        ArtworkDailyStat.seller_id == seller_id
+    ).group_by(ArtworkDailyStat.artwork_id).subquery()
+
+    rows = db.session.query(Artwork, totals.c.views, totals.c.likes, totals.c.ar_sessions).join(
+        totals, totals.c.artwork_id == Artwork.id
+    ).filter(
+        Artwork.is_active == True
+    ).order_by(totals.c.views.desc(), Artwork.id).limit(limit)
+
+    return [(artwork, {'views': views, 'likes': likes, 'ar_sessions': ar_sessions})
+            for artwork, views, likes, ar_sessions in rows]
+
+
+def bucket_start(day, bucket):
+    """First day of the bucket containing `day` (weeks start on Monday)"""
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _bucket_starts(start, end, bucket):
+    starts = []
+    current = bucket_start(start, bucket)
+    while current <= end:
+        starts.append(current)
+        if bucket == 'month':
+            current = (current + timedelta(days=32)).replace(day=1)
+        else:
+            current += timedelta(days=7 if bucket == 'week' else 1)
+    return starts
+
+
+def timeseries(seller_id, start, end, bucket='day', max_points=DEFAULT_POINTS):
+    """
+    Seller totals per bucket between start and end (inclusive), zero-filled.
+    When there are more buckets than max_points, consecutive buckets are summed
+    so the chart always gets at most max_points points.
+    """
+    by_day = {}
+    rows = db.session.query(
+        ArtworkDailyStat.day, *[func.sum(getattr(ArtworkDailyStat, name)) for name in SERIES_COLUMNS]
+    ).filter(
+        ArtworkDailyStat.seller_id == seller_id,
+        ArtworkDailyStat.day >= start,
+        ArtworkDailyStat.day <= end
+    ).group_by(ArtworkDailyStat.day)
+    for day, *values in rows:
+        by_day[_as_date(day)] = values
+
+    starts = _bucket_starts(start, end, bucket)
+    index = {bucket_start_day: i for i, bucket_start_day in enumerate(starts)}
+    sums = [[0] * len(SERIES_COLUMNS) for _ in starts]
+    for day, values in by_day.items():
+        row = sums[index[bucket_start(day, bucket)]]
+        for i, value in enumerate(values):
+            row[i] += value or 0
+
+    # Downsample by merging runs of `step` buckets into one point
+    step = max(1, math.ceil(len(starts) / max_points))
+    labels, series = [], {name: [] for name in SERIES_COLUMNS}
+    for i in range(0, len(starts), step):
+        labels.append(starts[i].isoformat())
+        group = sums[i:i + step]
+        for j, name in enumerate(SERIES_COLUMNS):
+            series[name].append(sum(row[j] for row in group))
+    series['revenue'] = [round(value, 2) for value in series['revenue']]
+
+    return {
+        'bucket': bucket,
+        'buckets_per_point': step,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'labels': labels,
+        'series': series,
+    }
+
+
+def category_totals(seller_id, start, end):
+    """Views per artwork category for the same range, largest first"""
+    rows = db.session.query(
+        Artwork.category, func.sum(ArtworkDailyStat.views)
+    ).join(Artwork, Artwork.id == ArtworkDailyStat.artwork_id).filter(
+        ArtworkDailyStat.seller_id == seller_id,
+        ArtworkDailyStat.day >= start,
+        ArtworkDailyStat.day <= end
+    ).group_by(Artwork.category).order_by(func.sum(ArtworkDailyStat.views).desc())
+    return [{'category': category, 'views': views or 0} for category, views in rows]
+
+
+# ==================== BACKFILL ====================
+
+def _as_date(value):
+    # func.date() returns a string on SQLite and a date on PostgreSQL
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def backfill():
+    """
+    Rebuild views/likes/units/revenue from the source tables.
+    Likes and sales land on the day they happened. Views only exist as a lifetime
+    total, so each artwork's total is placed on its creation day.
+    """
+    ArtworkDailyStat.query.update({getattr(ArtworkDailyStat, name): 0 for name in ROLLUP_COLUMNS},
+                                  synchronize_session=False)
+
+    counts = defaultdict(dict)
+
+    for artwork_id, created_at, views in db.session.query(Artwork.id, Artwork.created_at, Artwork.views):
+        if views:
+            counts[(artwork_id, (created_at or datetime.utcnow()).date())]['views'] = views
+
+    like_day = func.date(Like.created_at)
+    for artwork_id, day, likes in db.session.query(
+        Like.artwork_id, like_day, func.count(Like.id)
+    ).group_by(Like.artwork_id, like_day):
+        counts[(artwork_id, _as_date(day))]['likes'] = likes
+
+    order_day = func.date(Order.created_at)
+    for artwork_id, day, units, revenue in db.session.query(
+        OrderItem.artwork_id, order_day, func.sum(OrderItem.quantity), func.sum(OrderItem.subtotal)
+    ).join(Order).filter(Order.status != 'cancelled').group_by(OrderItem.artwork_id, order_day):
+        counts[(artwork_id, _as_date(day))].update(units_sold=units, revenue=revenue)
+
+    ArtworkDailyStat.add_counts(counts)
+    db.session.commit()
+    return len(counts)
@@ -2,16 +2,39 @@
 VisionCraft AR Marketplace - Complete E-commerce Application
 Full-featured application with authentication, shopping cart, orders, and more
 """
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify, flash
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify, flash, Response, stream_with_context, get_template_attribute, abort
+from markupsafe import Markup
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from werkzeug.utils import secure_filename
 from models import db, User, Artwork, CartItem, Order, OrderItem, Like, Event, EventRSVP
+from pagination import paginate, PAGE_SIZE
+from search_index import search_artworks, index_artwork, remove_artwork, create_index, rebuild_index
+from suggest_index import suggestions
+from view_counter import view_counter
+from ar_events import ar_event_sink, parse_beacon, rebuild_rollups, MAX_BEACON_BYTES
+from query_profiler import query_profiler, query_budget
+from cache import cache, artwork_tag, category_tag, seller_tag
+from page_cache import cached_page
+import page_cache
+import analytics
+import metrics
+import structured_logging
+import session_state
+import exports
+import inventory
+from images import picture_sources, generate_missing, queue_artwork_variants, queue_avatar_variants
+from jobs import run_worker_pool, work
+from model_assets import queue_model_variants, model_sources
+from gltf import check_file as check_gltf, GltfError
+import asset_store
+import static_assets
+import static_pages
+import chunked_upload
 import os
-from datetime import datetime, timedelta
+import click
+from datetime import date, datetime, timedelta
 import secrets
 from functools import wraps
-import logging
-from logging.handlers import RotatingFileHandler
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -21,6 +44,7 @@ app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', secrets.token_hex(32))
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///visioncraft.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['CHUNKED_UPLOAD_MAX_SIZE'] = 200 * 1024 * 1024  # 3D models, sent in chunks under MAX_CONTENT_LENGTH
 
 # Session security
 app.config['SESSION_COOKIE_HTTPONLY'] = True
@@ -31,6 +55,17 @@ if not app.debug:
 
 # Initialize extensions
 db.init_app(app)
+view_counter.init_app(app)
+ar_event_sink.init_app(app)
+static_assets.init_app(app)
+query_profiler.init_app(app)
+metrics.init_app(app)
+session_state.init_app(app)
+cache.init_app(app)
+page_cache.init_app(app)
+static_pages.init_app(app)
+app.add_template_global(picture_sources)
+app.add_template_global(model_sources)
 
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -44,30 +79,25 @@ MODELS_DIR = os.path.join(STATIC_DIR, 'models')
 IMAGES_DIR = os.path.join(STATIC_DIR, 'images')
 AVATARS_DIR = os.path.join(STATIC_DIR, 'avatars')
 
+# Uploads live in the content-addressed store (asset_store.py), served from /media/
+app.config.setdefault('ASSET_STORE_DIR', os.path.join(BASE_DIR, 'media'))
+ASSET_MAX_AGE = 365 * 24 * 60 * 60
+
 ALLOWED_MODEL_EXT = {'.glb', '.gltf'}
 ALLOWED_IMAGE_EXT = {'.png', '.jpg', '.jpeg', '.gif', '.webp'}
 
 # Ensure directories exist
-for directory in [MODELS_DIR, IMAGES_DIR, AVATARS_DIR]:
+for directory in [MODELS_DIR, IMAGES_DIR, AVATARS_DIR, app.config['ASSET_STORE_DIR']]:
     os.makedirs(directory, exist_ok=True)
 
-# Configure logging
-if not app.debug:
-    if not os.path.exists('logs'):
-        os.mkdir('logs')
-    file_handler = RotatingFileHandler('logs/visioncraft.log', maxBytes=10240, backupCount=10)
-    file_handler.setFormatter(logging.Formatter(
-        '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
-    ))
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.setLevel(logging.INFO)
-    app.logger.info('VisionCraft startup')
+# Configure logging: JSON lines via a background queue (see structured_logging.py)
+structured_logging.init_app(app)
+app.logger.info('VisionCraft startup')
 
 # Flask-Login user loader
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return session_state.load_user(user_id)
 
 # Role-based access control decorators
 def customer_required(f):
@@ -96,12 +126,12 @@ def seller_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-# Context processor to inject cart count and user info
+# Context processor to inject cart count and user info (count cached in the session, see session_state.py)
 @app.context_processor
 def inject_user_data():
     cart_count = 0
     if current_user.is_authenticated:
-        cart_count = current_user.get_cart_count()
+        cart_count = session_state.cart_count(current_user)
     return dict(cart_count=cart_count)
 
 # ==================== AUTHENTICATION ROUTES ====================
@@ -210,7 +240,74 @@ def landing():
         return redirect(url_for('home'))
     return render_template('landing.html')
 
+def catalog_query(category='all', state=''):
+    """Active artworks filtered by category and state (unsorted)"""
+    query = Artwork.query.filter_by(is_active=True)
+    
+    if category != 'all':
+        query = query.filter_by(category=category)
+    
+    if state:
+        query = query.filter_by(state=state)
+    
+    return query
+
+def gallery_card(art):
+    """Plain-data gallery card, safe to keep in the cache"""
+    card = art.to_dict()
+    card['image_variants'] = art.image_variants
+    return card
+
+def catalog_page(category='all', state='', sort_by='default', cursor=None, limit=PAGE_SIZE):
+    """
+    One page of the catalog as gallery cards, read through the cache.
+    Returns (cards, next_cursor); raises ValueError for a bad cursor.
+    """
+    def compute():
+        artworks, next_cursor = paginate(catalog_query(category, state), sort_by, cursor, limit)
+        tags = {artwork_tag(art.id) for art in artworks} | {seller_tag(art.user_id) for art in artworks}
+        return {'artworks': [gallery_card(art) for art in artworks], 'next_cursor': next_cursor}, tags
+    
+    params = {'category': category, 'state': state, 'sort': sort_by, 'cursor': cursor, 'limit': limit}
+    page = cache.fetch('catalog', params, compute, tags=[category_tag(category)])
+    return page['artworks'], page['next_cursor']
+
+def gallery_fragments(category='all', state='', sort_by='default'):
+    """
+    First catalog page as rendered cards, read through the cache: {'cards': [[id, html,
+    liked_html]], 'next_cursor'}. Both like states are rendered once, so a logged-in
+    page only picks one per card instead of re-rendering the grid.
+    """
+    def compute():
+        artworks, next_cursor = catalog_page(category, state, sort_by)
+        art_card = get_template_attribute('_art_card.html', 'art_card')
+        cards = [[art['id'], str(art_card(art)), str(art_card(art, liked=True))] for art in artworks]
+        return {'cards': cards, 'next_cursor': next_cursor}, []
+    
+    return cache.fetch('gallery', {'category': category, 'state': state, 'sort': sort_by}, compute)
+
+def related_artworks(art):
+    """Gallery cards of up to 4 other active artworks in the same category"""
+    def compute():
+        related = Artwork.query.filter(
+            Artwork.category == art.category,
+            Artwork.id != art.id,
+            Artwork.is_active == True
+        ).limit(4).all()
+        return [gallery_card(other) for other in related], [artwork_tag(other.id) for other in related]
+    
+    return cache.fetch('related', {'category': art.category, 'art_id': art.id}, compute,
+                       tags=[category_tag(art.category)])
+
+def invalidate_catalog(artwork, *old_categories):
+    """Drop cached catalog data this artwork appears in or could move into (after commit)"""
+    categories = {'all', artwork.category, *old_categories}
+    cache.invalidate(artwork_tag(artwork.id), seller_tag(artwork.user_id),
+                     *(category_tag(category) for category in categories))
+
 @app.route('/home')
+@query_budget(6)
+@cached_page()
 def home():
     """Customer home page with artwork gallery"""
     # Redirect sellers to their dashboard
@@ -222,61 +319,73 @@ def home():
     sort_by = request.args.get('sort', 'default')
     state = request.args.get('state', '')
     
-    # Base query - only active artworks
-    query = Artwork.query.filter_by(is_active=True)
-    
-    # Apply filters
-    if category != 'all':
-        query = query.filter_by(category=category)
+    # First page only - further pages stream in from /api/artworks
+    gallery = gallery_fragments(category, state, sort_by)
     
-    if state:
-        query = query.filter_by(state=state)
+    # Get user's liked artworks (like counts are stored on each artwork)
+    liked_artwork_ids = set()
+    if current_user.is_authenticated:
+        liked_artwork_ids = Like.get_liked_ids(current_user.id, [art_id for art_id, _, _ in gallery['cards']])
+    cards = [Markup(liked_html if art_id in liked_artwork_ids else html)
+             for art_id, html, liked_html in gallery['cards']]
     
-    # Apply sorting
-    if sort_by == 'price-low':
-        query = query.order_by(Artwork.price.asc())
-    elif sort_by == 'price-high':
-        query = query.order_by(Artwork.price.desc())
-    elif sort_by == 'rating':
-        query = query.order_by(Artwork.rating.desc())
-    elif sort_by == 'likes':
-        # Sort by likes count (this requires a subquery or join)
-        from sqlalchemy import func
-        query = query.outerjoin(Like).group_by(Artwork.id).order_by(func.count(Like.id).desc())
-    else:
-        query = query.order_by(Artwork.created_at.desc())
+    return render_template('home.html', cards=cards, next_cursor=gallery['next_cursor'],
+                          category=category, sort_by=sort_by, state=state)
+
+@app.route('/api/artworks')
+@query_budget(5)
+def api_artworks():
+    """One page of the catalog as JSON, for infinite scroll"""
+    category = request.args.get('category', 'all')
+    sort_by = request.args.get('sort', 'default')
+    state = request.args.get('state', '')
+    limit = request.args.get('limit', PAGE_SIZE, type=int)
     
-    artworks = query.all()
+    try:
+        artworks, next_cursor = catalog_page(category, state, sort_by, request.args.get('cursor'), limit)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     
-    # Get user's liked artworks
-    liked_artwork_ids = []
+    liked_artwork_ids = set()
     if current_user.is_authenticated:
-        liked_artwork_ids = [like.artwork_id for like in current_user.likes.all()]
-    
-    return render_template('home.html', artworks=artworks, liked_artwork_ids=liked_artwork_ids)
+        liked_artwork_ids = Like.get_liked_ids(current_user.id, [art['id'] for art in artworks])
+    
+    items = []
+    for item in artworks:
+        image_variants = item.pop('image_variants')
+        item['url'] = url_for('art_detail', art_id=item['id'])
+        item['ar_url'] = url_for('view_in_ar', art_id=item['id'])
+        item['liked'] = item['id'] in liked_artwork_ids
+        item['image_sources'] = [{'type': mime, 'srcset': srcset}
+                                 for mime, srcset in picture_sources(image_variants)]
+        items.append(item)
+    
+    return jsonify({'success': True, 'artworks': items, 'next_cursor': next_cursor})
 
 @app.route('/art/<int:art_id>')
+@query_budget(8)
+@cached_page(on_hit=lambda art_id: view_counter.record(art_id))
 def art_detail(art_id):
     """Artwork detail page"""
+    cache.depends_on(artwork_tag(art_id))
     art = Artwork.query.get_or_404(art_id)
     
-    # Increment view count
-    art.views += 1
-    db.session.commit()
+    # Count the view in memory; it reaches Artwork.views with the next batched flush
+    view_counter.record(art_id)
     
     # Check if user has liked this artwork
     is_liked = False
     if current_user.is_authenticated:
         is_liked = Like.query.filter_by(user_id=current_user.id, artwork_id=art_id).first() is not None
     
-    # Get related artworks (same category)
-    related_artworks = Artwork.query.filter(
-        Artwork.category == art.category,
-        Artwork.id != art_id,
-        Artwork.is_active == True
-    ).limit(4).all()
+    # Related grid (same category), rendered once and shared by every visitor
+    def render_related():
+        related_card = get_template_attribute('_art_card.html', 'related_card')
+        return ''.join(str(related_card(card)) for card in related_artworks(art)), []
+    
+    related_grid = cache.fetch('related-grid', {'category': art.category, 'art_id': art_id}, render_related)
     
-    return render_template('art_detail.html', art=art, is_liked=is_liked, related_artworks=related_artworks)
+    return render_template('art_detail.html', art=art, is_liked=is_liked, related_grid=Markup(related_grid))
 
 @app.route('/ar/<int:art_id>')
 def view_in_ar(art_id):
@@ -284,23 +393,53 @@ def view_in_ar(art_id):
     art = Artwork.query.get_or_404(art_id)
     return render_template('ar_viewer.html', art=art)
 
+@app.route('/api/ar-events', methods=['POST'])
+def ingest_ar_events():
+    """Batched AR engagement beacons (session started / placed / snapshot)"""
+    if (request.content_length or 0) > MAX_BEACON_BYTES:
+        return jsonify({'success': False, 'error': 'Payload too large'}), 413
+    
+    # sendBeacon may post JSON as text/plain, so don't insist on the mimetype
+    try:
+        events = parse_beacon(request.get_json(force=True, silent=True))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    # Buffered only - the database sees these on the sink's next flush
+    ar_event_sink.record(events)
+    return '', 204
+
 @app.route('/search')
+@query_budget(6)
 def search():
     """Search artworks"""
     query_text = request.args.get('q', '').lower().strip()
     
     search_results = []
+    next_cursor = None
     if query_text:
-        search_results = Artwork.query.filter(
-            Artwork.is_active == True
-        ).filter(
-            (Artwork.title.ilike(f'%{query_text}%')) |
-            (Artwork.category.ilike(f'%{query_text}%')) |
-            (Artwork.artist_name.ilike(f'%{query_text}%')) |
-            (Artwork.description.ilike(f'%{query_text}%'))
-        ).all()
+        try:
+            search_results, next_cursor = search_artworks(query_text, request.args.get('cursor'))
+        except ValueError:
+            search_results, next_cursor = search_artworks(query_text)
     
-    return render_template('search.html', query=query_text, search_results=search_results)
+    return render_template('search.html', query=query_text, search_results=search_results,
+                          next_cursor=next_cursor)
+
+@app.route('/api/search/suggest')
+@query_budget(2)
+def search_suggest():
+    """Typeahead suggestions for titles, artists and categories"""
+    prefix = request.args.get('q', '')[:100]
+    
+    suggestions.ensure_fresh()
+    response = jsonify({'q': prefix, 'suggestions': suggestions.suggest(prefix)})
+    
+    # Same answer for every user, so browsers and proxies may reuse it briefly
+    response.cache_control.public = True
+    response.cache_control.max_age = 60
+    response.add_etag()
+    return response.make_conditional(request)
 
 # ==================== CART ROUTES ====================
 
@@ -339,13 +478,14 @@ def add_to_cart(art_id):
         # Create new cart item
         cart_item = CartItem(user_id=current_user.id, artwork_id=art_id, quantity=1)
         db.session.add(cart_item)
+        artwork.adjust_counter('carts_count', 1)
     
     db.session.commit()
     
     return jsonify({
         'success': True,
         'message': f'{artwork.title} added to cart!',
-        'cart_count': current_user.get_cart_count()
+        'cart_count': session_state.cart_changed(current_user)
     })
 
 @app.route('/api/cart/update/<int:cart_item_id>', methods=['POST'])
@@ -362,13 +502,14 @@ def update_cart_item(cart_item_id):
     quantity = request.json.get('quantity', 1)
     
     if quantity <= 0:
+        cart_item.artwork.adjust_counter('carts_count', -1)
         db.session.delete(cart_item)
     else:
         cart_item.quantity = quantity
     
     db.session.commit()
     
-    return jsonify({'success': True, 'cart_count': current_user.get_cart_count()})
+    return jsonify({'success': True, 'cart_count': session_state.cart_changed(current_user)})
 
 @app.route('/api/cart/remove/<int:cart_item_id>', methods=['DELETE'])
 @login_required
@@ -381,10 +522,11 @@ def remove_from_cart(cart_item_id):
     if cart_item.user_id != current_user.id:
         return jsonify({'success': False, 'error': 'Unauthorized'}), 403
     
+    cart_item.artwork.adjust_counter('carts_count', -1)
     db.session.delete(cart_item)
     db.session.commit()
     
-    return jsonify({'success': True, 'cart_count': current_user.get_cart_count()})
+    return jsonify({'success': True, 'cart_count': session_state.cart_changed(current_user)})
 
 # ==================== CHECKOUT & ORDER ROUTES ====================
 
@@ -435,15 +577,9 @@ def process_checkout():
         return redirect(url_for('checkout'))
     
     try:
-        # Validate stock availability BEFORE creating order
-        for cart_item in cart_items:
-            if not cart_item.artwork.is_active:
-                flash(f'{cart_item.artwork.title} is no longer available!', 'error')
-                return redirect(url_for('cart'))
-            
-            if cart_item.artwork.stock_quantity < cart_item.quantity:
-                flash(f'{cart_item.artwork.title} only has {cart_item.artwork.stock_quantity} left in stock!', 'error')
-                return redirect(url_for('cart'))
+        # Take the stock first, one conditional UPDATE per artwork; raises OutOfStock
+        # (a ValueError) and is rolled back below if any line can't be filled
+        inventory.reserve((cart_item.artwork, cart_item.quantity) for cart_item in cart_items)
         
         # Calculate totals
         subtotal = sum(item.get_subtotal() for item in cart_items)
@@ -475,7 +611,7 @@ def process_checkout():
         db.session.add(order)
         db.session.flush()  # Get order ID
         
-        # Create order items and update stock
+        # Create order items
         for cart_item in cart_items:
             order_item = OrderItem(
                 order_id=order.id,
@@ -486,32 +622,34 @@ def process_checkout():
                 subtotal=cart_item.get_subtotal()
             )
             db.session.add(order_item)
-            
-            # Update artwork stock safely
-            artwork = cart_item.artwork
-            new_stock = artwork.stock_quantity - cart_item.quantity
-            if new_stock < 0:
-                raise ValueError(f'{artwork.title} is out of stock!')
-            artwork.stock_quantity = new_stock
+            cart_item.artwork.adjust_counter('orders_count', 1)
         
         # Clear cart
+        purchased_tags = [artwork_tag(cart_item.artwork_id) for cart_item in cart_items]
         for cart_item in cart_items:
+            cart_item.artwork.adjust_counter('carts_count', -1)
             db.session.delete(cart_item)
         
+        analytics.record_order(order)
         db.session.commit()
+        session_state.invalidate_cart()
+        cache.invalidate(*purchased_tags)
         
-        app.logger.info(f'Order {order_number} created successfully for user {current_user.username}')
+        metrics.CHECKOUTS.inc(result='success')
+        app.logger.info('Order %s created', order_number, extra={'event': 'order_created', 'order_id': order.id})
         flash('Order placed successfully!', 'success')
         return redirect(url_for('order_confirmation', order_id=order.id))
         
     except ValueError as e:
         db.session.rollback()
-        app.logger.warning(f'Checkout failed for user {current_user.username}: {str(e)}')
+        metrics.CHECKOUTS.inc(result='rejected')
+        app.logger.warning('Checkout failed: %s', e, extra={'event': 'checkout_rejected'})
         flash(str(e), 'error')
         return redirect(url_for('cart'))
-    except Exception as e:
+    except Exception:
         db.session.rollback()
-        app.logger.error(f'Checkout error for user {current_user.username}: {str(e)}')
+        metrics.CHECKOUTS.inc(result='error')
+        app.logger.exception('Checkout error', extra={'event': 'checkout_error'})
         flash('An error occurred while processing your order. Please try again.', 'error')
         return redirect(url_for('cart'))
     return redirect(url_for('order_confirmation', order_id=order.id))
@@ -557,17 +695,21 @@ def cancel_order(order_id):
         order.status = 'cancelled'
         
         # Restore stock for each item
-        for item in order.items:
-            if item.artwork:
-                item.artwork.stock_quantity += item.quantity
+        restocked = [(item.artwork, item.quantity) for item in order.items if item.artwork]
+        inventory.release(restocked)
+        for artwork, _ in restocked:
+            artwork.adjust_counter('orders_count', -1)
+        restocked_tags = [artwork_tag(artwork.id) for artwork, _ in restocked]
+        analytics.record_order(order, sign=-1)
         
         db.session.commit()
-        app.logger.info(f'Order {order.order_number} cancelled by user {current_user.username}')
+        cache.invalidate(*restocked_tags)
+        app.logger.info('Order %s cancelled', order.order_number, extra={'event': 'order_cancelled', 'order_id': order_id})
         
         return jsonify({'success': True, 'message': 'Order cancelled successfully'})
-    except Exception as e:
+    except Exception:
         db.session.rollback()
-        app.logger.error(f'Error cancelling order {order_id}: {str(e)}')
+        app.logger.exception('Error cancelling order %s', order_id, extra={'event': 'order_cancel_error', 'order_id': order_id})
         return jsonify({'success': False, 'error': 'Failed to cancel order'}), 500
 
 # ==================== LIKES/FAVORITES ROUTES ====================
@@ -590,13 +732,19 @@ def toggle_like(art_id):
     if like:
         # Unlike
         db.session.delete(like)
+        artwork.adjust_counter('likes_count', -1)
+        analytics.record_like(art_id, -1)
         db.session.commit()
+        cache.invalidate(artwork_tag(art_id))  # cached cards show the like count
         return jsonify({'success': True, 'liked': False, 'likes_count': artwork.get_likes_count()})
     else:
         # Like
         like = Like(user_id=current_user.id, artwork_id=art_id)
         db.session.add(like)
+        artwork.adjust_counter('likes_count', 1)
+        analytics.record_like(art_id, 1)
         db.session.commit()
+        cache.invalidate(artwork_tag(art_id))  # cached cards show the like count
         return jsonify({'success': True, 'liked': True, 'likes_count': artwork.get_likes_count()})
 
 # TO BE CONTINUED IN NEXT PART...
@@ -648,13 +796,13 @@ def update_avatar():
         ext = os.path.splitext(filename)[1].lower()
         
         if ext in ALLOWED_IMAGE_EXT:
-            # Create unique filename
-            avatar_filename = f"avatar_{current_user.id}_{secrets.token_hex(8)}{ext}"
-            dest = os.path.join(AVATARS_DIR, avatar_filename)
-            avatar_file.save(dest)
+            # Stored by content hash; the old avatar loses its reference
+            avatar_url = asset_store.save_upload(avatar_file.stream, ext)
+            asset_store.release(current_user.avatar)
             
-            # Update profile
-            current_user.avatar = f"/static/avatars/{avatar_filename}"
+            # Update profile; resized copies are added in the background
+            current_user.avatar = avatar_url
+            queue_avatar_variants(current_user)
             db.session.commit()
             
             return jsonify({'success': True, 'avatar_url': current_user.avatar})
@@ -664,34 +812,124 @@ def update_avatar():
 # ==================== SELLER/UPLOAD ROUTES ====================
 
 @app.route('/seller/analytics')
+@query_budget(8)
 @login_required
 @seller_required
 def seller_analytics():
     """Seller Analytics Dashboard"""
     
-    # Get seller's artworks
-    artworks = current_user.artworks.filter_by(is_active=True).all()
+    # All metrics come from the daily rollup, not the raw like/order tables
+    artwork_count = current_user.artworks.filter_by(is_active=True).count()
+    totals = analytics.seller_totals(current_user.id)
+    top_artworks = analytics.top_artworks(current_user.id)
     
-    # Calculate metrics
-    total_views = sum(art.views for art in artworks)
-    total_favorites = sum(art.get_likes_count() for art in artworks)
-    total_ar_tries = sum(art.get_ar_tries_count() for art in artworks)
+    return render_template('seller_analytics.html', 
+                         artwork_count=artwork_count,
+                         top_artworks=top_artworks,
+                         total_views=totals['views'],
+                         total_favorites=totals['likes'],
+                         total_ar_tries=totals['ar_sessions'],
+                         total_revenue=totals['revenue'])
+
+@app.route('/api/seller/analytics/timeseries')
+@query_budget(4)
+@login_required
+@seller_required
+def seller_analytics_timeseries():
+    """Chart data for the analytics page: per-bucket totals plus views by category"""
+    bucket = request.args.get('bucket', 'day')
+    if bucket not in analytics.BUCKETS:
+        return jsonify({'success': False, 'error': f"bucket must be one of {', '.join(analytics.BUCKETS)}"}), 400
+    
+    try:
+        end = date.fromisoformat(request.args['end']) if request.args.get('end') else analytics.utc_today()
+        start = date.fromisoformat(request.args['start']) if request.args.get('start') else end - timedelta(days=29)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'start and end must be YYYY-MM-DD dates'}), 400
+    if start > end or (end - start).days > analytics.MAX_RANGE_DAYS:
+        return jsonify({'success': False, 'error': 'Invalid date range'}), 400
+    
+    points = request.args.get('points', analytics.DEFAULT_POINTS, type=int)
+    points = min(max(points, 1), analytics.MAX_POINTS)
+    
+    data = analytics.timeseries(current_user.id, start, end, bucket, points)
+    data['categories'] = analytics.category_totals(current_user.id, start, end)
+    response = jsonify({'success': True, **data})
+    
+    # Per-seller data: browsers may keep it but must revalidate, which is a 304 until new counts land
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.add_etag()
+    return response.make_conditional(request)
+
+@app.route('/seller/export/<kind>')
+@login_required
+@seller_required
+def seller_export(kind):
+    """Stream the seller's order lines or daily analytics as CSV or NDJSON"""
+    fmt = request.args.get('format', 'csv')
+    status = request.args.get('status') or None
+    if kind not in ('orders', 'analytics') or fmt not in exports.EXPORT_FORMATS:
+        return jsonify({'success': False, 'error': 'Unknown export'}), 404
+    if status and status not in exports.ORDER_STATUSES:
+        return jsonify({'success': False, 'error': 'Unknown order status'}), 400
     
-    # Calculate revenue from orders
-    from sqlalchemy import func
-    revenue_query = db.session.query(func.sum(OrderItem.subtotal)).join(
-        Artwork
-    ).filter(
-        Artwork.user_id == current_user.id
-    ).scalar()
-    total_revenue = revenue_query or 0
+    try:
+        start = date.fromisoformat(request.args['start']) if request.args.get('start') else None
+        end = date.fromisoformat(request.args['end']) if request.args.get('end') else None
+    except ValueError:
+        return jsonify({'success': False, 'error': 'start and end must be YYYY-MM-DD dates'}), 400
     
-    return render_template('seller_analytics.html', 
-                         artworks=artworks,
-                         total_views=total_views,
-                         total_favorites=total_favorites,
-                         total_ar_tries=total_ar_tries,
-                         total_revenue=total_revenue)
+    if kind == 'orders':
+        columns, rows = exports.ORDER_COLUMNS, exports.order_rows(current_user.id, start, end, status)
+    else:
+        columns, rows = exports.ANALYTICS_COLUMNS, exports.analytics_rows(current_user.id, start, end)
+    
+    # The generator keeps the request context (and its DB session) alive while the body streams
+    response = Response(stream_with_context(exports.stream_export(fmt, columns, rows)),
+                        content_type=exports.EXPORT_FORMATS[fmt])
+    filename = f"visioncraft-{kind}-{analytics.utc_today():%Y%m%d}.{fmt}"
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/uploads', methods=['POST'])
+@login_required
+@seller_required
+def api_create_upload():
+    """Start a resumable chunked upload for a 3D model"""
+    data = request.get_json(silent=True) or {}
+    try:
+        upload = chunked_upload.create(current_user.id, secure_filename(data.get('filename', '')), data.get('size'),
+                                       ALLOWED_MODEL_EXT, app.config['CHUNKED_UPLOAD_MAX_SIZE'])
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, **upload}), 201
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+@login_required
+@seller_required
+def api_upload_status(upload_id):
+    """Which chunks have arrived, so an interrupted upload can resume"""
+    try:
+        upload = chunked_upload.status(upload_id, current_user.id)
+    except LookupError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+    return jsonify({'success': True, **upload})
+
+@app.route('/api/uploads/<upload_id>/chunks/<int:index>', methods=['PUT'])
+@login_required
+@seller_required
+def api_upload_chunk(upload_id, index):
+    """Store one chunk; the body is streamed to disk and checked against X-Chunk-SHA256"""
+    try:
+        chunked_upload.write_chunk(upload_id, current_user.id, index, request.stream,
+                                   request.content_length, request.headers.get('X-Chunk-SHA256'))
+    except LookupError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return '', 204
 
 @app.route('/upload', methods=['GET', 'POST'])
 @login_required
@@ -751,20 +989,37 @@ def upload():
             filename = secure_filename(image.filename)
             ext = os.path.splitext(filename)[1].lower()
             if ext in ALLOWED_IMAGE_EXT:
-                unique_filename = f"{secrets.token_hex(8)}_{filename}"
-                dest = os.path.join(IMAGES_DIR, unique_filename)
-                image.save(dest)
-                image_url = f"/static/images/{unique_filename}"
+                image_url = asset_store.save_upload(image.stream, ext)
         
-        # Save model
-        if model and model.filename:
+        # Save model: either assembled from a chunked upload or posted with the form
+        model_upload_id = request.form.get('model_upload_id')
+        if model_upload_id:
+            try:
+                reader = chunked_upload.AssembledUpload(model_upload_id, current_user.id)
+                try:
+                    model_url = asset_store.save_upload(reader, reader.meta['ext'], validate=check_gltf)
+                finally:
+                    reader.close()
+            except GltfError as e:
+                db.session.rollback()
+                chunked_upload.discard(model_upload_id)
+                flash(f'Invalid 3D model: {e}', 'error')
+                return render_template('upload.html')
+            except (LookupError, ValueError) as e:
+                db.session.rollback()
+                flash(f'3D model upload is incomplete: {e}', 'error')
+                return render_template('upload.html')
+        elif model and model.filename:
             filename = secure_filename(model.filename)
             ext = os.path.splitext(filename)[1].lower()
             if ext in ALLOWED_MODEL_EXT:
-                unique_filename = f"{secrets.token_hex(8)}_{filename}"
-                dest = os.path.join(MODELS_DIR, unique_filename)
-                model.save(dest)
-                model_url = f"/static/models/{unique_filename}"
+                # Reject broken models now; optimising them happens later in the worker
+                try:
+                    model_url = asset_store.save_upload(model.stream, ext, validate=check_gltf)
+                except GltfError as e:
+                    db.session.rollback()
+                    flash(f'Invalid 3D model: {e}', 'error')
+                    return render_template('upload.html')
         
         # Create artwork
         artwork = Artwork(
@@ -784,7 +1039,19 @@ def upload():
         )
         
         db.session.add(artwork)
+        db.session.flush()  # Get artwork ID
+        index_artwork(artwork)
+        
+        # Thumbnails and model variants are built by `flask worker`; pages use the originals until they land
+        if image_url:
+            queue_artwork_variants(artwork)
+        if model_url:
+            queue_model_variants(artwork)
         db.session.commit()
+        suggestions.update_artwork(artwork)
+        invalidate_catalog(artwork)
+        if model_upload_id:
+            chunked_upload.discard(model_upload_id)
         
         flash(f'Artwork "{title}" uploaded successfully!', 'success')
         return redirect(url_for('art_detail', art_id=artwork.id))
@@ -803,13 +1070,17 @@ def edit_artwork(art_id):
         return redirect(url_for('home'))
     
     if request.method == 'POST':
+        old_category = artwork.category
         artwork.title = request.form.get('title', artwork.title)
         artwork.description = request.form.get('description', artwork.description)
         artwork.price = float(request.form.get('price', artwork.price))
         artwork.category = request.form.get('category', artwork.category)
         artwork.stock_quantity = int(request.form.get('stock_quantity', artwork.stock_quantity))
         
+        index_artwork(artwork)
         db.session.commit()
+        suggestions.update_artwork(artwork)
+        invalidate_catalog(artwork, old_category)
         flash('Artwork updated successfully!', 'success')
         return redirect(url_for('art_detail', art_id=art_id))
     
@@ -827,41 +1098,47 @@ def delete_art(art_id):
     
     # Soft delete (set inactive)
     artwork.is_active = False
+    remove_artwork(artwork.id)
     db.session.commit()
+    suggestions.discard_artwork(art_id)
+    invalidate_catalog(artwork)
     
     return jsonify({'success': True})
 
 # ==================== EVENTS ROUTES ====================
 
+def event_to_dict(event):
+    """Fields the events page shows (everything except the visitor's RSVP)"""
+    return {
+        'id': event.id,
+        'title': event.title,
+        'type': event.event_type,
+        'date': event.event_date.strftime('%Y-%m-%d'),
+        'time': event.event_time,
+        'location': event.location,
+        'address': event.address,
+        'description': event.description,
+        'tags': event.get_tags_list()
+    }
+
 @app.route('/events')
+@cached_page()
 def events():
     """Local Events & Workshops Calendar"""
-    events_list = Event.query.filter_by(is_active=True).order_by(Event.event_date).all()
-    
-    # Mark RSVP status for authenticated users
-    events_with_status = []
-    for event in events_list:
-        event_dict = {
-            'id': event.id,
-            'title': event.title,
-            'type': event.event_type,
-            'date': event.event_date.strftime('%Y-%m-%d'),
-            'time': event.event_time,
-            'location': event.location,
-            'address': event.address,
-            'description': event.description,
-            'tags': event.get_tags_list(),
-            'rsvped': False
-        }
-        
-        if current_user.is_authenticated:
-            rsvp = EventRSVP.query.filter_by(
-                user_id=current_user.id,
-                event_id=event.id
-            ).first()
-            event_dict['rsvped'] = rsvp is not None
-        
-        events_with_status.append(event_dict)
+    def compute_events():
+        events_list = Event.query.filter_by(is_active=True).order_by(Event.event_date).all()
+        return [event_to_dict(event) for event in events_list], []
+    
+    events_with_status = cache.fetch('events', {}, compute_events, tags=['events'])
+    
+    # Mark RSVP status for authenticated users, with one query for the whole list
+    rsvped_ids = set()
+    if current_user.is_authenticated:
+        rsvped_ids = {event_id for (event_id,) in db.session.query(EventRSVP.event_id).filter(
+            EventRSVP.user_id == current_user.id,
+            EventRSVP.event_id.in_([event['id'] for event in events_with_status]))}
+    for event_dict in events_with_status:
+        event_dict['rsvped'] = event_dict['id'] in rsvped_ids
     
     return render_template('events.html', events=events_with_status)
 
@@ -891,14 +1168,41 @@ def api_rsvp_event(event_id):
 # ==================== ADDITIONAL FEATURES ====================
 
 @app.route('/wall-stylist')
+@cached_page()
 def wall_stylist():
     """AR Wall Stylist"""
-    return render_template('wall_stylist.html')
+    return static_pages.render_page('wall_stylist')
 
 @app.route('/crafts-map')
+@cached_page()
 def crafts_map():
     """Interactive Crafts Map of India"""
-    return render_template('crafts_map.html')
+    return static_pages.render_page('crafts_map')
+
+@app.route('/api/state-crafts')
+def state_crafts():
+    """Artwork counts and top artworks per state for the crafts map (periodic snapshot)"""
+    return static_pages.send_state_snapshot()
+
+# ==================== MEDIA ====================
+
+@app.route('/media/<path:filename>')
+def media(filename):
+    """Uploaded blobs and their derivatives; names are content hashes, so they never change"""
+    if not asset_store.is_public(filename):
+        abort(404)
+    # A top-level blob's name is its SHA-256, which makes a ready-made strong ETag
+    etag = os.path.splitext(filename)[0] if '/' not in filename else None
+    return static_assets.send_asset(app.config['ASSET_STORE_DIR'], filename,
+                                    max_age=ASSET_MAX_AGE, immutable=True, etag=etag)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus scrape endpoint (set METRICS_TOKEN to require a bearer token)"""
+    token = app.config.get('METRICS_TOKEN') or os.environ.get('METRICS_TOKEN')
+    if token and not secrets.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return Response('Unauthorized\n', status=401, content_type='text/plain')
+    return Response(metrics.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 # ==================== ERROR HANDLERS ====================
 
@@ -921,6 +1225,75 @@ def forbidden_error(error):
                          message='Access forbidden',
                          error_code=403), 403
 
+# ==================== CLI COMMANDS ====================
+
+@app.cli.command('reconcile-counters')
+def reconcile_counters_command():
+    """Rebuild artwork like/cart/order counters from the source tables"""
+    updated = Artwork.reconcile_counters()
+    print(f'Reconciled counters for {updated} artworks')
+
+@app.cli.command('rebuild-ar-rollups')
+def rebuild_ar_rollups_command():
+    """Recompute the AR columns of the daily stats from the event spool"""
+    replayed = rebuild_rollups(app.config['AR_EVENTS_DIR'])
+    print(f'Replayed {replayed} AR events')
+
+@app.cli.command('backfill-seller-rollups')
+def backfill_seller_rollups_command():
+    """Recompute views/likes/units/revenue in the daily stats from the source tables"""
+    rows = analytics.backfill()
+    print(f'Backfilled {rows} artwork-day rows')
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Create the full-text search index and refill it from active artworks"""
+    backend = create_index()
+    indexed = rebuild_index()
+    print(f'Search backend: {backend} ({indexed} artworks indexed)')
+
+@app.cli.command('generate-image-variants')
+def generate_image_variants_command():
+    """Build resized WebP/AVIF copies for uploaded images that don't have them yet"""
+    updated = generate_missing()
+    print(f'Generated image variants for {updated} images')
+
+@app.cli.command('gc-assets')
+@click.option('--dry-run', is_flag=True, help='Report what would be removed without deleting')
+def gc_assets_command(dry_run):
+    """Recount asset references and delete blobs nothing uses any more"""
+    stats = asset_store.collect_garbage(dry_run=dry_run)
+    verb = 'Would remove' if dry_run else 'Removed'
+    print(f"{verb} {stats['blobs']} unreferenced blobs and {stats['orphans']} orphan files "
+          f"({stats['bytes'] / 1024 / 1024:.1f} MB freed)")
+    if not dry_run:
+        print(f'Removed {chunked_upload.expire_stale()} abandoned chunked uploads')
+
+@app.cli.command('precompress-static')
+def precompress_static_command():
+    """Write .br/.gz copies of static CSS/JS/JSON/glTF files (run at deploy time)"""
+    written = static_assets.precompress_tree(app.static_folder)
+    print(f'Wrote {written} precompressed files')
+
+@app.cli.command('build-pages')
+def build_pages_command():
+    """Pre-render the crafts map and wall stylist with their CSS/JS bundles (run at deploy time)"""
+    manifest = static_pages.build(app)
+    with app.app_context():
+        static_pages.write_state_snapshot(app)
+    for name, path in sorted(manifest.items()):
+        print(f'{name} -> {path}')
+
+@app.cli.command('worker')
+@click.option('--processes', '-p', default=2, show_default=True, help='Worker processes to run')
+@click.option('--burst', is_flag=True, help='Exit once the queue is empty (single process)')
+def worker_command(processes, burst):
+    """Run background jobs (image variants and other post-upload work)"""
+    if burst:
+        print(f'Processed {work(app, burst=True)} jobs')
+    else:
+        run_worker_pool(app, processes)
+
 # ==================== MAIN ====================
 
 if __name__ == '__main__':
@@ -0,0 +1,142 @@
+"""
+AR engagement event ingest for VisionCraft
+Beacons from the AR viewer are buffered in memory, appended to a per-process NDJSON
+spool and rolled up into ArtworkDailyStat rows in one pass
+"""
+import glob
+import json
+import os
+from collections import Counter
+from datetime import datetime
+from models import db, ArtworkDailyStat
+from write_behind import WriteBehindBuffer
+
+# Client event type -> rollup column
+EVENT_COLUMNS = {
+    'session_start': 'ar_sessions',
+    'placed': 'ar_placements',
+    'snapshot': 'ar_snapshots',
+}
+EVENT_SOURCES = {'ar_viewer'}
+MAX_EVENTS_PER_BEACON = 50
+MAX_BEACON_BYTES = 16 * 1024
+
+
+def parse_beacon(payload):
+    """
+    Validate a beacon body ({"events": [...]}) and return normalized events.
+    Malformed entries are dropped rather than failing the whole batch.
+    """
+    if not isinstance(payload, dict) or not isinstance(payload.get('events'), list):
+        raise ValueError('Expected {"events": [...]}')
+
+    now = datetime.utcnow()
+    events = []
+    for raw in payload['events'][:MAX_EVENTS_PER_BEACON]:
+        if not isinstance(raw, dict) or raw.get('type') not in EVENT_COLUMNS:
+            continue
+        try:
+            artwork_id = int(raw.get('artwork_id'))
+        except (TypeError, ValueError):
+            continue
+        source = raw.get('source')
+        events.append({
+            'artwork_id': artwork_id,
+            'type': raw['type'],
+            'source': source if source in EVENT_SOURCES else 'unknown',
+            # Day buckets use server time; client clocks on phones are unreliable
+            'at': now.isoformat(timespec='seconds'),
+        })
+    return events
+
+
+def rollup(events):
+    """Aggregate events into {(artwork_id, day): {column: count}}"""
+    counts = Counter()
+    for event in events:
+        day = datetime.fromisoformat(event['at']).date()
+        counts[(event['artwork_id'], day, EVENT_COLUMNS[event['type']])] += 1
+
+    grouped = {}
+    for (artwork_id, day, column), count in counts.items():
+        grouped.setdefault((artwork_id, day), {})[column] = count
+    return grouped
+
+
+def write_rollup(events):
+    """Add a batch of events to the daily stats (unknown artworks are skipped)"""
+    ArtworkDailyStat.add_counts(rollup(events))
+
+
+class AREventSink(WriteBehindBuffer):
+    """Buffers AR events (AR_EVENTS_FLUSH_INTERVAL / AR_EVENTS_FLUSH_THRESHOLD);
+    each flush appends them to the spool and updates the rollup in one transaction."""
+
+    config_prefix = 'AR_EVENTS'
+    default_interval = 10.0
+    default_threshold = 500
+
+    def init_app(self, app):
+        app.config.setdefault('AR_EVENTS_DIR', os.path.join(app.root_path, 'logs', 'ar_events'))
+        super().init_app(app)
+
+    def record(self, events):
+        for event in events:
+            self.put(event)
+
+    def _new_batch(self):
+        return []
+
+    def _append(self, batch, event):
+        batch.append(event)
+
+    def _merge(self, batch, failed):
+        batch[:0] = failed
+
+    def _write(self, batch):
+        # Spool first: the raw log is what rebuild_rollups() replays. Events retried after a
+        # failed database write are already on disk and are not appended twice.
+        unspooled = [event for event in batch if not event.get('_spooled')]
+        if unspooled:
+            spool_dir = self.app.config['AR_EVENTS_DIR']
+            os.makedirs(spool_dir, exist_ok=True)
+            spool_path = os.path.join(spool_dir, f'ar-events-{datetime.utcnow():%Y%m%d}-{os.getpid()}.ndjson')
+            with open(spool_path, 'a', encoding='utf-8') as spool:
+                spool.write(''.join(json.dumps(event, separators=(',', ':')) + '\n' for event in unspooled))
+            for event in unspooled:
+                event['_spooled'] = True
+
+        write_rollup(batch)
+        db.session.commit()
+
+
+def rebuild_rollups(spool_dir, chunk_size=5000):
+    """Reset the AR rollup columns and replay every spooled event; returns events replayed"""
+    ArtworkDailyStat.query.update({
+        ArtworkDailyStat.ar_sessions: 0,
+        ArtworkDailyStat.ar_placements: 0,
+        ArtworkDailyStat.ar_snapshots: 0,
+    }, synchronize_session=False)
+
+    replayed = 0
+    chunk = []
+    for path in sorted(glob.glob(os.path.join(spool_dir, 'ar-events-*.ndjson'))):
+        with open(path, encoding='utf-8') as spool:
+            for line in spool:
+                try:
+                    chunk.append(json.loads(line))
+                except ValueError:
+                    continue  # Torn final line from a crash mid-write
+                if len(chunk) >= chunk_size:
+                    write_rollup(chunk)
+                    replayed += len(chunk)
+                    chunk = []
+    if chunk:
+        write_rollup(chunk)
+        replayed += len(chunk)
+
+    db.session.commit()
+    return replayed
+
+
+ar_event_sink = AREventSink()
@@ -0,0 +1,235 @@
+"""
+Content-addressed store for uploaded images and models
+Each upload is saved once as <sha256><ext> and served from /media/ with immutable
+caching, since a URL can never change content. Artworks and avatars hold references;
+`flask gc-assets` recounts them and deletes blobs nothing points at any more.
+"""
+import glob
+import hashlib
+import os
+import re
+import secrets
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func, or_
+from models import db, Artwork, Asset, User, UPSERT_INSERTS
+from static_assets import SIBLING_SUFFIXES
+
+URL_PREFIX = '/media'
+CHUNK_SIZE = 64 * 1024
+GC_GRACE = timedelta(hours=1)  # leave fresh blobs alone; their upload may still be committing
+TMP_DIRNAME = 'tmp'
+TOMBSTONE_SUFFIX = '.gc'  # a blob moved aside by GC while its row is deleted
+DERIVED_DIRNAME = 'derived'
+
+# What /media serves: blobs and their derived variants. Chunked uploads in progress
+# (uploads/), temp files and GC tombstones (tmp/) live in the same directory but aren't public.
+PUBLIC_NAME = re.compile(r'^(?:' + DERIVED_DIRNAME + r'/)?[0-9a-f]{64}(?:-[\w-]+)?\.[a-z0-9]+$')
+
+
+def store_dir():
+    return current_app.config['ASSET_STORE_DIR']
+
+
+def url_for_asset(filename):
+    return f'{URL_PREFIX}/{filename}'
+
+
+def filename_for_url(url):
+    """Blob filename for a /media URL, or None for anything else (legacy /static uploads, remote URLs)"""
+    if url and url.startswith(URL_PREFIX + '/'):
+        name = url[len(URL_PREFIX) + 1:]
+        if '/' not in name:
+            return name
+    return None
+
+
+def is_public(filename):
+    """Whether a path under the store may be served from /media"""
+    return PUBLIC_NAME.match(filename) is not None
+
+
+def local_path(url):
+    """Filesystem path for a stored upload URL, including legacy /static/... uploads"""
+    if url.startswith(URL_PREFIX + '/'):
+        return os.path.join(store_dir(), url[len(URL_PREFIX) + 1:])
+    return os.path.join(current_app.root_path, url.lstrip('/'))
+
+
+# ==================== STORING ====================
+
+def save_upload(stream, ext, validate=None):
+    """
+    Hash a readable stream while writing it to a temp file, optionally validate the temp
+    file, then move it into place (replacing identical bytes if they are already stored).
+    Returns the /media URL and takes one reference, committed with the caller.
+    """
+    os.makedirs(os.path.join(store_dir(), TMP_DIRNAME), exist_ok=True)
+    tmp_path = os.path.join(store_dir(), TMP_DIRNAME, secrets.token_hex(8))
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp_path, 'wb') as tmp:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+                tmp.write(chunk)
+                size += len(chunk)
+        if validate is not None:
+            validate(tmp_path)
+
+        # Reference first, then (re)place the file. GC moves a blob aside before deleting its
+        # row and only ever unlinks that moved copy, so the file placed here survives a
+        # concurrent GC whether it deletes the row just before or just after this acquire
+        filename = f'{digest.hexdigest()}{ext}'
+        acquire(filename, size)
+        os.replace(tmp_path, os.path.join(store_dir(), filename))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return url_for_asset(filename)
+
+
+def acquire(filename, size=0):
+    """Add a reference to a blob, creating its row on first use"""
+    insert = UPSERT_INSERTS.get(db.session.get_bind().dialect.name)
+    if insert is not None:
+        stmt = insert(Asset).values(filename=filename, size=size, ref_count=1,
+                                    created_at=datetime.utcnow(), updated_at=datetime.utcnow())
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['filename'],
+            set_={'ref_count': Asset.ref_count + 1, 'updated_at': datetime.utcnow()}
+        )
+        db.session.execute(stmt)
+    else:
+        asset = Asset.query.filter_by(filename=filename).first()
+        if asset is None:
+            db.session.add(Asset(filename=filename, size=size, ref_count=1))
+            db.session.flush()
+        else:
+            Asset.query.filter_by(id=asset.id).update({Asset.ref_count: Asset.ref_count + 1},
+                                                      synchronize_session=False)
+
+
+def release(url):
+    """Drop one reference held by a URL that is being replaced (ignores non-store URLs)"""
+    filename = filename_for_url(url)
+    if filename:
+        Asset.query.filter(Asset.filename == filename, Asset.ref_count > 0).update({
+            Asset.ref_count: Asset.ref_count - 1,
+            Asset.updated_at: datetime.utcnow(),
+        }, synchronize_session=False)
+
+
+# ==================== GARBAGE COLLECTION ====================
+
+def recount_references():
+    """Recompute every ref_count from the columns that hold asset URLs"""
+    url = URL_PREFIX + '/' + Asset.filename
+    references = (
+        db.session.query(func.count(Artwork.id)).filter(or_(Artwork.image == url, Artwork.model_url == url))
+        .scalar_subquery()
+        + db.session.query(func.count(User.id)).filter(User.avatar == url).scalar_subquery()
+    )
+    # Keep updated_at: it marks the last acquire/release, which GC_GRACE is measured from
+    db.session.query(Asset).update({Asset.ref_count: references, Asset.updated_at: Asset.updated_at},
+                                   synchronize_session=False)
+    db.session.commit()
+
+
+def _remove_blob(filename, include_blob=True):
+    """Delete a blob's file, its precompressed siblings and derived files; returns bytes freed"""
+    stem = os.path.splitext(filename)[0]
+    suffixes = (('',) if include_blob else ()) + SIBLING_SUFFIXES
+    paths = [os.path.join(store_dir(), filename + suffix) for suffix in suffixes]
+    paths += glob.glob(os.path.join(store_dir(), DERIVED_DIRNAME, f'{glob.escape(stem)}-*'))
+    freed = 0
+    for path in paths:
+        try:
+            freed += os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    return freed
+
+
+def _blob_name(name):
+    """The blob a stored file belongs to (a precompressed .br/.gz sibling belongs to its original)"""
+    for suffix in SIBLING_SUFFIXES:
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def _set_aside(path, tombstone):
+    try:
+        os.replace(path, tombstone)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def _delete_unreferenced(asset_id, filename):
+    """
+    Delete one blob's row if it is still unreferenced, then its files; returns bytes freed.
+    The blob is renamed to a tombstone first and only the tombstone is unlinked: an upload
+    of the same bytes racing with this (its row not yet committed, so invisible here) puts
+    its own copy back in place, and a row that survived the DELETE gets the tombstone back.
+    """
+    path = os.path.join(store_dir(), filename)
+    tombstone = os.path.join(store_dir(), TMP_DIRNAME, filename + TOMBSTONE_SUFFIX)
+    os.makedirs(os.path.dirname(tombstone), exist_ok=True)
+    set_aside = _set_aside(path, tombstone)
+
+    deleted = Asset.query.filter_by(id=asset_id, ref_count=0).delete(synchronize_session=False)
+    db.session.commit()
+    if not deleted:
+        # Re-acquired meanwhile; the uploader may have placed identical bytes already
+        if set_aside:
+            os.replace(tombstone, path)
+        return 0
+
+    freed = 0
+    if set_aside:
+        freed += os.path.getsize(tombstone)
+        os.remove(tombstone)
+    if not os.path.exists(path):
+        freed += _remove_blob(filename, include_blob=False)
+    return freed
+
+
+def collect_garbage(grace=GC_GRACE, dry_run=False):
+    """Delete unreferenced blobs (and their derived files) plus stray temp/orphan files older than grace"""
+    recount_references()
+    cutoff = datetime.utcnow() - grace
+    stats = {'blobs': 0, 'orphans': 0, 'bytes': 0}
+
+    unreferenced = db.session.query(Asset.id, Asset.filename).filter(
+        Asset.ref_count == 0, Asset.updated_at < cutoff
+    ).all()
+    for asset_id, filename in unreferenced:
+        stats['blobs'] += 1
+        if not dry_run:
+            stats['bytes'] += _delete_unreferenced(asset_id, filename)
+
+    # Files with no row: a crash between moving a blob into place and committing, or abandoned temp files
+    known = {filename for filename, in db.session.query(Asset.filename)}
+    cutoff_ts = time.time() - grace.total_seconds()
+    tmp_dir = os.path.join(store_dir(), TMP_DIRNAME)
+    orphans = [entry for entry in os.scandir(store_dir())
+               if entry.is_file() and _blob_name(entry.name) not in known]
+    temps = list(os.scandir(tmp_dir)) if os.path.isdir(tmp_dir) else []
+    for entry in orphans + temps:
+        if entry.stat().st_mtime >= cutoff_ts:
+            continue
+        stats['orphans'] += 1
+        if dry_run:
+            continue
+        if entry in orphans:
+            stats['bytes'] += _remove_blob(entry.name)
+        else:
+            stats['bytes'] += entry.stat().st_size
+            os.remove(entry.path)
+    return stats
@@ -0,0 +1,103 @@
+"""
+Benchmark artwork search latency: full-text index vs the ILIKE fallback
+Builds a throwaway SQLite database, so it never touches visioncraft.db
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix='visioncraft-bench-'), 'bench.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+
+from app import app, db  # noqa: E402  (must follow DATABASE_URL)
+from models import User, Artwork  # noqa: E402
+import search_index  # noqa: E402
+
+CRAFTS = ['Terracotta', 'Bamboo', 'Bronze', 'Brass', 'Madhubani', 'Warli', 'Pashmina', 'Channapatna',
+          'Dhokra', 'Kalamkari', 'Bidriware', 'Phulkari', 'Pattachitra', 'Blue Pottery', 'Cane']
+OBJECTS = ['Pot', 'Basket', 'Sculpture', 'Bell', 'Vase', 'Chair', 'Painting', 'Shawl', 'Toy',
+           'Lamp', 'Mask', 'Tray', 'Mirror', 'Wall Hanging', 'Bowl']
+CATEGORIES = ['Pottery', 'Woodcraft', 'Weaving', 'Textiles', 'Sculpture', 'Painting',
+              'Decorative', 'Metalwork', 'Jewelry', 'Furniture']
+ARTISTS = ['Sanjay Varma', 'Tenzin Gyatso', 'Ramesh Patel', 'Krishna Moorthy', 'Mohan Joshi',
+           'Priya Sharma', 'Lakshmi Devi', 'Joseph DSouza', 'Anita Rao', 'Farhan Ali']
+STATES = ['Rajasthan', 'Assam', 'Tamil Nadu', 'Kerala', 'Goa', 'Bihar', 'Karnataka', 'Odisha']
+# Broad single-term prefixes plus selective multi-term, exact-item and no-match searches
+QUERIES = ['pot', 'terra', 'madhubani painting', 'bronze', 'bas', 'lakshmi', 'blue pot', 'kerala bell',
+           'channapatna toy', 'wall', 'brass lamp', 'dhokra mask odisha', 'terracotta mirror lakshmi',
+           'warli tray 4242', '12345', 'kantha', 'ganesha idol', 'pashmina shawl kerala', 'bidri', 'zardozi']
+
+
+def seed(count):
+    """Insert `count` synthetic artworks in bulk"""
+    seller = User(username='bench_seller', email='bench@example.com', role='seller')
+    seller.set_password('bench')
+    db.session.add(seller)
+    db.session.commit()
+
+    rng = random.Random(42)
+    batch = []
+    for i in range(count):
+        craft, obj = rng.choice(CRAFTS), rng.choice(OBJECTS)
+        state = rng.choice(STATES)
+        batch.append({
+            'title': f'{craft} {obj} #{i}',
+            'description': f'Handmade {craft.lower()} {obj.lower()} from {state}, crafted with traditional techniques.',
+            'price': rng.randint(99, 9999),
+            'category': rng.choice(CATEGORIES),
+            'user_id': seller.id,
+            'artist_name': rng.choice(ARTISTS),
+            'state': state,
+        })
+        if len(batch) == 5000:
+            db.session.execute(Artwork.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(Artwork.__table__.insert(), batch)
+    db.session.commit()
+
+
+def measure(label, runs):
+    """Run every benchmark query `runs` times and print latency percentiles"""
+    timings = []
+    for _ in range(runs):
+        for query_text in QUERIES:
+            start = time.perf_counter()
+            search_index.search_artworks(query_text)
+            timings.append((time.perf_counter() - start) * 1000)
+            db.session.rollback()
+
+    timings.sort()
+    p50 = statistics.median(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"  {label:<12} p50 {p50:8.2f} ms   p95 {p95:8.2f} ms   ({len(timings)} searches)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--artworks', type=int, default=100000, help='catalog size to generate')
+    parser.add_argument('--runs', type=int, default=5, help='passes over the query set')
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.create_all()
+        print(f"Seeding {args.artworks} artworks into {DB_PATH} ...")
+        seed(args.artworks)
+
+        print("\n" + "=" * 70)
+        print("  Search latency (first page, 24 results)")
+        print("=" * 70)
+
+        measure('ILIKE scan', args.runs)
+
+        backend = search_index.create_index()
+        search_index.rebuild_index()
+        measure(backend, args.runs)
+        print("=" * 70 + "\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+"""
+Read-through cache for hot catalog queries, rendered fragments and pages
+Entries are plain JSON data keyed by a namespace and the query parameters, and carry
+tags (artwork:<id>, category:<name>, seller:<id>, ...). Invalidating a tag gives it a
+new random version; an entry is only served while every tag still has the version it
+was stored with, so one write drops exactly the entries that depended on it. An entry
+computed from other entries (a page built from catalog data) inherits their tags.
+
+CACHE_BACKEND picks the store:
+    memory  per-process LRU (default). Other gunicorn workers see an invalidation only
+            when their copy expires, so keep CACHE_DEFAULT_TTL short with several workers
+    sqlite  one file at CACHE_PATH shared by every worker on the host, standing in for Redis
+    null    caching off
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from flask import g, has_app_context
+import metrics
+
+TAG_PREFIX = 'tag:'
+PURGE_EVERY = 500  # sqlite: drop expired rows after this many writes
+
+
+def artwork_tag(artwork_id):
+    return f'artwork:{artwork_id}'
+
+
+def category_tag(category):
+    return f'category:{category}'
+
+
+def seller_tag(user_id):
+    return f'seller:{user_id}'
+
+
+def _new_version():
+    return os.urandom(6).hex()
+
+
+# ==================== BACKENDS ====================
+
+class NullBackend:
+    def get_many(self, keys):
+        return {}
+
+    def set_many(self, items, ttl=None):
+        pass
+
+    def add_many(self, items):
+        pass
+
+
+class MemoryBackend:
+    """Thread-safe LRU of serialized values with per-entry expiry"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()  # key -> (expires or None, value)
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        now = time.time()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is None:
+                    continue
+                if entry[0] is not None and entry[0] <= now:
+                    del self._data[key]
+                    continue
+                self._data.move_to_end(key)
+                found[key] = entry[1]
+        return found
+
+    def _store(self, key, value, expires):
+        self._data[key] = (expires, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def set_many(self, items, ttl=None):
+        expires = time.time() + ttl if ttl else None
+        with self._lock:
+            for key, value in items.items():
+                self._store(key, value, expires)
+
+    def add_many(self, items):
+        """Set keys that are not already present (never expire)"""
+        with self._lock:
+            for key, value in items.items():
+                if key not in self._data:
+                    self._store(key, value, None)
+
+
+class SQLiteBackend:
+    """Key/value table in a local SQLite file, shared by every process on the host"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS cache '
+                         '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL)')
+
+    def _connect(self):
+        # One connection per thread and process; sqlite3 connections don't survive a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get_many(self, keys):
+        keys = list(keys)
+        if not keys:
+            return {}
+        placeholders = ','.join('?' * len(keys))
+        rows = self._connect().execute(
+            f'SELECT key, value FROM cache WHERE key IN ({placeholders}) AND (expires IS NULL OR expires > ?)',
+            [*keys, time.time()])
+        return dict(rows)
+
+    def _write(self, sql, rows):
+        conn = self._connect()
+        conn.executemany(sql, rows)
+        self._writes += 1
+        if self._writes % PURGE_EVERY == 0:
+            conn.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+
+    def set_many(self, items, ttl=None):
+        expires = time.time() + ttl if ttl else None
+        self._write('INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+                    [(key, value, expires) for key, value in items.items()])
+
+    def add_many(self, items):
+        self._write('INSERT OR IGNORE INTO cache (key, value, expires) VALUES (?, ?, NULL)',
+                    list(items.items()))
+
+
+# ==================== CACHE ====================
+
+class Cache:
+    """Tagged read-through cache in front of a pluggable backend"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.backend = NullBackend()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_BACKEND', os.environ.get('CACHE_BACKEND', 'memory'))
+        app.config.setdefault('CACHE_PATH', os.path.join(app.root_path, 'logs', 'cache.sqlite3'))
+        app.config.setdefault('CACHE_DEFAULT_TTL', 60)
+        app.config.setdefault('CACHE_MAX_ENTRIES', 4096)  # memory backend
+        self.app = app
+
+        kind = app.config['CACHE_BACKEND']
+        if kind == 'memory':
+            self.backend = MemoryBackend(app.config['CACHE_MAX_ENTRIES'])
+        elif kind == 'sqlite':
+            self.backend = SQLiteBackend(app.config['CACHE_PATH'])
+        elif kind in ('null', 'none', None):
+            self.backend = NullBackend()
+        else:
+            raise ValueError(f'Unknown CACHE_BACKEND {kind!r}')
+
+    @staticmethod
+    def make_key(namespace, params):
+        """Stable key for a namespace and its query parameters"""
+        encoded = json.dumps(params, sort_keys=True, separators=(',', ':'), default=str)
+        return f'{namespace}:{hashlib.sha1(encoded.encode()).hexdigest()}'
+
+    def _versions(self, tags):
+        """Current version of each tag, creating versions for tags never seen before"""
+        keys = {TAG_PREFIX + tag: tag for tag in tags}
+        found = self.backend.get_many(keys)
+        missing = {key: _new_version() for key in keys if key not in found}
+        if missing:
+            # add, not set: another worker may be creating the same tag right now
+            self.backend.add_many(missing)
+            found.update(self.backend.get_many(missing))
+        return {keys[key]: version for key, version in found.items()}
+
+    def _valid(self, tag_versions):
+        current = self.backend.get_many(TAG_PREFIX + tag for tag in tag_versions)
+        return all(current.get(TAG_PREFIX + tag) == version for tag, version in tag_versions.items())
+
+    # ==================== DEPENDENCIES ====================
+
+    @contextmanager
+    def dependencies(self):
+        """Collect the tag versions of every entry read or computed inside the block"""
+        collected = {}
+        if not has_app_context():
+            yield collected
+            return
+        stack = g.setdefault('cache_dependencies', [])
+        stack.append(collected)
+        try:
+            yield collected
+        finally:
+            stack.pop()
+
+    def _record(self, tag_versions):
+        if has_app_context():
+            for collected in g.get('cache_dependencies', ()):
+                for tag, version in tag_versions.items():
+                    collected.setdefault(tag, version)
+
+    def depends_on(self, *tags):
+        """Tag whatever is being cached around this call (e.g. the page showing an artwork)"""
+        self._record(self._versions(tags))
+
+    # ==================== READ-THROUGH ====================
+
+    def get(self, namespace, params):
+        """The cached value, or None on a miss"""
+        key = self.make_key(namespace, params)
+        raw = self.backend.get_many([key]).get(key)
+        if raw is not None:
+            entry = json.loads(raw)
+            if self._valid(entry['tags']):
+                metrics.record_cache(namespace, True)
+                self._record(entry['tags'])
+                return entry['value']
+        metrics.record_cache(namespace, False)
+        return None
+
+    def set(self, namespace, params, value, tag_versions, ttl=None):
+        """Store value with tag versions taken (before it was computed) from dependencies()"""
+        entry = {'value': value, 'tags': tag_versions}
+        self.backend.set_many({self.make_key(namespace, params): json.dumps(entry, separators=(',', ':'))},
+                              ttl or self.app.config['CACHE_DEFAULT_TTL'])
+        self._record(tag_versions)
+
+    def fetch(self, namespace, params, compute, tags=(), ttl=None):
+        """
+        Return the cached value for (namespace, params), or run compute() and cache it.
+        compute() returns (value, item_tags): tags that depend on the result, such as the
+        artworks it lists. `tags` are known up front and are versioned before compute()
+        runs, so an invalidation that lands mid-computation is not lost.
+        value must be JSON-serializable; each call returns a fresh copy.
+        """
+        value = self.get(namespace, params)
+        if value is not None:
+            return value
+
+        with self.dependencies() as tag_versions:
+            tag_versions.update(self._versions(tags))
+            value, item_tags = compute()
+        tag_versions.update(self._versions(set(item_tags) - set(tag_versions)))
+        self.set(namespace, params, value, tag_versions, ttl)
+        return value
+
+    def invalidate(self, *tags):
+        """Drop every entry carrying any of these tags (call after the commit)"""
+        if tags:
+            self.backend.set_many({TAG_PREFIX + tag: _new_version() for tag in set(tags)})
+
+
+cache = Cache()
@@ -1,8 +1,21 @@
 """
-Check and report the status of VisionCraft assets
+Audit VisionCraft assets
+Hashes and inspects every uploaded image and model (in a process pool, skipping files
+whose mtime and size match the manifest from the last run), then cross-references the
+database: orphaned files, artworks and avatars pointing at missing files, oversized
+models and duplicate content. Prints JSON by default (--text for a readable report)
+and exits 1 when the database points at missing files.
 """
+import argparse
+import hashlib
+import json
 import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from PIL import Image
+import gltf
 
 # Define directories
 BASE_DIR = Path(__file__).parent
@@ -10,6 +23,16 @@ STATIC_DIR = BASE_DIR / 'static'
 IMAGES_DIR = STATIC_DIR / 'images'
 MODELS_DIR = STATIC_DIR / 'models'
 AVATARS_DIR = STATIC_DIR / 'avatars'
+MANIFEST_PATH = BASE_DIR / 'logs' / 'asset_manifest.json'
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.avif'}
+MODEL_EXTENSIONS = {'.glb', '.gltf'}
+SKIP_DIRS = {'tmp', 'uploads'}          # in-flight uploads in the asset store
+SKIP_SUFFIXES = ('.br', '.gz', '.tmp')  # precompressed siblings belong to their original
+MAX_MODEL_BYTES = 20 * 1024 * 1024
+MAX_MODEL_TRIANGLES = 500_000
+READ_SIZE = 1024 * 1024
+POOL_THRESHOLD = 32  # below this many changed files a pool costs more than it saves
 
 def format_size(bytes):
     """Format bytes to human readable"""
@@ -19,92 +42,222 @@ def format_size(bytes):
         bytes /= 1024.0
     return f"{bytes:.2f} TB"
 
-def check_directory(directory, extensions=None):
-    """Check a directory and return file info"""
-    if not directory.exists():
-        return []
-    
-    files = []
-    for file in directory.iterdir():
-        if file.is_file():
-            if extensions is None or file.suffix.lower() in extensions:
-                size = file.stat().st_size
-                files.append({
-                    'name': file.name,
-                    'size': size,
-                    'size_formatted': format_size(size),
-                    'path': str(file)
-                })
-    
-    return sorted(files, key=lambda x: x['name'])
+def scan(roots):
+    """{path: (mtime_ns, size)} for every asset file under the given directories"""
+    found = {}
+    stack = [os.path.abspath(root) for root in roots if root.exists()]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in SKIP_DIRS:
+                        stack.append(entry.path)
+                elif entry.is_file() and not entry.name.endswith(SKIP_SUFFIXES):
+                    ext = os.path.splitext(entry.name)[1].lower()
+                    if ext in IMAGE_EXTENSIONS or ext in MODEL_EXTENSIONS:
+                        stat = entry.stat()
+                        found[entry.path] = (stat.st_mtime_ns, stat.st_size)
+    return found
 
-def print_section(title, files, total_size):
-    """Print a section with files"""
-    print(f"\n{'='*70}")
-    print(f"  {title}")
-    print(f"{'='*70}")
+def inspect_file(path):
+    """Hash one file and read what matters for its type (runs in a worker process)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(READ_SIZE), b''):
+            digest.update(chunk)
+    info = {'sha256': digest.hexdigest()}
     
-    if not files:
-        print("  ⚠️  No files found")
-        return
+    ext = os.path.splitext(path)[1].lower()
+    try:
+        if ext in MODEL_EXTENSIONS:
+            info['kind'] = 'model'
+            info['triangles'] = gltf.triangle_count(gltf.load_valid(path).doc)
+        else:
+            info['kind'] = 'image'
+            with Image.open(path) as image:
+                info['width'], info['height'] = image.size
+    except Exception as e:
+        info['error'] = str(e) or type(e).__name__
+    return path, info
+
+def load_manifest(path):
+    """Entries from the last run, keyed by path (empty if there is no usable manifest)"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(path, manifest):
+    """Write the manifest atomically, so an interrupted run leaves the old one intact"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+def inspect_all(files, manifest, jobs):
+    """Manifest entries for every file, re-inspecting only new or changed ones"""
+    entries = {}
+    changed = []
+    for path, (mtime_ns, size) in files.items():
+        cached = manifest.get(path)
+        if cached and cached['mtime_ns'] == mtime_ns and cached['size'] == size:
+            entries[path] = cached
+        else:
+            changed.append(path)
     
-    print(f"  Total: {len(files)} files | Size: {format_size(total_size)}\n")
+    if len(changed) >= POOL_THRESHOLD and jobs != 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(inspect_file, changed, chunksize=64))
+    else:
+        results = [inspect_file(path) for path in changed]
     
-    for file in files:
-        status = "✓" if file['size'] > 0 else "⚠"
-        print(f"  {status} {file['name']:<40} {file['size_formatted']:>10}")
+    for path, info in results:
+        mtime_ns, size = files[path]
+        entries[path] = {'mtime_ns': mtime_ns, 'size': size, **info}
+    return entries, len(changed)
 
-def main():
-    """Main check function"""
-    print("\n" + "="*70)
-    print("  VisionCraft Asset Status Report")
-    print("="*70)
+def referenced_urls():
+    """{url: [(table, id, column)]} for every asset URL stored in the database"""
+    from models import db, Artwork, User
     
-    # Check Images
-    image_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
-    images = check_directory(IMAGES_DIR, image_extensions)
-    images_total = sum(f['size'] for f in images)
-    print_section("📷 IMAGES (static/images/)", images, images_total)
+    references = {}
+    def add(url, where):
+        if url and url.startswith('/'):
+            references.setdefault(url, []).append(where)
+    def add_variants(variants_json, where):
+        # Variant columns are nested JSON ({format: {width: url}} / {name: {url: ...}})
+        try:
+            stack = [json.loads(variants_json)] if variants_json else []
+        except ValueError:
+            return
+        while stack:
+            value = stack.pop()
+            if isinstance(value, dict):
+                stack.extend(value.values())
+            elif isinstance(value, str):
+                add(value, where)
     
-    # Check Models
-    model_extensions = {'.glb', '.gltf'}
-    models = check_directory(MODELS_DIR, model_extensions)
-    models_total = sum(f['size'] for f in models)
-    print_section("🎨 3D MODELS (static/models/)", models, models_total)
-    
-    # Check Avatars
-    avatar_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
-    avatars = check_directory(AVATARS_DIR, avatar_extensions)
-    avatars_total = sum(f['size'] for f in avatars)
-    print_section("👤 AVATARS (static/avatars/)", avatars, avatars_total)
+    rows = db.session.query(Artwork.id, Artwork.image, Artwork.model_url,
+                            Artwork.image_variants, Artwork.model_variants)
+    for artwork_id, image, model_url, image_variants, model_variants in rows:
+        add(image, ('artwork', artwork_id, 'image'))
+        add(model_url, ('artwork', artwork_id, 'model_url'))
+        add_variants(image_variants, ('artwork', artwork_id, 'image_variants'))
+        add_variants(model_variants, ('artwork', artwork_id, 'model_variants'))
+    for user_id, avatar, avatar_variants in db.session.query(User.id, User.avatar, User.avatar_variants):
+        add(avatar, ('user', user_id, 'avatar'))
+        add_variants(avatar_variants, ('user', user_id, 'avatar_variants'))
+    return references
+
+def audit(entries, references, local_path, max_model_bytes, max_triangles):
+    """Cross-reference inspected files with the URLs the database points at"""
+    referenced_paths = {}
+    missing = []
+    for url, places in sorted(references.items()):
+        path = os.path.normpath(local_path(url))
+        referenced_paths[path] = url
+        if path not in entries and not os.path.exists(path):
+            missing += [{'table': table, 'id': row_id, 'column': column, 'url': url}
+                        for table, row_id, column in places]
     
-    # Summary
-    total_assets = len(images) + len(models) + len(avatars)
-    total_size = images_total + models_total + avatars_total
+    by_hash = {}
+    orphans, oversized, unreadable = [], [], []
+    for path, entry in sorted(entries.items()):
+        by_hash.setdefault(entry['sha256'], []).append(path)
+        if os.path.normpath(path) not in referenced_paths:
+            orphans.append({'path': path, 'size': entry['size']})
+        if 'error' in entry:
+            unreadable.append({'path': path, 'error': entry['error']})
+        elif entry['kind'] == 'model' and (entry['size'] > max_model_bytes or entry['triangles'] > max_triangles):
+            oversized.append({'path': path, 'size': entry['size'], 'triangles': entry['triangles']})
     
+    duplicates = [paths for paths in by_hash.values() if len(paths) > 1]
+    return {
+        'orphans': orphans,
+        'missing': missing,
+        'oversized_models': oversized,
+        'unreadable': unreadable,
+        'duplicates': duplicates,
+    }
+
+def summarize(entries):
+    """File counts and bytes per kind"""
+    totals = {}
+    for entry in entries.values():
+        kind = totals.setdefault(entry.get('kind', 'unknown'), {'files': 0, 'bytes': 0})
+        kind['files'] += 1
+        kind['bytes'] += entry['size']
+    return totals
+
+def print_section(title, items, describe):
+    """Print a section of findings"""
     print(f"\n{'='*70}")
-    print(f"  SUMMARY")
+    print(f"  {title} ({len(items)})")
     print(f"{'='*70}")
-    print(f"  Total Assets: {total_assets} files")
-    print(f"  Total Size: {format_size(total_size)}")
-    print(f"  Images: {len(images)} files ({format_size(images_total)})")
-    print(f"  Models: {len(models)} files ({format_size(models_total)})")
-    print(f"  Avatars: {len(avatars)} files ({format_size(avatars_total)})")
-    print(f"{'='*70}\n")
     
-    # Recommendations
-    print("💡 RECOMMENDATIONS:")
+    for item in items[:50]:
+        print(f"  {describe(item)}")
+    if len(items) > 50:
+        print(f"  ... and {len(items) - 50} more")
+
+def print_report(report):
+    """Human-readable version of the JSON report"""
+    print("\n" + "="*70)
+    print("  VisionCraft Asset Audit")
+    print("="*70)
+    print(f"  Scanned {report['scanned']} files ({report['inspected']} re-inspected) "
+          f"in {report['seconds']:.2f}s")
+    for kind, totals in sorted(report['totals'].items()):
+        print(f"  {kind.title()}s: {totals['files']} files ({format_size(totals['bytes'])})")
+    
+    print_section("Orphaned files", report['orphans'],
+                  lambda o: f"{o['path']}  {format_size(o['size'])}")
+    print_section("Missing files", report['missing'],
+                  lambda m: f"{m['table']} {m['id']} {m['column']}: {m['url']}")
+    print_section("Oversized models", report['oversized_models'],
+                  lambda m: f"{m['path']}  {format_size(m['size'])}, {m['triangles']} triangles")
+    print_section("Unreadable files", report['unreadable'],
+                  lambda u: f"{u['path']}: {u['error']}")
+    print_section("Duplicate content", report['duplicates'], lambda paths: ', '.join(paths))
+    print()
+
+def main():
+    """Main check function"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--text', action='store_true', help='print a readable report instead of JSON')
+    parser.add_argument('--jobs', '-j', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--manifest', type=Path, default=MANIFEST_PATH, help='manifest cache file')
+    parser.add_argument('--max-model-mb', type=float, default=MAX_MODEL_BYTES / 1024 / 1024)
+    parser.add_argument('--max-triangles', type=int, default=MAX_MODEL_TRIANGLES)
+    args = parser.parse_args()
     
-    if len(images) < 10:
-        print("  • Consider adding more product images for better user experience")
+    from app import app
+    from asset_store import local_path
     
-    if len(models) < len(images):
-        print("  • Some products are missing 3D models for AR viewing")
+    started = time.monotonic()
+    with app.app_context():
+        roots = [IMAGES_DIR, MODELS_DIR, AVATARS_DIR, Path(app.config['ASSET_STORE_DIR'])]
+        files = scan(roots)
+        entries, inspected = inspect_all(files, load_manifest(args.manifest), args.jobs)
+        save_manifest(args.manifest, entries)
     
-    if models_total > 50 * 1024 * 1024:  # 50MB
-        print("  • Consider optimizing 3D models - total size is quite large")
+        report = {
+            'scanned': len(entries),
+            'inspected': inspected,
+            'totals': summarize(entries),
+            **audit(entries, referenced_urls(), local_path,
+                    args.max_model_mb * 1024 * 1024, args.max_triangles),
+        }
+    report['seconds'] = round(time.monotonic() - started, 3)
     
-    print("\n📚 For more information, see ASSETS_GUIDE.md\n")
+    if args.text:
+        print_report(report)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    return 1 if report['missing'] else 0
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
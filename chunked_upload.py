@@ -0,0 +1,179 @@
+"""
+Resumable chunked uploads for large 3D models
+The client creates an upload, PUTs fixed-size chunks (each with its SHA-256) in any
+order and as often as it needs, then submits the artwork form with the upload id.
+Chunks are streamed to disk in small pieces, so memory stays flat however big the
+model is, and a dropped connection only costs the chunk that was in flight.
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import secrets
+import shutil
+import time
+from flask import current_app
+
+CHUNK_SIZE = 4 * 1024 * 1024
+READ_SIZE = 64 * 1024
+SESSION_TTL = 24 * 60 * 60  # seconds without a new chunk before `flask gc-assets` removes an upload
+UPLOAD_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+def upload_root():
+    return os.path.join(current_app.config['ASSET_STORE_DIR'], 'uploads')
+
+
+def _upload_dir(upload_id):
+    if not UPLOAD_ID_PATTERN.match(upload_id or ''):
+        raise LookupError('Upload not found')
+    return os.path.join(upload_root(), upload_id)
+
+
+def _load(upload_id, user_id):
+    """Metadata for an upload owned by user_id; LookupError if missing, expired or someone else's"""
+    directory = _upload_dir(upload_id)
+    try:
+        with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        raise LookupError('Upload not found')
+    if meta['user_id'] != user_id:
+        raise LookupError('Upload not found')
+    return meta
+
+
+def _chunk_path(upload_id, index):
+    return os.path.join(_upload_dir(upload_id), f'{index}.part')
+
+
+def _expected_length(meta, index):
+    if index == meta['total_chunks'] - 1:
+        return meta['size'] - meta['chunk_size'] * index
+    return meta['chunk_size']
+
+
+# ==================== API ====================
+
+def create(user_id, filename, size, allowed_ext, max_size):
+    """Start an upload; returns its status dict"""
+    ext = os.path.splitext(filename or '')[1].lower()
+    if ext not in allowed_ext:
+        raise ValueError(f"Unsupported file type; allowed: {', '.join(sorted(allowed_ext))}")
+    if not isinstance(size, int) or size <= 0:
+        raise ValueError('size must be a positive number of bytes')
+    if size > max_size:
+        raise ValueError(f'File is too large (max {max_size // (1024 * 1024)}MB)')
+
+    upload_id = secrets.token_hex(16)
+    directory = _upload_dir(upload_id)
+    os.makedirs(directory)
+    meta = {
+        'upload_id': upload_id,
+        'user_id': user_id,
+        'ext': ext,
+        'size': size,
+        'chunk_size': CHUNK_SIZE,
+        'total_chunks': math.ceil(size / CHUNK_SIZE),
+        'created_at': time.time(),
+    }
+    with open(os.path.join(directory, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    return status(upload_id, user_id)
+
+
+def status(upload_id, user_id):
+    """Upload parameters plus the chunk indices already received, for resuming"""
+    meta = _load(upload_id, user_id)
+    received = sorted(int(name[:-5]) for name in os.listdir(_upload_dir(upload_id)) if name.endswith('.part'))
+    return {
+        'upload_id': upload_id,
+        'size': meta['size'],
+        'chunk_size': meta['chunk_size'],
+        'total_chunks': meta['total_chunks'],
+        'received': received,
+    }
+
+
+def write_chunk(upload_id, user_id, index, stream, content_length, sha256_hex):
+    """
+    Stream one chunk to disk and keep it only if its length and SHA-256 match.
+    Re-sending a chunk simply replaces it.
+    """
+    meta = _load(upload_id, user_id)
+    if not 0 <= index < meta['total_chunks']:
+        raise ValueError('Chunk index out of range')
+    expected = _expected_length(meta, index)
+    if content_length != expected:
+        raise ValueError(f'Chunk {index} must be {expected} bytes')
+    if not sha256_hex:
+        raise ValueError('Missing chunk checksum')
+
+    final_path = _chunk_path(upload_id, index)
+    tmp_path = f'{final_path}.{secrets.token_hex(4)}.tmp'
+    digest = hashlib.sha256()
+    written = 0
+    try:
+        with open(tmp_path, 'wb') as f:
+            for piece in iter(lambda: stream.read(READ_SIZE), b''):
+                digest.update(piece)
+                f.write(piece)
+                written += len(piece)
+        if written != expected:
+            raise ValueError(f'Chunk {index} was cut short ({written} of {expected} bytes)')
+        if digest.hexdigest() != sha256_hex.lower():
+            raise ValueError(f'Chunk {index} checksum mismatch')
+        os.replace(tmp_path, final_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class AssembledUpload:
+    """File-like reader over an upload's chunks in order, for asset_store.save_upload()"""
+
+    def __init__(self, upload_id, user_id):
+        self.meta = _load(upload_id, user_id)
+        self.upload_id = upload_id
+        missing = [i for i in range(self.meta['total_chunks']) if not os.path.exists(_chunk_path(upload_id, i))]
+        if missing:
+            raise ValueError(f'{len(missing)} of {self.meta["total_chunks"]} chunks have not been uploaded')
+        self._index = 0
+        self._file = None
+
+    def read(self, size=-1):
+        while self._index < self.meta['total_chunks']:
+            if self._file is None:
+                self._file = open(_chunk_path(self.upload_id, self._index), 'rb')
+            data = self._file.read(size)
+            if data:
+                return data
+            self._file.close()
+            self._file = None
+            self._index += 1
+        return b''
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def discard(upload_id):
+    """Delete an upload's chunks once it has been stored (or rejected)"""
+    shutil.rmtree(_upload_dir(upload_id), ignore_errors=True)
+
+
+def expire_stale():
+    """Remove uploads with no new chunk for SESSION_TTL; returns how many were removed"""
+    root = upload_root()
+    if not os.path.isdir(root):
+        return 0
+    cutoff = time.time() - SESSION_TTL
+    removed = 0
+    for entry in os.scandir(root):
+        if entry.is_dir() and entry.stat().st_mtime < cutoff:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+    return removed
@@ -0,0 +1,129 @@
+"""
+Streaming exports of seller orders and daily analytics
+Rows are read with yield_per and written out one chunk at a time, so memory
+stays flat no matter how long the seller's history is
+"""
+import csv
+import io
+import json
+from datetime import timedelta
+from models import db, Artwork, ArtworkDailyStat, Order, OrderItem
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+ORDER_STATUSES = ('pending', 'processing', 'shipped', 'delivered', 'cancelled')
+FETCH_SIZE = 1000
+ROWS_PER_CHUNK = 500
+
+# Spreadsheets run a cell starting with one of these as a formula (CSV injection)
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+ORDER_COLUMNS = (
+    ('order_number', Order.order_number),
+    ('ordered_at', Order.created_at),
+    ('status', Order.status),
+    ('artwork_id', OrderItem.artwork_id),
+    ('artwork_title', OrderItem.artwork_title),
+    ('unit_price', OrderItem.artwork_price),
+    ('quantity', OrderItem.quantity),
+    ('subtotal', OrderItem.subtotal),
+    ('shipping_city', Order.shipping_city),
+    ('shipping_state', Order.shipping_state),
+)
+
+ANALYTICS_COLUMNS = (
+    ('day', ArtworkDailyStat.day),
+    ('artwork_id', ArtworkDailyStat.artwork_id),
+    ('artwork_title', Artwork.title),
+    ('views', ArtworkDailyStat.views),
+    ('likes', ArtworkDailyStat.likes),
+    ('ar_sessions', ArtworkDailyStat.ar_sessions),
+    ('ar_placements', ArtworkDailyStat.ar_placements),
+    ('ar_snapshots', ArtworkDailyStat.ar_snapshots),
+    ('units_sold', ArtworkDailyStat.units_sold),
+    ('revenue', ArtworkDailyStat.revenue),
+)
+
+
+# ==================== QUERIES ====================
+
+def order_rows(seller_id, start=None, end=None, status=None):
+    """Order lines for the seller's artworks, oldest first; start/end are inclusive dates"""
+    query = db.session.query(*[column for _, column in ORDER_COLUMNS]).select_from(OrderItem).join(
+        Order, Order.id == OrderItem.order_id
+    ).join(
+        Artwork, Artwork.id == OrderItem.artwork_id
+    ).filter(Artwork.user_id == seller_id)
+
+    if start:
+        query = query.filter(Order.created_at >= start)
+    if end:
+        query = query.filter(Order.created_at < end + timedelta(days=1))
+    if status:
+        query = query.filter(Order.status == status)
+
+    return query.order_by(Order.created_at, OrderItem.id).execution_options(yield_per=FETCH_SIZE)
+
+
+def analytics_rows(seller_id, start=None, end=None):
+    """Daily rollup rows for the seller, by day then artwork"""
+    query = db.session.query(*[column for _, column in ANALYTICS_COLUMNS]).join(
+        Artwork, Artwork.id == ArtworkDailyStat.artwork_id
+    ).filter(ArtworkDailyStat.seller_id == seller_id)
+
+    if start:
+        query = query.filter(ArtworkDailyStat.day >= start)
+    if end:
+        query = query.filter(ArtworkDailyStat.day <= end)
+
+    return query.order_by(ArtworkDailyStat.day, ArtworkDailyStat.artwork_id).execution_options(
+        yield_per=FETCH_SIZE
+    )
+
+
+# ==================== WRITERS ====================
+
+def _plain(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def _csv_cell(value):
+    """_plain(), with text a spreadsheet would evaluate escaped by a leading apostrophe"""
+    value = _plain(value)
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def stream_csv(columns, rows):
+    """Yield CSV text in chunks of ROWS_PER_CHUNK rows, header first. Text cells that
+    start like a formula get a leading apostrophe (NDJSON keeps the values as they are)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in columns])
+    for count, row in enumerate(rows, 1):
+        writer.writerow([_csv_cell(value) for value in row])
+        if count % ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_ndjson(columns, rows):
+    """Yield one JSON object per line, in chunks of ROWS_PER_CHUNK rows"""
+    names = [name for name, _ in columns]
+    chunk = []
+    for row in rows:
+        chunk.append(json.dumps(dict(zip(names, map(_plain, row))), separators=(',', ':')))
+        if len(chunk) == ROWS_PER_CHUNK:
+            yield '\n'.join(chunk) + '\n'
+            chunk = []
+    if chunk:
+        yield '\n'.join(chunk) + '\n'
+
+
+def stream_export(fmt, columns, rows):
+    return (stream_csv if fmt == 'csv' else stream_ndjson)(columns, rows)
@@ -0,0 +1,655 @@
+"""
+Minimal glTF 2.0 / GLB reader, validator and optimiser for uploaded AR models
+Pure Python (struct/array) so it runs anywhere the app does. Optimising re-emits the
+model as a single GLB with deduplicated, tightly packed accessors, quantised normals,
+tangents, UVs and indices (KHR_mesh_quantization), downscaled textures and, for the
+LOD variant, meshes simplified by vertex clustering.
+"""
+import base64
+import copy
+import io
+import json
+import math
+import os
+import struct
+import sys
+from array import array
+from PIL import Image
+
+GLB_MAGIC = b'glTF'
+CHUNK_JSON = 0x4E4F534A
+CHUNK_BIN = 0x004E4942
+
+ARRAY_BUFFER = 34962
+ELEMENT_ARRAY_BUFFER = 34963
+MODE_TRIANGLES = 4
+
+# componentType -> (array/struct typecode, size in bytes)
+COMPONENT_TYPES = {
+    5120: ('b', 1),  # BYTE
+    5121: ('B', 1),  # UNSIGNED_BYTE
+    5122: ('h', 2),  # SHORT
+    5123: ('H', 2),  # UNSIGNED_SHORT
+    5125: ('I', 4),  # UNSIGNED_INT
+    5126: ('f', 4),  # FLOAT
+}
+TYPE_COMPONENTS = {'SCALAR': 1, 'VEC2': 2, 'VEC3': 3, 'VEC4': 4, 'MAT2': 4, 'MAT3': 9, 'MAT4': 16}
+
+# Extensions that store data we would not carry over when rewriting buffers
+UNSUPPORTED_EXTENSIONS = {'KHR_draco_mesh_compression', 'EXT_meshopt_compression', 'EXT_mesh_gpu_instancing'}
+QUANTIZATION_EXTENSION = 'KHR_mesh_quantization'
+
+# check_file() parses at most this much JSON during an upload request
+MAX_CHECK_JSON_BYTES = 16 * 1024 * 1024
+
+
+class GltfError(ValueError):
+    """Raised for files that are not valid glTF 2.0, or that we can't process"""
+
+
+# ==================== LOADING ====================
+
+class Gltf:
+    """A parsed model: the JSON document plus the bytes of each buffer"""
+
+    def __init__(self, doc, buffers, image_data=None):
+        self.doc = doc
+        self.buffers = buffers
+        self.image_data = image_data or {}  # image index -> bytes, for data: URIs in .gltf files
+
+    def view_bytes(self, view_index):
+        view = self.doc['bufferViews'][view_index]
+        start = view.get('byteOffset', 0)
+        return self.buffers[view['buffer']][start:start + view['byteLength']]
+
+    def read_accessor(self, index):
+        """Accessor values as a list of tuples (sparse accessors are resolved)"""
+        accessor = self.doc['accessors'][index]
+        typecode, size = COMPONENT_TYPES[accessor['componentType']]
+        components = TYPE_COMPONENTS[accessor['type']]
+        count = accessor['count']
+        element_format = '<' + typecode * components
+
+        if 'bufferView' in accessor:
+            view = self.doc['bufferViews'][accessor['bufferView']]
+            data = self.view_bytes(accessor['bufferView'])
+            offset = accessor.get('byteOffset', 0)
+            stride = view.get('byteStride') or size * components
+            if stride == size * components:
+                end = offset + stride * count
+                values = list(struct.iter_unpack(element_format, data[offset:end]))
+            else:
+                values = [struct.unpack_from(element_format, data, offset + i * stride) for i in range(count)]
+        else:
+            values = [(0,) * components] * count
+
+        sparse = accessor.get('sparse')
+        if sparse:
+            index_code, _ = COMPONENT_TYPES[sparse['indices']['componentType']]
+            indices_data = self.view_bytes(sparse['indices']['bufferView'])
+            values_data = self.view_bytes(sparse['values']['bufferView'])
+            indices = struct.unpack_from(f"<{sparse['count']}{index_code}", indices_data,
+                                         sparse['indices'].get('byteOffset', 0))
+            replacements = struct.iter_unpack(element_format, values_data[
+                sparse['values'].get('byteOffset', 0):
+                sparse['values'].get('byteOffset', 0) + sparse['count'] * size * components])
+            values = list(values)
+            for i, value in zip(indices, replacements):
+                values[i] = value
+        return values
+
+    def image_bytes(self, index):
+        image = self.doc['images'][index]
+        if index in self.image_data:
+            return self.image_data[index]
+        return self.view_bytes(image['bufferView'])
+
+
+def _decode_data_uri(uri):
+    header, _, data = uri.partition(',')
+    if not header.endswith(';base64'):
+        raise GltfError('Only base64 data: URIs are supported')
+    try:
+        return base64.b64decode(data, validate=True)
+    except ValueError:
+        raise GltfError('Malformed base64 data: URI')
+
+
+def parse(data):
+    """Parse GLB or .gltf bytes into a Gltf; external file references are rejected"""
+    glb_bin = None
+    if data[:4] == GLB_MAGIC:
+        if len(data) < 20:
+            raise GltfError('Truncated GLB header')
+        _, version, length = struct.unpack_from('<4sII', data)
+        if version != 2:
+            raise GltfError(f'Unsupported GLB version {version}')
+        if length != len(data):
+            raise GltfError('GLB length does not match file size')
+
+        offset, chunks = 12, []
+        while offset < length:
+            if offset + 8 > length:
+                raise GltfError('Truncated GLB chunk header')
+            chunk_length, chunk_type = struct.unpack_from('<II', data, offset)
+            if offset + 8 + chunk_length > length:
+                raise GltfError('GLB chunk runs past end of file')
+            chunks.append((chunk_type, data[offset + 8:offset + 8 + chunk_length]))
+            offset += 8 + chunk_length
+        if not chunks or chunks[0][0] != CHUNK_JSON:
+            raise GltfError('GLB is missing its JSON chunk')
+        json_bytes = chunks[0][1]
+        glb_bin = next((chunk for chunk_type, chunk in chunks[1:] if chunk_type == CHUNK_BIN), None)
+    else:
+        json_bytes = data
+
+    try:
+        doc = json.loads(json_bytes.decode('utf-8'))
+    except (UnicodeDecodeError, ValueError):
+        raise GltfError('Not a glTF or GLB file')
+    if not isinstance(doc, dict):
+        raise GltfError('glTF JSON must be an object')
+
+    buffers = []
+    for i, buffer in enumerate(doc.get('buffers', [])):
+        uri = buffer.get('uri')
+        if uri is None:
+            if i != 0 or glb_bin is None:
+                raise GltfError(f'Buffer {i} has no data')
+            buffer_data = glb_bin
+        elif uri.startswith('data:'):
+            buffer_data = _decode_data_uri(uri)
+        else:
+            raise GltfError('External .bin files are not supported; upload a .glb or a .gltf with embedded data')
+        if len(buffer_data) < buffer.get('byteLength', 0):
+            raise GltfError(f'Buffer {i} is shorter than its byteLength')
+        buffers.append(buffer_data)
+
+    image_data = {}
+    for i, image in enumerate(doc.get('images', [])):
+        uri = image.get('uri')
+        if uri is not None:
+            if not uri.startswith('data:'):
+                raise GltfError('External texture files are not supported; embed textures in the model')
+            image_data[i] = _decode_data_uri(uri)
+
+    return Gltf(doc, buffers, image_data)
+
+
+def load(path):
+    with open(path, 'rb') as f:
+        return parse(f.read())
+
+
+def load_valid(path):
+    """load() + validate(); malformed JSON structure also surfaces as GltfError"""
+    try:
+        model = load(path)
+        validate(model)
+    except (KeyError, IndexError, TypeError, AttributeError, struct.error) as e:
+        raise GltfError(f'Malformed glTF ({type(e).__name__})')
+    return model
+
+
+# ==================== UPLOAD CHECK ====================
+
+class _Sized:
+    """Stands in for buffer bytes when only their length is known"""
+
+    def __init__(self, length):
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+
+def _data_uri_length(uri):
+    """Decoded size of a base64 data: URI, without decoding it"""
+    header, _, data = uri.partition(',')
+    if not header.endswith(';base64'):
+        raise GltfError('Only base64 data: URIs are supported')
+    return len(data) * 3 // 4 - data[-2:].count('=')
+
+
+def _glb_chunks(f, size):
+    """[(type, offset, length)] from a GLB's chunk headers, seeking past the chunk data"""
+    header = f.read(12)
+    if len(header) < 12:
+        raise GltfError('Truncated GLB header')
+    _, version, length = struct.unpack('<4sII', header)
+    if version != 2:
+        raise GltfError(f'Unsupported GLB version {version}')
+    if length != size:
+        raise GltfError('GLB length does not match file size')
+
+    offset, chunks = 12, []
+    while offset < length:
+        if offset + 8 > length:
+            raise GltfError('Truncated GLB chunk header')
+        f.seek(offset)
+        chunk_length, chunk_type = struct.unpack('<II', f.read(8))
+        if offset + 8 + chunk_length > length:
+            raise GltfError('GLB chunk runs past end of file')
+        chunks.append((chunk_type, offset + 8, chunk_length))
+        offset += 8 + chunk_length
+    if not chunks or chunks[0][0] != CHUNK_JSON:
+        raise GltfError('GLB is missing its JSON chunk')
+    return chunks
+
+
+def _check(path):
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        if f.read(4) == GLB_MAGIC:
+            f.seek(0)
+            chunks = _glb_chunks(f, size)
+            _, json_offset, json_length = chunks[0]
+            bin_length = next((length for chunk_type, _, length in chunks[1:] if chunk_type == CHUNK_BIN), None)
+        elif size <= MAX_CHECK_JSON_BYTES:
+            json_offset, json_length, bin_length = 0, size, None
+        else:
+            # A large .gltf is mostly base64 buffers; leave it to the background job
+            f.seek(0)
+            if f.read(64).lstrip()[:1] != b'{':
+                raise GltfError('Not a glTF or GLB file')
+            return
+        if json_length > MAX_CHECK_JSON_BYTES:
+            raise GltfError('glTF JSON is too large')
+        f.seek(json_offset)
+        json_bytes = f.read(json_length)
+
+    try:
+        doc = json.loads(json_bytes.decode('utf-8'))
+    except (UnicodeDecodeError, ValueError):
+        raise GltfError('Not a glTF or GLB file')
+    if not isinstance(doc, dict):
+        raise GltfError('glTF JSON must be an object')
+
+    buffers = []
+    for i, buffer in enumerate(doc.get('buffers', [])):
+        uri = buffer.get('uri')
+        if uri is None:
+            if i != 0 or bin_length is None:
+                raise GltfError(f'Buffer {i} has no data')
+            length = bin_length
+        elif uri.startswith('data:'):
+            length = _data_uri_length(uri)
+        else:
+            raise GltfError('External .bin files are not supported; upload a .glb or a .gltf with embedded data')
+        if length < buffer.get('byteLength', 0):
+            raise GltfError(f'Buffer {i} is shorter than its byteLength')
+        buffers.append(_Sized(length))
+
+    image_data = {}
+    for i, image in enumerate(doc.get('images', [])):
+        uri = image.get('uri')
+        if uri is not None:
+            if not uri.startswith('data:'):
+                raise GltfError('External texture files are not supported; embed textures in the model')
+            image_data[i] = None
+    validate(Gltf(doc, buffers, image_data))
+
+
+def check_file(path):
+    """
+    Upload-time check that reads only the GLB header, chunk headers and JSON chunk (or a
+    small .gltf) from disk, so memory doesn't grow with the model. The JSON gets the full
+    validate(); buffer data is only checked for length. load_valid() in the model_variants
+    job parses everything. Raises GltfError.
+    """
+    try:
+        _check(path)
+    except (KeyError, IndexError, TypeError, AttributeError, struct.error) as e:
+        raise GltfError(f'Malformed glTF ({type(e).__name__})')
+
+
+# ==================== VALIDATION ====================
+
+def _check_index(doc, key, index, what):
+    if not isinstance(index, int) or not 0 <= index < len(doc.get(key, [])):
+        raise GltfError(f'{what} refers to missing {key[:-1]} {index}')
+
+
+def validate(model):
+    """Structural checks that catch truncated or hand-edited files; raises GltfError"""
+    doc = model.doc
+    if not str(doc.get('asset', {}).get('version', '')).startswith('2.'):
+        raise GltfError('Only glTF 2.0 is supported')
+
+    for i, view in enumerate(doc.get('bufferViews', [])):
+        _check_index(doc, 'buffers', view.get('buffer'), f'bufferView {i}')
+        end = view.get('byteOffset', 0) + view.get('byteLength', 0)
+        if end > len(model.buffers[view['buffer']]):
+            raise GltfError(f'bufferView {i} runs past the end of its buffer')
+        stride = view.get('byteStride')
+        if stride is not None and (stride < 4 or stride > 252 or stride % 4):
+            raise GltfError(f'bufferView {i} has invalid byteStride {stride}')
+
+    for i, accessor in enumerate(doc.get('accessors', [])):
+        if accessor.get('componentType') not in COMPONENT_TYPES or accessor.get('type') not in TYPE_COMPONENTS:
+            raise GltfError(f'accessor {i} has an invalid componentType or type')
+        _, size = COMPONENT_TYPES[accessor['componentType']]
+        if accessor['type'].startswith('MAT') and size < 4:
+            raise GltfError(f'accessor {i}: padded matrix accessors are not supported')
+        count = accessor.get('count')
+        if not isinstance(count, int) or count < 1:
+            raise GltfError(f'accessor {i} has an invalid count')
+        if 'bufferView' in accessor:
+            _check_index(doc, 'bufferViews', accessor['bufferView'], f'accessor {i}')
+            view = doc['bufferViews'][accessor['bufferView']]
+            element = size * TYPE_COMPONENTS[accessor['type']]
+            stride = view.get('byteStride') or element
+            if accessor.get('byteOffset', 0) + stride * (count - 1) + element > view['byteLength']:
+                raise GltfError(f'accessor {i} reads past the end of its bufferView')
+        sparse = accessor.get('sparse')
+        if sparse:
+            _check_index(doc, 'bufferViews', sparse.get('indices', {}).get('bufferView'), f'accessor {i} sparse')
+            _check_index(doc, 'bufferViews', sparse.get('values', {}).get('bufferView'), f'accessor {i} sparse')
+
+    for m, mesh in enumerate(doc.get('meshes', [])):
+        if not mesh.get('primitives'):
+            raise GltfError(f'mesh {m} has no primitives')
+        for primitive in mesh['primitives']:
+            attributes = primitive.get('attributes', {})
+            if 'POSITION' not in attributes:
+                raise GltfError(f'mesh {m} has a primitive without POSITION')
+            for name, index in attributes.items():
+                _check_index(doc, 'accessors', index, f'mesh {m} attribute {name}')
+            counts = {doc['accessors'][index]['count'] for index in attributes.values()}
+            if len(counts) > 1:
+                raise GltfError(f'mesh {m} has attributes with different vertex counts')
+            if 'indices' in primitive:
+                _check_index(doc, 'accessors', primitive['indices'], f'mesh {m} indices')
+                indices = doc['accessors'][primitive['indices']]
+                if indices['type'] != 'SCALAR' or indices['componentType'] not in (5121, 5123, 5125):
+                    raise GltfError(f'mesh {m} has invalid index accessor')
+            for target in primitive.get('targets', []):
+                for name, index in target.items():
+                    _check_index(doc, 'accessors', index, f'mesh {m} morph target {name}')
+
+    for i, image in enumerate(doc.get('images', [])):
+        if 'bufferView' in image:
+            _check_index(doc, 'bufferViews', image['bufferView'], f'image {i}')
+            if not image.get('mimeType'):
+                raise GltfError(f'image {i} is missing mimeType')
+        elif i not in model.image_data:
+            raise GltfError(f'image {i} has no data')
+    for i, texture in enumerate(doc.get('textures', [])):
+        if 'source' in texture:
+            _check_index(doc, 'images', texture['source'], f'texture {i}')
+    for i, node in enumerate(doc.get('nodes', [])):
+        if 'mesh' in node:
+            _check_index(doc, 'meshes', node['mesh'], f'node {i}')
+        for child in node.get('children', []):
+            _check_index(doc, 'nodes', child, f'node {i}')
+    for i, scene in enumerate(doc.get('scenes', [])):
+        for node in scene.get('nodes', []):
+            _check_index(doc, 'nodes', node, f'scene {i}')
+
+    if not doc.get('meshes'):
+        raise GltfError('Model contains no meshes')
+
+
+def triangle_count(doc):
+    """Triangles across all mesh definitions (triangle lists, strips and fans)"""
+    total = 0
+    for mesh in doc.get('meshes', []):
+        for primitive in mesh.get('primitives', []):
+            mode = primitive.get('mode', MODE_TRIANGLES)
+            source = primitive['indices'] if 'indices' in primitive else primitive['attributes']['POSITION']
+            count = doc['accessors'][source]['count']
+            if mode == MODE_TRIANGLES:
+                total += count // 3
+            elif mode in (5, 6):  # TRIANGLE_STRIP, TRIANGLE_FAN
+                total += max(0, count - 2)
+    return total
+
+
+# ==================== SIMPLIFICATION ====================
+
+def _canonical(triangle):
+    # Rotate so the smallest index is first; keeps winding, so back-to-back faces both survive
+    a, b, c = triangle
+    if a <= b and a <= c:
+        return a, b, c
+    if b <= c:
+        return b, c, a
+    return c, a, b
+
+
+def _cluster(positions, triangles, grid):
+    xs, ys, zs = zip(*positions)
+    lows = (min(xs), min(ys), min(zs))
+    spans = [max(axis) - low for axis, low in zip((xs, ys, zs), lows)]
+    scales = [(grid - 1e-6) / span if span > 0 else 0 for span in spans]
+
+    representative, vertex_map = {}, []
+    for i, (x, y, z) in enumerate(positions):
+        cell = (int((x - lows[0]) * scales[0]), int((y - lows[1]) * scales[1]), int((z - lows[2]) * scales[2]))
+        vertex_map.append(representative.setdefault(cell, i))
+
+    seen, kept = set(), []
+    for a, b, c in triangles:
+        a, b, c = vertex_map[a], vertex_map[b], vertex_map[c]
+        if a == b or b == c or a == c:
+            continue
+        key = _canonical((a, b, c))
+        if key not in seen:
+            seen.add(key)
+            kept.append(key)
+    return kept
+
+
+def simplify(positions, indices, target_triangles):
+    """
+    Vertex-clustering decimation: snap vertices to a grid and drop collapsed triangles.
+    Returns (kept original vertex ids, new triangle indices into that list).
+    """
+    triangles = [tuple(indices[i:i + 3]) for i in range(0, len(indices) - 2, 3)]
+    grid = max(4, int(math.sqrt(target_triangles / 2)))
+    kept = triangles
+    for _ in range(4):
+        kept = _cluster(positions, triangles, grid)
+        if len(kept) <= target_triangles * 1.2 or grid <= 4:
+            break
+        grid = max(4, int(grid * math.sqrt(target_triangles / len(kept)) * 0.95))
+
+    remap, vertices = {}, []
+    new_indices = []
+    for triangle in kept:
+        for vertex in triangle:
+            if vertex not in remap:
+                remap[vertex] = len(vertices)
+                vertices.append(vertex)
+            new_indices.append(remap[vertex])
+    return vertices, new_indices
+
+
+# ==================== WRITING ====================
+
+def _to_bytes(typecode, flat):
+    values = array(typecode, flat)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tobytes()
+
+
+class _Writer:
+    """Accumulates one binary buffer plus bufferViews/accessors, deduplicating identical data"""
+
+    def __init__(self):
+        self.bin = bytearray()
+        self.views = []
+        self.accessors = []
+        self._dedup = {}
+        self.quantized = False
+
+    def add_view(self, data, target=None, stride=None):
+        self.bin.extend(b'\0' * (-len(self.bin) % 4))
+        view = {'buffer': 0, 'byteOffset': len(self.bin), 'byteLength': len(data)}
+        if target:
+            view['target'] = target
+        if stride:
+            view['byteStride'] = stride
+        self.bin.extend(data)
+        self.views.append(view)
+        return len(self.views) - 1
+
+    def add_accessor(self, values, source, semantic):
+        """Write values (list of tuples) with the source accessor's type, quantising by semantic"""
+        component_type = source['componentType']
+        normalized = source.get('normalized', False)
+        accessor_type = source['type']
+        components = TYPE_COMPONENTS[accessor_type]
+        bounds = None
+        is_float = component_type == 5126
+
+        if semantic in ('NORMAL', 'TANGENT') and is_float:
+            # Unit vectors fit in signed bytes (KHR_mesh_quantization)
+            component_type, normalized = 5120, True
+            values = [tuple(max(-127, min(127, round(v * 127))) for v in value) for value in values]
+            self.quantized = True
+        elif semantic.startswith('TEXCOORD_') and is_float and values and \
+                all(0.0 <= v <= 1.0 for value in values for v in value):
+            component_type, normalized = 5123, True
+            values = [tuple(round(v * 65535) for v in value) for value in values]
+            self.quantized = True
+        elif semantic == 'INDICES' and component_type == 5125 and max(v[0] for v in values) < 65535:
+            component_type = 5123
+        elif semantic == 'POSITION' or 'min' in source:
+            # POSITION must carry bounds; recompute them since simplification may change them
+            bounds = ([min(value[c] for value in values) for c in range(components)],
+                      [max(value[c] for value in values) for c in range(components)])
+
+        typecode, size = COMPONENT_TYPES[component_type]
+        element = size * components
+        # Vertex attributes must start on 4-byte boundaries, so pad short elements
+        stride = element + (-element % 4) if semantic != 'INDICES' and semantic != 'OTHER' else element
+        if stride != element:
+            pad = (stride - element) // size
+            flat = [v for value in values for v in (*value, *(0,) * pad)]
+        else:
+            flat = [v for value in values for v in value]
+        data = _to_bytes(typecode, flat)
+
+        key = (component_type, accessor_type, normalized, len(values), stride, data)
+        if key in self._dedup:
+            return self._dedup[key]
+
+        target = ELEMENT_ARRAY_BUFFER if semantic == 'INDICES' else None if semantic == 'OTHER' else ARRAY_BUFFER
+        accessor = {
+            'bufferView': self.add_view(data, target, stride if target == ARRAY_BUFFER and stride != element else None),
+            'componentType': component_type,
+            'count': len(values),
+            'type': accessor_type,
+        }
+        if normalized:
+            accessor['normalized'] = True
+        if bounds:
+            accessor['min'], accessor['max'] = bounds
+        self.accessors.append(accessor)
+        self._dedup[key] = len(self.accessors) - 1
+        return self._dedup[key]
+
+
+def _downscale_image(data, mime_type, max_size):
+    """Re-encode an embedded PNG/JPEG no larger than max_size; other formats pass through"""
+    if mime_type not in ('image/png', 'image/jpeg'):
+        return data
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            if max(image.size) <= max_size:
+                return data
+            image.thumbnail((max_size, max_size), Image.LANCZOS)
+            out = io.BytesIO()
+            if mime_type == 'image/png':
+                image.save(out, 'PNG', optimize=True)
+            else:
+                image.convert('RGB').save(out, 'JPEG', quality=85, optimize=True)
+            return out.getvalue()
+    except (OSError, Image.DecompressionBombError):
+        return data
+
+
+def optimize(model, max_texture_size=2048, lod_ratio=None, lod_min_triangles=500):
+    """
+    Re-emit the model as GLB bytes. With lod_ratio, indexed or plain triangle lists with
+    at least lod_min_triangles triangles are simplified to about that fraction.
+    """
+    doc = model.doc
+    used = set(doc.get('extensionsUsed', []))
+    if used & UNSUPPORTED_EXTENSIONS:
+        raise GltfError(f"Can't optimise models using {', '.join(sorted(used & UNSUPPORTED_EXTENSIONS))}")
+
+    out = copy.deepcopy({key: value for key, value in doc.items()
+                         if key not in ('buffers', 'bufferViews', 'accessors')})
+    writer = _Writer()
+    cache = {}
+
+    def emit(index, semantic):
+        if (index, semantic) not in cache:
+            cache[(index, semantic)] = writer.add_accessor(model.read_accessor(index), doc['accessors'][index],
+                                                           semantic)
+        return cache[(index, semantic)]
+
+    for mesh in out.get('meshes', []):
+        for primitive in mesh['primitives']:
+            attributes = primitive['attributes']
+            simplified = None
+            if lod_ratio and primitive.get('mode', MODE_TRIANGLES) == MODE_TRIANGLES and not primitive.get('targets'):
+                positions = model.read_accessor(attributes['POSITION'])
+                indices = ([v[0] for v in model.read_accessor(primitive['indices'])]
+                           if 'indices' in primitive else list(range(len(positions))))
+                if len(indices) // 3 >= lod_min_triangles:
+                    simplified = simplify(positions, indices, max(lod_min_triangles, int(len(indices) // 3 * lod_ratio)))
+
+            if simplified:
+                vertices, new_indices = simplified
+                for name, index in attributes.items():
+                    values = model.read_accessor(index)
+                    attributes[name] = writer.add_accessor([values[v] for v in vertices], doc['accessors'][index], name)
+                index_source = doc['accessors'][primitive['indices']] if 'indices' in primitive else \
+                    {'componentType': 5125, 'type': 'SCALAR'}
+                primitive['indices'] = writer.add_accessor([(i,) for i in new_indices], index_source, 'INDICES')
+            else:
+                for name, index in attributes.items():
+                    attributes[name] = emit(index, name)
+                if 'indices' in primitive:
+                    primitive['indices'] = emit(primitive['indices'], 'INDICES')
+            for target in primitive.get('targets', []):
+                for name, index in target.items():
+                    target[name] = emit(index, 'TARGET')
+
+    for animation in out.get('animations', []):
+        for sampler in animation.get('samplers', []):
+            sampler['input'] = emit(sampler['input'], 'OTHER')
+            sampler['output'] = emit(sampler['output'], 'OTHER')
+    for skin in out.get('skins', []):
+        if 'inverseBindMatrices' in skin:
+            skin['inverseBindMatrices'] = emit(skin['inverseBindMatrices'], 'OTHER')
+
+    for i, image in enumerate(out.get('images', [])):
+        mime_type = image.get('mimeType') or ('image/png' if model.image_bytes(i)[:4] == b'\x89PNG' else 'image/jpeg')
+        data = _downscale_image(model.image_bytes(i), mime_type, max_texture_size)
+        image.pop('uri', None)
+        image['bufferView'] = writer.add_view(data)
+        image['mimeType'] = mime_type
+
+    if writer.quantized:
+        out['extensionsUsed'] = sorted(used | {QUANTIZATION_EXTENSION})
+        out['extensionsRequired'] = sorted(set(doc.get('extensionsRequired', [])) | {QUANTIZATION_EXTENSION})
+    out['buffers'] = [{'byteLength': len(writer.bin)}]
+    out['bufferViews'] = writer.views
+    out['accessors'] = writer.accessors
+    return to_glb(out, bytes(writer.bin))
+
+
+def to_glb(doc, binary):
+    json_bytes = json.dumps(doc, separators=(',', ':')).encode('utf-8')
+    json_bytes += b' ' * (-len(json_bytes) % 4)
+    binary += b'\0' * (-len(binary) % 4)
+    length = 12 + 8 + len(json_bytes) + (8 + len(binary) if binary else 0)
+    parts = [struct.pack('<4sII', GLB_MAGIC, 2, length), struct.pack('<II', len(json_bytes), CHUNK_JSON), json_bytes]
+    if binary:
+        parts += [struct.pack('<II', len(binary), CHUNK_BIN), binary]
+    return b''.join(parts)
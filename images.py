@@ -0,0 +1,136 @@
+"""
+Image derivative pipeline for artwork images and avatars
+Uploads are resized to a few fixed widths in WebP (and AVIF where Pillow supports it)
+with metadata stripped; the work runs as a background job (see jobs.py)
+"""
+import json
+import os
+from PIL import Image, ImageOps, features
+from sqlalchemy import or_
+from models import db, Artwork, User
+from jobs import enqueue, handler
+from asset_store import local_path
+
+ARTWORK_WIDTHS = {'grid': 400, 'detail': 1024, 'zoom': 2048}
+AVATAR_WIDTHS = {'small': 64, 'profile': 200, 'large': 400}
+
+# Preferred first; <picture> lets the browser take the first type it supports
+FORMATS = [fmt for fmt in ('avif', 'webp') if features.check(fmt)]
+MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp'}
+SAVE_OPTIONS = {
+    'avif': {'quality': 55, 'speed': 6},
+    'webp': {'quality': 80, 'method': 4},
+}
+DERIVED_DIRNAME = 'derived'
+
+
+def generate_derivatives(source_path, widths):
+    """
+    Write resized copies of source_path next to it, under derived/.
+    Returns {format: {width: filename}}. Widths wider than the source are skipped;
+    a source narrower than every target gets one copy at its own width.
+    """
+    out_dir = os.path.join(os.path.dirname(source_path), DERIVED_DIRNAME)
+    os.makedirs(out_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+
+    with Image.open(source_path) as original:
+        # Apply the EXIF rotation, then rebuild from pixels only so no metadata survives
+        image = ImageOps.exif_transpose(original)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        clean = Image.new(image.mode, image.size)
+        clean.paste(image)
+
+    targets = sorted(width for width in widths.values() if width <= clean.width) or [clean.width]
+
+    variants = {fmt: {} for fmt in FORMATS}
+    for width in targets:
+        height = max(1, round(clean.height * width / clean.width))
+        resized = clean if width == clean.width else clean.resize((width, height), Image.LANCZOS)
+        for fmt in FORMATS:
+            filename = f'{stem}-{width}.{fmt}'
+            resized.save(os.path.join(out_dir, filename), fmt.upper(), **SAVE_OPTIONS[fmt])
+            variants[fmt][width] = filename
+    return variants
+
+
+def variants_to_urls(variants, url_prefix):
+    """Turn generate_derivatives() output into the JSON stored on the model"""
+    return json.dumps({
+        fmt: {str(width): f'{url_prefix}/{DERIVED_DIRNAME}/{filename}' for width, filename in sizes.items()}
+        for fmt, sizes in variants.items()
+    })
+
+
+def picture_sources(variants_json):
+    """[(mime type, srcset)] for a stored variants column, best format first"""
+    if not variants_json:
+        return []
+    try:
+        variants = json.loads(variants_json)
+    except ValueError:
+        return []
+    sources = []
+    for fmt in FORMATS:
+        sizes = variants.get(fmt)
+        if sizes:
+            srcset = ', '.join(f'{url} {width}w' for width, url in sorted(sizes.items(), key=lambda s: int(s[0])))
+            sources.append((MIME_TYPES[fmt], srcset))
+    return sources
+
+
+def generate_missing():
+    """Synchronously build variants for local images that have none yet; returns rows updated"""
+    updated = 0
+    local = ('/static/%', '/media/%')
+    pending = [(row, row.image, ARTWORK_WIDTHS, 'image_variants')
+               for row in Artwork.query.filter(Artwork.image_variants.is_(None),
+                                               or_(*[Artwork.image.like(prefix) for prefix in local]))]
+    pending += [(row, row.avatar, AVATAR_WIDTHS, 'avatar_variants')
+                for row in User.query.filter(User.avatar_variants.is_(None),
+                                             or_(*[User.avatar.like(prefix) for prefix in local]))]
+    for row, url, widths, column in pending:
+        source_path = local_path(url)
+        if not os.path.isfile(source_path):
+            continue
+        try:
+            variants = generate_derivatives(source_path, widths)
+        except (OSError, Image.DecompressionBombError):
+            continue  # Unreadable or oversized upload; keep serving the original
+        setattr(row, column, variants_to_urls(variants, url.rsplit('/', 1)[0]))
+        db.session.commit()
+        updated += 1
+    return updated
+
+
+def queue_artwork_variants(artwork):
+    """Queue variant generation for an artwork's uploaded image (commits with the caller)"""
+    # Content-addressed uploads: the same bytes already processed for another artwork need no job
+    artwork.image_variants = db.session.query(Artwork.image_variants).filter(
+        Artwork.image == artwork.image, Artwork.image_variants.isnot(None)
+    ).limit(1).scalar()
+    if artwork.image_variants:
+        return
+    enqueue('image_variants', {'kind': 'artwork', 'id': artwork.id, 'url': artwork.image}, artwork_id=artwork.id)
+
+
+def queue_avatar_variants(user):
+    """Queue variant generation for a user's uploaded avatar (commits with the caller)"""
+    user.avatar_variants = None
+    enqueue('image_variants', {'kind': 'avatar', 'id': user.id, 'url': user.avatar})
+
+
+@handler('image_variants')
+def build_image_variants(payload):
+    """Job handler. Safe to re-run: files are overwritten in place, and the row is only
+    updated if it still points at the image the job was queued for."""
+    url = payload['url']
+    widths = ARTWORK_WIDTHS if payload['kind'] == 'artwork' else AVATAR_WIDTHS
+    variants = variants_to_urls(generate_derivatives(local_path(url), widths), url.rsplit('/', 1)[0])
+
+    if payload['kind'] == 'artwork':
+        Artwork.query.filter_by(id=payload['id'], image=url).update(
+            {Artwork.image_variants: variants}, synchronize_session=False)
+    else:
+        User.query.filter_by(id=payload['id'], avatar=url).update(
+            {User.avatar_variants: variants}, synchronize_session=False)
@@ -4,6 +4,7 @@ Run this script once to set up the database
 """
 from app import app, db
 from models import User, Artwork, Event
+from search_index import create_index, rebuild_index
 from datetime import date
 
 def init_database():
@@ -177,6 +178,10 @@ def init_database():
         
         db.session.commit()
         
+        print("Building search index...")
+        create_index()
+        rebuild_index()
+        
         print("Adding sample events...")
         
         # Sample events
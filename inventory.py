@@ -0,0 +1,61 @@
+"""
+Stock reservation for checkout and cancellation
+Each artwork's stock is taken with one conditional UPDATE (... WHERE stock_quantity >=
+:quantity AND is_active), so concurrent checkouts can't oversell: the database applies
+them one at a time, and the one that would take stock below zero matches no row. On
+Postgres the UPDATE also row-locks the artwork until commit; artworks are updated in id
+order so two carts holding the same items can't deadlock. Nothing is committed here:
+a failed reservation is undone by the caller's rollback along with the rest of the order.
+"""
+from sqlalchemy import update
+from models import db, Artwork
+
+
+class OutOfStock(ValueError):
+    """A cart line can't be filled; the message says what is left"""
+
+    def __init__(self, artwork, available, is_active=True):
+        self.artwork = artwork
+        self.available = available
+        if not is_active:
+            message = f'{artwork.title} is no longer available!'
+        elif available:
+            message = f'{artwork.title} only has {available} left in stock!'
+        else:
+            message = f'{artwork.title} is sold out!'
+        super().__init__(message)
+
+
+def _by_artwork(lines):
+    """Merge (artwork, quantity) lines per artwork, in id order"""
+    merged = {}
+    for artwork, quantity in lines:
+        merged[artwork.id] = (artwork, merged.get(artwork.id, (artwork, 0))[1] + quantity)
+    return [merged[artwork_id] for artwork_id in sorted(merged)]
+
+
+def reserve(lines):
+    """Take stock for every (artwork, quantity) line, or raise OutOfStock for the first
+    one that can't be filled (the caller rolls back whatever was already taken)"""
+    for artwork, quantity in _by_artwork(lines):
+        result = db.session.execute(
+            update(Artwork)
+            .where(Artwork.id == artwork.id, Artwork.is_active == True, Artwork.stock_quantity >= quantity)
+            .values(stock_quantity=Artwork.stock_quantity - quantity)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            is_active, available = db.session.query(Artwork.is_active, Artwork.stock_quantity).filter(
+                Artwork.id == artwork.id).one()
+            raise OutOfStock(artwork, max(available, 0), is_active)
+
+
+def release(lines):
+    """Put stock back for every (artwork, quantity) line (a cancelled order)"""
+    for artwork, quantity in _by_artwork(lines):
+        db.session.execute(
+            update(Artwork)
+            .where(Artwork.id == artwork.id)
+            .values(stock_quantity=Artwork.stock_quantity + quantity)
+            .execution_options(synchronize_session=False)
+        )
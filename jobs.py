@@ -0,0 +1,169 @@
+"""
+Database-backed background jobs for VisionCraft
+Jobs are rows in the jobs table, so there is no broker to run. `flask worker` starts a
+pool of processes that claim jobs with a conditional UPDATE, retry failures with
+exponential backoff and give up after max_attempts. Handlers must be idempotent:
+a job whose worker died mid-run is picked up again.
+"""
+import json
+import multiprocessing
+import random
+import signal
+import sys
+import time
+import traceback
+from datetime import datetime, timedelta
+from models import db, Job
+
+POLL_INTERVAL = 2.0        # seconds between polls when the queue is empty
+BACKOFF_BASE = 10          # seconds before the first retry; doubles per attempt
+BACKOFF_MAX = 60 * 60
+STALE_AFTER = timedelta(minutes=15)  # a running job older than this is assumed dead
+
+HANDLERS = {}
+
+
+def handler(kind):
+    """Register fn(payload) as the handler for a job kind"""
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+def enqueue(kind, payload, artwork_id=None, max_attempts=5):
+    """Add a job to the session; it becomes visible to workers when the caller commits"""
+    job = Job(kind=kind, payload=json.dumps(payload), artwork_id=artwork_id, max_attempts=max_attempts)
+    db.session.add(job)
+    return job
+
+
+def backoff(attempts):
+    """Delay before retry number `attempts`, with jitter so failed batches don't retry in lockstep"""
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1))
+    return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+
+# ==================== CLAIMING ====================
+
+def claim_next():
+    """Mark the next due job as running and return it, or None if nothing is due"""
+    while True:
+        now = datetime.utcnow()
+        job_id = db.session.query(Job.id).filter(
+            Job.status == 'queued', Job.run_at <= now
+        ).order_by(Job.run_at, Job.id).limit(1).scalar()
+        if job_id is None:
+            db.session.commit()
+            return None
+
+        # Only one worker's UPDATE can match status='queued'; the others retry with the next job
+        claimed = Job.query.filter_by(id=job_id, status='queued').update({
+            Job.status: 'running',
+            Job.locked_at: now,
+            Job.attempts: Job.attempts + 1,
+        }, synchronize_session=False)
+        db.session.commit()
+        if claimed:
+            return db.session.get(Job, job_id)
+
+
+def requeue_stale():
+    """Return jobs abandoned by a dead worker to the queue (or fail them if out of attempts)"""
+    cutoff = datetime.utcnow() - STALE_AFTER
+    stale = Job.query.filter(Job.status == 'running', Job.locked_at < cutoff)
+    failed = stale.filter(Job.attempts >= Job.max_attempts).update({
+        Job.status: 'failed',
+        Job.finished_at: datetime.utcnow(),
+        Job.last_error: 'Worker stopped while running the job',
+    }, synchronize_session=False)
+    requeued = stale.update({
+        Job.status: 'queued',
+        Job.locked_at: None,
+    }, synchronize_session=False)
+    db.session.commit()
+    return requeued + failed
+
+
+# ==================== RUNNING ====================
+
+def run_job(job):
+    """Run one claimed job and record the outcome; returns True on success"""
+    job_id = job.id
+    try:
+        fn = HANDLERS.get(job.kind)
+        if fn is None:
+            raise LookupError(f'No handler registered for job kind {job.kind!r}')
+        fn(json.loads(job.payload))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        job = db.session.get(Job, job_id)
+        job.last_error = traceback.format_exc()[-4000:]
+        job.locked_at = None
+        if job.attempts >= job.max_attempts:
+            job.status = 'failed'
+            job.finished_at = datetime.utcnow()
+        else:
+            job.status = 'queued'
+            job.run_at = datetime.utcnow() + backoff(job.attempts)
+        db.session.commit()
+        return False
+
+    job = db.session.get(Job, job_id)
+    job.status = 'done'
+    job.locked_at = None
+    job.last_error = ''
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+    return True
+
+
+def work(app, poll_interval=POLL_INTERVAL, burst=False):
+    """Process jobs until stopped; with burst=True, return once the queue is empty"""
+    with app.app_context():
+        last_stale_check = 0
+        processed = 0
+        while True:
+            if time.monotonic() - last_stale_check > 60:
+                requeue_stale()
+                last_stale_check = time.monotonic()
+
+            job = claim_next()
+            if job is None:
+                if burst:
+                    return processed
+                time.sleep(poll_interval)
+                continue
+
+            if not run_job(job):
+                app.logger.warning('Job %s (%s) failed on attempt %s', job.id, job.kind, job.attempts,
+                                   extra={'event': 'job_failed', 'job_id': job.id, 'job_kind': job.kind})
+            processed += 1
+            db.session.remove()
+
+
+def run_worker_pool(app, processes, poll_interval=POLL_INTERVAL):
+    """Run `processes` worker processes until interrupted"""
+    if processes <= 1:
+        work(app, poll_interval)
+        return
+
+    # Connections must not be shared across fork; each child opens its own
+    with app.app_context():
+        db.engine.dispose()
+
+    context = multiprocessing.get_context('fork')
+    children = [context.Process(target=work, args=(app, poll_interval), name=f'job-worker-{i}', daemon=True)
+                for i in range(processes)]
+    for child in children:
+        child.start()
+
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        for child in children:
+            child.join()
+    finally:
+        for child in children:
+            if child.is_alive():
+                child.terminate()
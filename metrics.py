@@ -0,0 +1,329 @@
+"""
+Prometheus metrics for VisionCraft, served at /metrics in the text exposition format
+Each process keeps its samples in memory and writes them to its own file in
+METRICS_DIR (every METRICS_FLUSH_INTERVAL seconds and at exit). A scrape merges the
+files of every gunicorn worker, so it sees the whole server whichever worker answers.
+Files left by workers that have exited are folded into one archive file, so counters
+never go backwards; their gauges are dropped.
+Cache hit ratio: rate(cache_requests_total{result="hit"}) / rate(cache_requests_total).
+"""
+import atexit
+import bisect
+import fcntl
+import json
+import os
+import threading
+import time
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+from models import db
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ARCHIVE_FILENAME = 'archive.json'
+LOCK_FILENAME = '.lock'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for _, v in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        self.registry._add(self, self._key(labels), amount)
+
+
+class Gauge(Metric):
+    """Summed across live processes (e.g. requests in flight in each worker)"""
+    kind = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        self.registry._add(self, self._key(labels), amount)
+
+    def dec(self, amount=1, **labels):
+        self.registry._add(self, self._key(labels), -amount)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        self.registry._observe(self, self._key(labels), value)
+
+
+class MetricsRegistry:
+    """Per-process samples plus the file-merging collector"""
+
+    def __init__(self):
+        self.app = None
+        self._metrics = {}
+        self._values = {}  # (name, label values) -> number, or [bucket counts..., sum] for histograms
+        self._lock = threading.Lock()
+        self._pid = None
+        self._thread = None
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(self, name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_DIR', os.environ.get('METRICS_DIR') or
+                              os.path.join(app.root_path, 'logs', 'metrics'))
+        app.config.setdefault('METRICS_FLUSH_INTERVAL', 5.0)
+        self.app = app
+        atexit.register(self.flush)
+
+    # ==================== RECORDING ====================
+
+    def _add(self, metric, key, amount):
+        self._ensure_process()
+        with self._lock:
+            self._values[(metric.name, key)] = self._values.get((metric.name, key), 0) + amount
+
+    def _observe(self, metric, key, value):
+        self._ensure_process()
+        with self._lock:
+            sample = self._values.get((metric.name, key))
+            if sample is None:
+                sample = self._values[(metric.name, key)] = [0] * (len(metric.buckets) + 1) + [0.0]
+            sample[bisect.bisect_left(metric.buckets, value)] += 1
+            sample[-1] += value
+
+    def _ensure_process(self):
+        # Threads and samples don't carry across a fork; each worker starts clean
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._values = {}
+            self._thread = threading.Thread(target=self._run, name='metrics-flush', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        # A previous process with this pid may have left a file behind; keep its counts
+        with self._locked_dir():
+            self._archive([self._path(self._pid)])
+        while True:
+            self.flush()
+            time.sleep(self.app.config['METRICS_FLUSH_INTERVAL'])
+
+    # ==================== FILES ====================
+
+    def _dir(self):
+        directory = self.app.config['METRICS_DIR']
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    def _path(self, pid):
+        return os.path.join(self._dir(), f'{pid}.json')
+
+    def _snapshot(self):
+        with self._lock:
+            return [[name, list(key), value if isinstance(value, (int, float)) else list(value)]
+                    for (name, key), value in self._values.items()]
+
+    def _write(self, path, samples):
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(samples, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    def _read(self, path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def flush(self):
+        """Write this process's samples to its file"""
+        if self.app is None or self._pid != os.getpid():
+            return
+        self._write(self._path(self._pid), self._snapshot())
+
+    def _locked_dir(self):
+        lock = open(os.path.join(self._dir(), LOCK_FILENAME), 'a')
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        return lock  # closing the file releases the lock
+
+    def _archive(self, paths):
+        """Fold dead processes' counters and histograms into the archive (caller holds the lock)"""
+        paths = [path for path in paths if os.path.exists(path)]
+        if not paths:
+            return
+        archive = {}
+        self._merge(archive, self._read(os.path.join(self._dir(), ARCHIVE_FILENAME)), gauges=False)
+        for path in paths:
+            self._merge(archive, self._read(path), gauges=False)
+        self._write(os.path.join(self._dir(), ARCHIVE_FILENAME),
+                    [[name, list(key), value] for (name, key), value in archive.items()])
+        for path in paths:
+            os.remove(path)
+
+    # ==================== COLLECTING ====================
+
+    def _merge(self, merged, samples, gauges=True):
+        for name, key, value in samples:
+            metric = self._metrics.get(name)
+            if metric is None or (metric.kind == 'gauge' and not gauges):
+                continue
+            current = merged.get((name, tuple(key)))
+            if isinstance(value, list):
+                merged[(name, tuple(key))] = value if current is None else [a + b for a, b in zip(current, value)]
+            else:
+                merged[(name, tuple(key))] = (current or 0) + value
+
+    @staticmethod
+    def _alive(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def collect(self):
+        """Merged samples of every process: {(name, label values): value}"""
+        self._ensure_process()
+        merged = {}
+        with self._locked_dir():
+            live, dead = [], []
+            for filename in os.listdir(self._dir()):
+                stem, ext = os.path.splitext(filename)
+                if ext == '.json' and stem.isdigit() and int(stem) != os.getpid():
+                    (live if self._alive(int(stem)) else dead).append(os.path.join(self._dir(), filename))
+            self._archive(dead)
+            self._merge(merged, self._read(os.path.join(self._dir(), ARCHIVE_FILENAME)))
+            for path in live:
+                self._merge(merged, self._read(path))
+        self._merge(merged, self._snapshot())
+        return merged
+
+    def render(self):
+        """Prometheus text exposition format"""
+        merged = self.collect()
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            for (sample_name, key), value in sorted(merged.items()):
+                if sample_name != name:
+                    continue
+                if metric.kind != 'histogram':
+                    lines.append(f'{name}{_format_labels(metric.labelnames, key)} {_format_value(value)}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float('inf'),), value[:-1]):
+                    cumulative += count
+                    labels = _format_labels(metric.labelnames, key, [('le', _format_value(bound))])
+                    lines.append(f'{name}_bucket{labels} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(metric.labelnames, key)} {_format_value(value[-1])}')
+                lines.append(f'{name}_count{_format_labels(metric.labelnames, key)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+REQUEST_LATENCY = registry.histogram('http_request_duration_seconds', 'Request latency by endpoint',
+                                    ('endpoint', 'method'))
+REQUESTS = registry.counter('http_requests_total', 'Requests by endpoint and status', ('endpoint', 'method', 'status'))
+IN_FLIGHT = registry.gauge('http_requests_in_flight', 'Requests being handled right now')
+DB_CHECKOUTS = registry.counter('db_pool_checkouts_total', 'Connections checked out of the pool')
+DB_CONTENDED = registry.counter('db_pool_checkouts_contended_total',
+                               'Checkouts made while every pooled connection was busy (overflow or wait)')
+DB_CONNECTS = registry.counter('db_pool_connections_opened_total', 'New database connections opened')
+DB_IN_USE = registry.gauge('db_pool_connections_in_use', 'Connections currently checked out')
+CHECKOUTS = registry.counter('checkouts_total', 'Order checkouts by outcome', ('result',))
+CACHE_REQUESTS = registry.counter('cache_requests_total', 'Cache lookups by cache and result', ('cache', 'result'))
+
+
+def record_cache(cache, hit):
+    """Count one lookup in a named cache"""
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+# ==================== INSTRUMENTATION ====================
+
+def _start_request():
+    g.metrics_started = time.perf_counter()
+    IN_FLIGHT.inc()
+
+
+def _record_status(response):
+    g.metrics_status = response.status_code
+    return response
+
+
+def _finish_request(exc):
+    started = g.pop('metrics_started', None)
+    if started is None:
+        return
+    # Unmatched URLs share one label so scanners can't blow up the series count
+    endpoint = request.endpoint or 'unmatched'
+    REQUEST_LATENCY.observe(time.perf_counter() - started, endpoint=endpoint, method=request.method)
+    REQUESTS.inc(endpoint=endpoint, method=request.method, status=g.pop('metrics_status', 500))
+    IN_FLIGHT.dec()
+
+
+def _on_checkout(engine):
+    DB_CHECKOUTS.inc()
+    DB_IN_USE.inc()
+    # engine.pool, not a captured pool: dispose() replaces the pool (keeping these listeners)
+    pool = engine.pool
+    if isinstance(pool, QueuePool) and pool.checkedout() > pool.size():
+        DB_CONTENDED.inc()
+
+
+def init_app(app):
+    """Record request and connection-pool metrics for app"""
+    registry.init_app(app)
+    app.before_request(_start_request)
+    app.after_request(_record_status)
+    app.teardown_request(_finish_request)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine.pool, 'checkout', lambda *args: _on_checkout(engine))
+    event.listen(engine.pool, 'checkin', lambda *args: DB_IN_USE.dec())
+    event.listen(engine.pool, 'connect', lambda *args: DB_CONNECTS.inc())
@@ -0,0 +1,78 @@
+"""
+AR model pipeline: validate uploads, then build optimised and low-poly GLB variants
+in a background job (see gltf.py for the format work and jobs.py for the queue)
+"""
+import json
+import os
+from models import db, Artwork
+from jobs import enqueue, handler
+from asset_store import local_path
+import gltf
+import static_assets
+
+DERIVED_DIRNAME = 'derived'
+MAX_TEXTURE_SIZE = 2048
+LOD_TEXTURE_SIZE = 512
+LOD_RATIO = 0.25
+
+
+def queue_model_variants(artwork):
+    """Queue optimisation of an artwork's uploaded model (commits with the caller)"""
+    artwork.model_variants = db.session.query(Artwork.model_variants).filter(
+        Artwork.model_url == artwork.model_url, Artwork.model_variants.isnot(None)
+    ).limit(1).scalar()
+    if artwork.model_variants:
+        return
+    enqueue('model_variants', {'id': artwork.id, 'url': artwork.model_url}, artwork_id=artwork.id, max_attempts=3)
+
+
+def _write_variant(directory, stem, name, data):
+    filename = f'{stem}-{name}.glb'
+    # Write then rename, so the viewer never fetches a half-written file
+    tmp_path = os.path.join(directory, f'.{filename}.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, os.path.join(directory, filename))
+    return filename
+
+
+@handler('model_variants')
+def build_model_variants(payload):
+    """Job handler. Re-running rewrites the same files; the row is only updated if it
+    still points at the model the job was queued for."""
+    url = payload['url']
+    source_path = local_path(url)
+    url_prefix = url.rsplit('/', 1)[0]
+    out_dir = os.path.join(os.path.dirname(source_path), DERIVED_DIRNAME)
+    os.makedirs(out_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+
+    # A .gltf original is JSON and compresses well; GLBs are sent with Range support instead
+    static_assets.precompress(source_path)
+    try:
+        model = gltf.load_valid(source_path)
+        variants = {'original': {'url': url, 'bytes': os.path.getsize(source_path),
+                                 'triangles': gltf.triangle_count(model.doc)}}
+        for name, options in (('optimized', {'max_texture_size': MAX_TEXTURE_SIZE}),
+                              ('lod', {'max_texture_size': LOD_TEXTURE_SIZE, 'lod_ratio': LOD_RATIO})):
+            data = gltf.optimize(model, **options)
+            filename = _write_variant(out_dir, stem, name, data)
+            variants[name] = {'url': f'{url_prefix}/{DERIVED_DIRNAME}/{filename}', 'bytes': len(data),
+                              'triangles': gltf.triangle_count(gltf.parse(data).doc)}
+    except gltf.GltfError as e:
+        # A bad file won't get better on retry; record why and keep serving the original
+        variants = {'error': str(e)}
+
+    Artwork.query.filter_by(id=payload['id'], model_url=url).update(
+        {Artwork.model_variants: json.dumps(variants)}, synchronize_session=False)
+
+
+def model_sources(variants_json):
+    """{'optimized': url, 'lod': url} for a stored model_variants column (empty if none)"""
+    if not variants_json:
+        return {}
+    try:
+        variants = json.loads(variants_json)
+    except ValueError:
+        return {}
+    return {name: variants[name]['url'] for name in ('optimized', 'lod') if name in variants}
@@ -4,10 +4,15 @@ Database models for VisionCraft AR Marketplace
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import func
+from sqlalchemy.dialects import sqlite, postgresql
 from datetime import datetime
 
 db = SQLAlchemy()
 
+# Dialects whose INSERT supports ON CONFLICT DO UPDATE
+UPSERT_INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
 class User(UserMixin, db.Model):
     """User model for authentication and profiles"""
     __tablename__ = 'users'
@@ -23,6 +28,7 @@ class User(UserMixin, db.Model):
     phone = db.Column(db.String(20), default='')
     location = db.Column(db.String(100), default='')
     avatar = db.Column(db.String(200), default=None)
+    avatar_variants = db.Column(db.Text, default=None)  # JSON {format: {width: url}}, see images.py
     
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -63,22 +69,29 @@ class Artwork(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, default='')
-    price = db.Column(db.Float, nullable=False, default=0.0)
+    price = db.Column(db.Float, nullable=False, default=0.0, index=True)
     category = db.Column(db.String(50), nullable=False, index=True)
     
     # Media
     image = db.Column(db.String(300), default='')
+    image_variants = db.Column(db.Text, default=None)  # JSON {format: {width: url}}, see images.py
     model_url = db.Column(db.String(300), default='')
+    model_variants = db.Column(db.Text, default=None)  # JSON {variant: {url, bytes, triangles}}, see model_assets.py
     
     # Artisan information
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     artist_name = db.Column(db.String(100), default='')
     state = db.Column(db.String(100), default='')
     making_process = db.Column(db.Text, default='')
     
     # Stats
     views = db.Column(db.Integer, default=0)
-    rating = db.Column(db.Float, default=0.0)
+    rating = db.Column(db.Float, default=0.0, index=True)
+    
+    # Denormalized counters (maintained in the same transaction as their source rows)
+    likes_count = db.Column(db.Integer, default=0, server_default='0', nullable=False, index=True)
+    carts_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    orders_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
     
     # Inventory
     stock_quantity = db.Column(db.Integer, default=10)
@@ -92,19 +105,73 @@ class Artwork(db.Model):
     likes = db.relationship('Like', backref='artwork', lazy='dynamic', cascade='all, delete-orphan')
     cart_items = db.relationship('CartItem', backref='artwork', lazy='dynamic', cascade='all, delete-orphan')
     order_items = db.relationship('OrderItem', backref='artwork', lazy='dynamic')
+    jobs = db.relationship('Job', backref='artwork', lazy='dynamic')
     
     def get_likes_count(self):
         """Get number of likes"""
-        return self.likes.count()
+        return self.likes_count
+    
+    def adjust_counter(self, name, delta):
+        """Adjust a denormalized counter with an in-SQL increment so concurrent updates aren't lost"""
+        column = getattr(Artwork, name)
+        Artwork.query.filter_by(id=self.id).update({column: column + delta}, synchronize_session=False)
+    
+    @staticmethod
+    def reconcile_counters():
+        """Rebuild all denormalized counters from their source tables"""
+        likes = db.session.query(func.count(Like.id)).filter(
+            Like.artwork_id == Artwork.id
+        ).scalar_subquery()
+        carts = db.session.query(func.count(CartItem.id)).filter(
+            CartItem.artwork_id == Artwork.id
+        ).scalar_subquery()
+        orders = db.session.query(func.count(OrderItem.id)).join(Order).filter(
+            OrderItem.artwork_id == Artwork.id,
+            Order.status != 'cancelled'
+        ).scalar_subquery()
+        
+        updated = db.session.query(Artwork).update({
+            Artwork.likes_count: likes,
+            Artwork.carts_count: carts,
+            Artwork.orders_count: orders
+        }, synchronize_session=False)
+        db.session.commit()
+        return updated
     
     def get_ar_tries_count(self):
-        """Get number of AR views (estimated from views)"""
-        return int(self.views * 0.15)  # Estimate 15% of viewers try AR
+        """Get number of AR sessions started (from the daily rollup)"""
+        total = db.session.query(func.sum(ArtworkDailyStat.ar_sessions)).filter(
+            ArtworkDailyStat.artwork_id == self.id
+        ).scalar()
+        return total or 0
+    
+    def get_processing_status(self):
+        """'processing' while media jobs are pending, 'failed' if any gave up, else 'ready'"""
+        statuses = {status for status, in self.jobs.with_entities(Job.status).distinct()}
+        if statuses & {'queued', 'running'}:
+            return 'processing'
+        if 'failed' in statuses:
+            return 'failed'
+        return 'ready'
     
     def is_in_stock(self):
         """Check if item is in stock"""
         return self.stock_quantity > 0
     
+    def to_dict(self):
+        """Serialize the fields shown on a gallery card"""
+        return {
+            'id': self.id,
+            'title': self.title,
+            'artist_name': self.artist_name,
+            'category': self.category,
+            'state': self.state,
+            'price': self.price,
+            'rating': self.rating,
+            'image': self.image,
+            'likes_count': self.likes_count
+        }
+    
     def __repr__(self):
         return f'<Artwork {self.title}>'
 
@@ -197,6 +264,15 @@ class Like(db.Model):
     # Unique constraint: user can like an artwork only once
     __table_args__ = (db.UniqueConstraint('user_id', 'artwork_id', name='unique_user_artwork_like'),)
     
+    @staticmethod
+    def get_liked_ids(user_id, artwork_ids):
+        """Get the subset of artwork IDs the user has liked in one query"""
+        rows = db.session.query(Like.artwork_id).filter(
+            Like.user_id == user_id,
+            Like.artwork_id.in_(artwork_ids)
+        )
+        return {artwork_id for (artwork_id,) in rows}
+    
     def __repr__(self):
         return f'<Like user={self.user_id} artwork={self.artwork_id}>'
 
@@ -255,3 +331,117 @@ class EventRSVP(db.Model):
     
     def __repr__(self):
         return f'<EventRSVP user={self.user_id} event={self.event_id}>'
+
+
+class ArtworkDailyStat(db.Model):
+    """Per-artwork, per-day engagement rollup"""
+    __tablename__ = 'artwork_daily_stats'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    artwork_id = db.Column(db.Integer, db.ForeignKey('artworks.id'), nullable=False)
+    seller_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)  # Copied from the artwork
+    day = db.Column(db.Date, nullable=False, index=True)
+    
+    # Engagement
+    views = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    likes = db.Column(db.Integer, default=0, server_default='0', nullable=False)  # Net of unlikes
+    
+    # AR funnel
+    ar_sessions = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    ar_placements = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    ar_snapshots = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    
+    # Sales (non-cancelled orders, bucketed by order date)
+    units_sold = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    revenue = db.Column(db.Float, default=0.0, server_default='0', nullable=False)
+    
+    __table_args__ = (
+        db.UniqueConstraint('artwork_id', 'day', name='unique_artwork_day_stat'),
+        db.Index('ix_artwork_daily_stats_seller_day', 'seller_id', 'day'),
+    )
+    
+    @staticmethod
+    def add_counts(counts):
+        """
+        Add to rollup rows, creating them as needed.
+        counts maps (artwork_id, day) -> {column name: increment}; unknown artworks are skipped.
+        """
+        if not counts:
+            return
+        
+        artwork_ids = {artwork_id for artwork_id, _ in counts}
+        seller_ids = dict(db.session.query(Artwork.id, Artwork.user_id).filter(Artwork.id.in_(artwork_ids)))
+        
+        insert = UPSERT_INSERTS.get(db.session.get_bind().dialect.name)
+        for (artwork_id, day), increments in counts.items():
+            seller_id = seller_ids.get(artwork_id)
+            if seller_id is None:
+                continue
+            if insert is not None:
+                stmt = insert(ArtworkDailyStat).values(
+                    artwork_id=artwork_id, seller_id=seller_id, day=day, **increments
+                )
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=['artwork_id', 'day'],
+                    set_={name: getattr(ArtworkDailyStat, name) + getattr(stmt.excluded, name)
+                          for name in increments}
+                )
+                db.session.execute(stmt)
+            else:
+                stat = ArtworkDailyStat.query.filter_by(artwork_id=artwork_id, day=day).first()
+                if stat is None:
+                    stat = ArtworkDailyStat(artwork_id=artwork_id, seller_id=seller_id, day=day)
+                    db.session.add(stat)
+                    db.session.flush()
+                for name, increment in increments.items():
+                    setattr(stat, name, getattr(ArtworkDailyStat, name) + increment)
+    
+    def __repr__(self):
+        return f'<ArtworkDailyStat artwork={self.artwork_id} day={self.day}>'
+
+
+class Job(db.Model):
+    """Background job run by `flask worker` (see jobs.py)"""
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        db.Index('ix_jobs_status_run_at', 'status', 'run_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')  # JSON
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    
+    # Optional owner, so the artwork page can show its processing state
+    artwork_id = db.Column(db.Integer, db.ForeignKey('artworks.id'), index=True)
+    
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    last_error = db.Column(db.Text, default='')
+    
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<Job {self.id} {self.kind} {self.status}>'
+
+
+class Asset(db.Model):
+    """Content-addressed upload blob (see asset_store.py); filename is sha256 + extension"""
+    __tablename__ = 'assets'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    filename = db.Column(db.String(80), unique=True, nullable=False)
+    size = db.Column(db.Integer, nullable=False, default=0)
+    
+    # Number of artwork images/models and avatars pointing at this blob
+    ref_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Asset {self.filename} refs={self.ref_count}>'
+
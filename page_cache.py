@@ -0,0 +1,72 @@
+"""
+Whole-page cache for anonymous visitors
+Logged-out requests to a @cached_page view get the same HTML, so the first render is
+stored (through cache.py, inheriting the tags of the catalog data it was built from)
+and replayed with a strong ETag; a browser or CDN revalidating with If-None-Match gets
+304 Not Modified. Logged-in visitors always get a fresh render, marked private, built
+from cached fragments where the view has them.
+"""
+import hashlib
+from functools import wraps
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+from cache import cache
+
+NAMESPACE = 'page'
+
+
+def _anonymous_get():
+    # Pending flash messages belong to one visitor; leave those requests alone
+    return (request.method == 'GET' and not current_user.is_authenticated
+            and '_flashes' not in session)
+
+
+def _public(response, etag):
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f'public, max-age={current_app.config["PAGE_CACHE_MAX_AGE"]}, must-revalidate'
+    response.vary.add('Cookie')
+    return response.make_conditional(request)
+
+
+def _private(response):
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Cookie')
+    return response
+
+
+def cached_page(on_hit=None):
+    """
+    Serve anonymous GETs of this view from the page cache.
+    on_hit(**view_args) runs on a cache hit, for side effects the page must keep (view counts).
+    """
+    def decorate(view):
+        @wraps(view)
+        def wrapper(**view_args):
+            if not _anonymous_get():
+                return _private(make_response(view(**view_args)))
+
+            params = {'path': request.path, 'args': sorted(request.args.items(multi=True))}
+            page = cache.get(NAMESPACE, params)
+            if page is not None:
+                if on_hit is not None:
+                    on_hit(**view_args)
+                response = current_app.response_class(page['body'], mimetype=page['mimetype'])
+                return _public(response, page['etag'])
+
+            with cache.dependencies() as tag_versions:
+                response = make_response(view(**view_args))
+            # Only plain successful renders: never redirects, errors or a response that sets a cookie
+            if response.status_code != 200 or session.modified or response.direct_passthrough:
+                return _private(response)
+            body = response.get_data(as_text=True)
+            etag = hashlib.sha256(body.encode()).hexdigest()[:32]
+            cache.set(NAMESPACE, params, {'body': body, 'mimetype': response.mimetype, 'etag': etag},
+                      tag_versions, current_app.config['PAGE_CACHE_TTL'])
+            return _public(response, etag)
+        return wrapper
+    return decorate
+
+
+def init_app(app):
+    app.config.setdefault('PAGE_CACHE_TTL', 60)       # server-side copy; invalidated early by tags
+    app.config.setdefault('PAGE_CACHE_MAX_AGE', 0)    # browsers and CDNs revalidate every time
@@ -0,0 +1,113 @@
+"""
+Keyset (cursor) pagination for the VisionCraft artwork catalog
+"""
+import base64
+import json
+from datetime import datetime
+from models import Artwork
+
+PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+# Sort mode -> (column, direction); Artwork.id breaks ties so every cursor is unique.
+# A cursor can't hold NULL, so rows after one would be skipped: sort columns must always
+# have a value (price and likes_count are NOT NULL, created_at and rating get defaults)
+SORT_KEYS = {
+    'default': (Artwork.created_at, 'desc'),
+    'price-low': (Artwork.price, 'asc'),
+    'price-high': (Artwork.price, 'desc'),
+    'rating': (Artwork.rating, 'desc'),
+    'likes': (Artwork.likes_count, 'desc'),
+}
+
+
+def get_sort_key(sort_by):
+    """Get (column, direction) for a sort mode, falling back to newest first"""
+    return SORT_KEYS.get(sort_by, SORT_KEYS['default'])
+
+
+def apply_sort(query, sort_by):
+    """Order a query by the sort mode plus the id tie-breaker"""
+    column, direction = get_sort_key(sort_by)
+    if direction == 'asc':
+        return query.order_by(column.asc(), Artwork.id.asc())
+    return query.order_by(column.desc(), Artwork.id.desc())
+
+
+def encode_token(data):
+    """Pack a small dict into an opaque URL-safe token"""
+    payload = json.dumps(data, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_token(token):
+    """Unpack a token built by encode_token; raises ValueError if malformed"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(data, dict):
+        raise ValueError('Invalid cursor')
+    return data
+
+
+def encode_cursor(artwork, sort_by):
+    """Build an opaque cursor pointing just past the given artwork"""
+    column, _ = get_sort_key(sort_by)
+    value = getattr(artwork, column.key)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return encode_token({'s': sort_by, 'v': value, 'id': artwork.id})
+
+
+def decode_cursor(cursor, sort_by):
+    """Decode a cursor into (value, id); raises ValueError if malformed or from another sort"""
+    data = decode_token(cursor)
+    try:
+        value, last_id = data['v'], data['id']
+        cursor_sort = data['s']
+    except KeyError:
+        raise ValueError('Invalid cursor')
+    if isinstance(last_id, bool) or not isinstance(last_id, int):
+        raise ValueError('Invalid cursor')
+
+    if cursor_sort != sort_by:
+        raise ValueError('Cursor does not match sort order')
+
+    column, _ = get_sort_key(sort_by)
+    if column is Artwork.created_at:
+        if not isinstance(value, str):
+            raise ValueError('Invalid cursor')
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            raise ValueError('Invalid cursor')
+    elif isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError('Invalid cursor')
+    return value, last_id
+
+
+def paginate(query, sort_by, cursor=None, limit=PAGE_SIZE):
+    """
+    Fetch one page of artworks after the cursor.
+    Returns (artworks, next_cursor); next_cursor is None on the last page.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    column, direction = get_sort_key(sort_by)
+
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort_by)
+        if direction == 'asc':
+            query = query.filter((column > value) | ((column == value) & (Artwork.id > last_id)))
+        else:
+            query = query.filter((column < value) | ((column == value) & (Artwork.id < last_id)))
+
+    # Fetch one extra row to know whether another page exists
+    artworks = apply_sort(query, sort_by).limit(limit + 1).all()
+    next_cursor = None
+    if len(artworks) > limit:
+        artworks = artworks[:limit]
+        next_cursor = encode_cursor(artworks[-1], sort_by)
+
+    return artworks, next_cursor
@@ -0,0 +1,120 @@
+"""
+Per-request SQL profiling (opt-in with QUERY_PROFILING=1)
+Counts every statement a request runs and its total database time, keeps the slowest
+few with their parameters, and reports them as a Server-Timing header and one structured log
+line per request. Routes can declare a query budget with @query_budget(n); going over
+it is logged, and raises QueryBudgetExceeded under TESTING (or QUERY_BUDGET_STRICT) so
+an N+1 regression fails the test that exercises the route.
+"""
+import heapq
+import os
+import time
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+PARAMS_MAX_LENGTH = 200
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(limit):
+    """Declare the most SQL statements a view may run per request"""
+    def decorate(view):
+        view.query_budget = limit
+        return view
+    return decorate
+
+
+class QueryProfiler:
+    """Hooks engine events once per process; only requests with profiling on pay for it"""
+
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('QUERY_PROFILING', os.environ.get('QUERY_PROFILING') == '1')
+        app.config.setdefault('QUERY_SLOWEST', 3)         # statements kept per request
+        app.config.setdefault('QUERY_BUDGET', None)       # default for views without @query_budget
+        app.config.setdefault('QUERY_BUDGET_STRICT', None)  # None: strict when TESTING
+        self.app = app
+        event.listen(Engine, 'before_cursor_execute', self._before_execute)
+        event.listen(Engine, 'after_cursor_execute', self._after_execute)
+        event.listen(Engine, 'handle_error', self._on_error)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    # ==================== RECORDING ====================
+
+    def _start(self):
+        if self.app.config['QUERY_PROFILING'] or self.app.testing:
+            g.query_stats = {'count': 0, 'seconds': 0.0, 'slowest': [], 'started': time.perf_counter()}
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and 'query_stats' in g:
+            conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if not (has_request_context() and 'query_stats' in g and conn.info.get('query_started')):
+            return
+        elapsed = time.perf_counter() - conn.info['query_started'].pop()
+        stats = g.query_stats
+        stats['count'] += 1
+        stats['seconds'] += elapsed
+        # Min-heap of the N slowest; the counter breaks ties without comparing strings
+        entry = (elapsed, stats['count'], statement, parameters)
+        if len(stats['slowest']) < self.app.config['QUERY_SLOWEST']:
+            heapq.heappush(stats['slowest'], entry)
+        elif elapsed > stats['slowest'][0][0]:
+            heapq.heapreplace(stats['slowest'], entry)
+
+    def _on_error(self, context):
+        # A failed statement never reaches after_cursor_execute; drop its start time
+        if context.connection is not None and context.connection.info.get('query_started'):
+            context.connection.info['query_started'].pop()
+
+    # ==================== REPORTING ====================
+
+    def _budget(self):
+        view = self.app.view_functions.get(request.endpoint)
+        return getattr(view, 'query_budget', self.app.config['QUERY_BUDGET'])
+
+    def _finish(self, response):
+        stats = g.pop('query_stats', None)
+        if stats is None:
+            return response
+
+        db_ms = stats['seconds'] * 1000
+        total_ms = (time.perf_counter() - stats['started']) * 1000
+        response.headers.add('Server-Timing', f'db;dur={db_ms:.1f};desc="{stats["count"]} queries"')
+        response.headers.add('Server-Timing', f'app;dur={total_ms:.1f}')
+
+        budget = self._budget()
+        over_budget = budget is not None and stats['count'] > budget
+        if self.app.config['QUERY_PROFILING'] or over_budget:
+            slowest = sorted(stats['slowest'], reverse=True)
+            record = {
+                'event': 'request_queries',
+                'status': response.status_code,
+                'queries': stats['count'],
+                'budget': budget,
+                'db_ms': round(db_ms, 2),
+                'total_ms': round(total_ms, 2),
+                'slowest': [{'ms': round(elapsed * 1000, 2), 'statement': ' '.join(statement.split()),
+                             'params': repr(parameters)[:PARAMS_MAX_LENGTH]}
+                            for elapsed, _, statement, parameters in slowest],
+            }
+            log = self.app.logger.warning if over_budget else self.app.logger.info
+            log('%s ran %d queries in %.1fms', request.endpoint, stats['count'], db_ms, extra=record)
+
+        strict = self.app.config['QUERY_BUDGET_STRICT']
+        if over_budget and (self.app.testing if strict is None else strict):
+            raise QueryBudgetExceeded(f'{request.endpoint} ran {stats["count"]} queries (budget {budget})')
+        return response
+
+
+query_profiler = QueryProfiler()
@@ -0,0 +1,226 @@
+"""
+Full-text search index for VisionCraft artworks
+Uses SQLite FTS5 or PostgreSQL tsvector, with an ILIKE scan fallback elsewhere
+"""
+import re
+import time
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from models import db, Artwork
+from pagination import PAGE_SIZE, MAX_PAGE_SIZE, encode_token, decode_token, paginate
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+MAX_TERMS = 8
+
+# Weighted PostgreSQL document; placeholders are bind params or column expressions
+TSVECTOR_DOCUMENT = (
+    "setweight(to_tsvector('simple', {title}), 'A') || "
+    "setweight(to_tsvector('simple', {artist_name}), 'B') || "
+    "setweight(to_tsvector('simple', {category}), 'B') || "
+    "setweight(to_tsvector('simple', {description}), 'C')"
+)
+
+# (backend name, time.monotonic() when detected) per database URL. 'like' is checked
+# again after BACKEND_RECHECK_SECONDS, so a worker that started before
+# `flask rebuild-search-index` switches to the new table without a restart
+BACKEND_RECHECK_SECONDS = 60
+_backends = {}
+
+
+def _detect_backend():
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        if db.session.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'artwork_search'"
+        )).first():
+            return 'fts5'
+    elif dialect == 'postgresql':
+        if db.session.execute(text("SELECT to_regclass('artwork_search')")).scalar():
+            return 'tsvector'
+    return 'like'
+
+
+def get_backend(recheck=False):
+    """Return 'fts5', 'tsvector' or 'like' for the current database.
+    Until create_index() has been run the ILIKE fallback is used. recheck=True looks
+    for the table again right away if it was missing (index writes must not skip it)."""
+    url = str(db.engine.url)
+    cached = _backends.get(url)
+    if cached is None or (cached[0] == 'like' and (
+            recheck or time.monotonic() - cached[1] >= BACKEND_RECHECK_SECONDS)):
+        cached = _backends[url] = (_detect_backend(), time.monotonic())
+    return cached[0]
+
+
+def create_index():
+    """Create the search table for this database; returns the backend now in use"""
+    dialect = db.engine.dialect.name
+    try:
+        if dialect == 'sqlite':
+            db.session.execute(text(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS artwork_search USING fts5("
+                "title, artist_name, category, description, "
+                "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            ))
+        elif dialect == 'postgresql':
+            db.session.execute(text(
+                "CREATE TABLE IF NOT EXISTS artwork_search ("
+                "artwork_id INTEGER PRIMARY KEY, document TSVECTOR NOT NULL)"
+            ))
+            db.session.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_artwork_search_document "
+                "ON artwork_search USING GIN (document)"
+            ))
+        db.session.commit()
+    except OperationalError:
+        # SQLite built without FTS5 - stay on the ILIKE fallback
+        db.session.rollback()
+
+    _backends.pop(str(db.engine.url), None)
+    return get_backend()
+
+
+def parse_terms(query_text):
+    """Split user input into lowercase word terms, each matched as a prefix"""
+    return [term.lower() for term in TOKEN_RE.findall(query_text)][:MAX_TERMS]
+
+
+# ==================== INDEX MAINTENANCE ====================
+
+def index_artwork(artwork):
+    """Add or refresh an artwork in the index (inactive artworks are removed).
+    Runs in the caller's transaction, so commit as usual afterwards."""
+    backend = get_backend(recheck=True)
+    if backend == 'like':
+        return
+
+    if not artwork.is_active:
+        remove_artwork(artwork.id)
+        return
+
+    params = {
+        'id': artwork.id,
+        'title': artwork.title or '',
+        'artist_name': artwork.artist_name or '',
+        'category': artwork.category or '',
+        'description': artwork.description or ''
+    }
+
+    if backend == 'fts5':
+        db.session.execute(text("DELETE FROM artwork_search WHERE rowid = :id"), params)
+        db.session.execute(text(
+            "INSERT INTO artwork_search (rowid, title, artist_name, category, description) "
+            "VALUES (:id, :title, :artist_name, :category, :description)"
+        ), params)
+    else:
+        document = TSVECTOR_DOCUMENT.format(
+            title=':title', artist_name=':artist_name', category=':category', description=':description'
+        )
+        db.session.execute(text(
+            f"INSERT INTO artwork_search (artwork_id, document) VALUES (:id, {document}) "
+            "ON CONFLICT (artwork_id) DO UPDATE SET document = EXCLUDED.document"
+        ), params)
+
+
+def remove_artwork(artwork_id):
+    """Drop an artwork from the index (e.g. on soft delete)"""
+    backend = get_backend(recheck=True)
+    if backend == 'fts5':
+        db.session.execute(text("DELETE FROM artwork_search WHERE rowid = :id"), {'id': artwork_id})
+    elif backend == 'tsvector':
+        db.session.execute(text("DELETE FROM artwork_search WHERE artwork_id = :id"), {'id': artwork_id})
+
+
+def rebuild_index():
+    """Rebuild the whole index from active artworks; returns the number indexed"""
+    backend = get_backend()
+    if backend == 'like':
+        return 0
+
+    columns = {name: f"COALESCE({name}, '')" for name in ('title', 'artist_name', 'category', 'description')}
+    if backend == 'fts5':
+        insert_sql = (
+            "INSERT INTO artwork_search (rowid, title, artist_name, category, description) "
+            "SELECT id, {title}, {artist_name}, {category}, {description} FROM artworks WHERE is_active"
+        ).format(**columns)
+    else:
+        insert_sql = (
+            f"INSERT INTO artwork_search (artwork_id, document) "
+            f"SELECT id, {TSVECTOR_DOCUMENT.format(**columns)} FROM artworks WHERE is_active"
+        )
+
+    # Set-based refill: one statement instead of a round-trip per artwork
+    db.session.execute(text("DELETE FROM artwork_search"))
+    result = db.session.execute(text(insert_sql))
+    db.session.commit()
+    return result.rowcount
+
+
+# ==================== QUERIES ====================
+
+def search_artworks(query_text, cursor=None, limit=PAGE_SIZE):
+    """
+    Ranked, prefix-matching search over active artworks.
+    Returns (artworks, next_cursor) like pagination.paginate.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    terms = parse_terms(query_text)
+    if not terms:
+        return [], None
+
+    backend = get_backend()
+    if backend == 'like':
+        return _search_like(terms, cursor, limit)
+
+    if backend == 'fts5':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        # bm25 is lower-is-better; weights follow the column order title, artist, category, description
+        matches_sql = (
+            "SELECT rowid AS id, bm25(artwork_search, 10.0, 5.0, 5.0, 1.0) AS score "
+            "FROM artwork_search WHERE artwork_search MATCH :match"
+        )
+    else:
+        match = ' & '.join(f'{term}:*' for term in terms)
+        matches_sql = (
+            "SELECT artwork_id AS id, -ts_rank(document, to_tsquery('simple', :match)) AS score "
+            "FROM artwork_search WHERE document @@ to_tsquery('simple', :match)"
+        )
+
+    params = {'match': match, 'limit': limit + 1}
+    keyset = ''
+    if cursor:
+        data = decode_token(cursor)
+        try:
+            params['score'], params['last_id'] = float(data['score']), int(data['id'])
+        except (ValueError, TypeError, KeyError):
+            raise ValueError('Invalid cursor')
+        keyset = "WHERE score > :score OR (score = :score AND id > :last_id) "
+
+    rows = db.session.execute(text(
+        f"SELECT id, score FROM ({matches_sql}) AS matches {keyset}"
+        "ORDER BY score, id LIMIT :limit"
+    ), params).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_token({'score': rows[-1].score, 'id': rows[-1].id})
+
+    # Load the page in one query and restore rank order
+    ids = [row.id for row in rows]
+    by_id = {art.id: art for art in Artwork.query.filter(Artwork.id.in_(ids), Artwork.is_active == True)}
+    return [by_id[artwork_id] for artwork_id in ids if artwork_id in by_id], next_cursor
+
+
+def _search_like(terms, cursor, limit):
+    """Fallback for databases without full-text support: every term must match some column"""
+    query = Artwork.query.filter(Artwork.is_active == True)
+    for term in terms:
+        pattern = f'%{term}%'
+        query = query.filter(
+            (Artwork.title.ilike(pattern)) |
+            (Artwork.category.ilike(pattern)) |
+            (Artwork.artist_name.ilike(pattern)) |
+            (Artwork.description.ilike(pattern))
+        )
+    return paginate(query, 'default', cursor, limit)
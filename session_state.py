@@ -0,0 +1,57 @@
+"""
+Per-session cache of the logged-in user's cart count
+The count lives in the signed session cookie, so every worker sees the same value and
+no per-user state is held in server memory. The cart badge costs no query until the
+entry is SESSION_STATE_TTL seconds old; cart changes refresh it straight away, and other
+devices catch up within the TTL. The user row itself is still loaded by primary key on
+every request, so a deleted or demoted account loses its access immediately.
+"""
+import time
+from flask import current_app, session
+from flask_login import user_logged_in, user_logged_out
+from models import db, User
+
+CART_COUNT_KEY = '_cart_count'
+
+
+def _fresh(entry, user_id):
+    return (entry is not None and entry.get('user_id') == user_id
+            and time.time() - entry['at'] < current_app.config['SESSION_STATE_TTL'])
+
+
+def load_user(user_id):
+    """Flask-Login user loader: one primary-key lookup, so role changes and deletions
+    take effect on the next request"""
+    return db.session.get(User, int(user_id))
+
+
+# ==================== CART COUNT ====================
+
+def cart_count(user):
+    """Number of cart lines for the badge, counted at most once per TTL"""
+    cached = session.get(CART_COUNT_KEY)
+    if _fresh(cached, user.id):
+        return cached['count']
+    return cart_changed(user)
+
+
+def cart_changed(user):
+    """Recount after a cart mutation and cache the result; returns the new count"""
+    count = user.get_cart_count()
+    session[CART_COUNT_KEY] = {'user_id': user.id, 'at': time.time(), 'count': count}
+    return count
+
+
+def invalidate_cart():
+    session.pop(CART_COUNT_KEY, None)
+
+
+def forget(*args, **kwargs):
+    """Drop the cached count (connected to Flask-Login's login and logout signals)"""
+    session.pop(CART_COUNT_KEY, None)
+
+
+def init_app(app):
+    app.config.setdefault('SESSION_STATE_TTL', 300)
+    user_logged_in.connect(forget, app)
+    user_logged_out.connect(forget, app)
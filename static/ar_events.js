@@ -0,0 +1,51 @@
+// ========================================
+// AR EVENT BEACONS
+// Queues AR engagement events and sends them in small batches,
+// flushing on a timer and when the page is hidden or closed.
+// ========================================
+(function () {
+  const ENDPOINT = '/api/ar-events';
+  const MAX_BATCH = 20;
+  const FLUSH_DELAY_MS = 10000;
+
+  let queue = [];
+  let flushTimer = null;
+
+  function flush() {
+    clearTimeout(flushTimer);
+    flushTimer = null;
+    if (queue.length === 0) return;
+
+    const body = JSON.stringify({ events: queue.splice(0, MAX_BATCH) });
+    const sent = navigator.sendBeacon &&
+      navigator.sendBeacon(ENDPOINT, new Blob([body], { type: 'application/json' }));
+    if (!sent) {
+      fetch(ENDPOINT, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: body,
+        keepalive: true
+      }).catch(() => {});
+    }
+
+    if (queue.length > 0) flush();
+  }
+
+  function track(artworkId, type, source) {
+    if (!artworkId) return;
+    queue.push({ artwork_id: artworkId, type: type, source: source });
+
+    if (queue.length >= MAX_BATCH) {
+      flush();
+    } else if (!flushTimer) {
+      flushTimer = setTimeout(flush, FLUSH_DELAY_MS);
+    }
+  }
+
+  document.addEventListener('visibilitychange', () => {
+    if (document.visibilityState === 'hidden') flush();
+  });
+  window.addEventListener('pagehide', flush);
+
+  window.ARTracker = { track: track, flush: flush };
+})();
@@ -0,0 +1,160 @@
+"""
+File serving for /static and /media
+Compressible text assets (glTF, JSON, CSS, JS, SVG) get .br/.gz siblings at build or
+upload time, and clients that accept them are sent the sibling as-is, so no request
+pays for compression. Every response has a strong content ETag and answers
+If-None-Match with 304. Range requests are honoured so model-viewer can load GLBs
+progressively. Files go out through send_file, which uses the server's sendfile()
+file wrapper (or X-Sendfile with USE_X_SENDFILE).
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import shutil
+from functools import lru_cache
+from flask import abort, request, send_file
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # gzip siblings only
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = {'.gltf', '.json', '.css', '.js', '.svg', '.txt'}
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))  # in order of preference
+SIBLING_SUFFIXES = tuple(suffix for _, suffix in ENCODINGS)
+MIN_SIZE = 1024
+MIN_SAVING = 0.1  # keep a sibling only if it is at least 10% smaller
+READ_SIZE = 64 * 1024
+IMMUTABLE_PREFIX = 'dist/'  # fingerprinted bundles written by static_pages.py
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Not in every platform's mime.types; model-viewer needs the right type for ranged loads
+mimetypes.add_type('model/gltf-binary', '.glb')
+mimetypes.add_type('model/gltf+json', '.gltf')
+
+
+# ==================== PRECOMPRESSION ====================
+
+def _gzip(src, dst):
+    with gzip.GzipFile(filename='', mode='wb', fileobj=dst, compresslevel=9, mtime=0) as out:
+        shutil.copyfileobj(src, out, READ_SIZE)
+
+
+def _brotli(src, dst):
+    compressor = brotli.Compressor(quality=11)
+    for chunk in iter(lambda: src.read(READ_SIZE), b''):
+        dst.write(compressor.process(chunk))
+    dst.write(compressor.finish())
+
+
+COMPRESSORS = {'gzip': _gzip}
+if brotli is not None:
+    COMPRESSORS['br'] = _brotli
+
+
+def _is_fresh(path, sibling):
+    try:
+        return os.path.getmtime(sibling) >= os.path.getmtime(path)
+    except OSError:
+        return False
+
+
+def precompress(path):
+    """Write missing or stale .br/.gz siblings for a compressible file; returns how many were written"""
+    if os.path.splitext(path)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+        return 0
+    size = os.path.getsize(path)
+    if size < MIN_SIZE:
+        return 0
+
+    written = 0
+    for encoding, suffix in ENCODINGS:
+        compress = COMPRESSORS.get(encoding)
+        sibling = path + suffix
+        if compress is None or _is_fresh(path, sibling):
+            continue
+        tmp_path = f'{sibling}.tmp'
+        with open(path, 'rb') as src, open(tmp_path, 'wb') as dst:
+            compress(src, dst)
+        if os.path.getsize(tmp_path) <= size * (1 - MIN_SAVING):
+            os.replace(tmp_path, sibling)
+            written += 1
+        else:
+            os.remove(tmp_path)
+            if os.path.exists(sibling):
+                os.remove(sibling)
+    return written
+
+
+def precompress_tree(root):
+    """Precompress every eligible file under root (e.g. the static folder at deploy time)"""
+    written = 0
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            if not filename.endswith(SIBLING_SUFFIXES + ('.tmp',)):
+                written += precompress(os.path.join(directory, filename))
+    return written
+
+
+# ==================== SERVING ====================
+
+@lru_cache(maxsize=4096)
+def _content_hash(path, mtime_ns, size):
+    """SHA-256 prefix of a file, cached until its mtime or size changes"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(READ_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:32]
+
+
+def _choose_encoding(path):
+    """(file to send, Content-Encoding) for this request. Range requests always get the
+    identity file, so byte offsets refer to the model itself."""
+    if 'Range' not in request.headers:
+        for encoding, suffix in ENCODINGS:
+            if request.accept_encodings[encoding] and _is_fresh(path, path + suffix):
+                return path + suffix, encoding
+    return path, None
+
+
+def send_asset(directory, filename, max_age=None, immutable=False, etag=None):
+    """
+    Send directory/filename, preferring a precompressed sibling the client accepts.
+    etag defaults to a hash of the file's content; pass one when the name already is one.
+    """
+    path = safe_join(directory, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    compressible = os.path.splitext(path)[1].lower() in COMPRESSIBLE_EXTENSIONS
+    send_path, encoding = _choose_encoding(path) if compressible else (path, None)
+    if etag is None:
+        stat = os.stat(path)
+        etag = _content_hash(path, stat.st_mtime_ns, stat.st_size)
+    if encoding:
+        # Each encoding is a different byte sequence, so it needs its own strong ETag
+        etag = f'{etag}-{encoding}'
+
+    mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    response = send_file(send_path, mimetype=mimetype, etag=etag, max_age=max_age, conditional=True)
+    if compressible:
+        response.vary.add('Accept-Encoding')
+    if encoding:
+        response.content_encoding = encoding
+    if immutable:
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    return response
+
+
+def init_app(app):
+    """Serve the static folder through send_asset() instead of Flask's default handler"""
+    def static(filename):
+        if filename.startswith(IMMUTABLE_PREFIX):
+            # A new build writes new names, so these can be cached forever
+            return send_asset(app.static_folder, filename, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+        return send_asset(app.static_folder, filename)
+    app.view_functions['static'] = static
@@ -0,0 +1,195 @@
+"""
+Build step for the crafts map and wall stylist pages
+`flask build-pages` renders each page's content once, moves its inline <style> and
+<script> blocks into minified bundles named by content hash (static/dist/, served as
+immutable), records them in static/dist/manifest.json and writes a built template
+that links them. The routes render the built template when it exists, and the source
+template in debug mode or before the first build; rerun the build after editing a page.
+The crafts map's per-state artworks come from a JSON snapshot that is rebuilt from
+the database at most every STATE_SNAPSHOT_TTL seconds.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from flask import current_app, render_template, url_for
+from sqlalchemy import func
+from models import db, Artwork
+from static_assets import precompress, send_asset
+
+PAGES = {'crafts_map': 'crafts_map.html', 'wall_stylist': 'wall_stylist.html'}
+DIST_DIR = 'dist'              # under the static folder
+BUILT_TEMPLATE_DIR = 'built'   # under the templates folder
+MANIFEST_FILENAME = 'manifest.json'
+CRAFTS_PER_STATE = 4
+
+# Inline blocks only: <script src=...> and <script type="module"> tags stay in the page
+INLINE_BLOCK = re.compile(r'<(style|script)>(.*?)</\1>', re.DOTALL)
+PLACEHOLDER = re.compile(r'\0(style|script)\0')
+CSS_COMMENT = re.compile(r'/\*.*?\*/', re.DOTALL)
+CSS_SPACE = re.compile(r'\s*([{};,])\s*')
+
+_manifest = {'mtime_ns': None, 'entries': {}}
+
+
+def _write_atomic(path, text):
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+# ==================== MINIFYING ====================
+
+def minify_css(css):
+    css = CSS_COMMENT.sub('', css)
+    css = CSS_SPACE.sub(r'\1', ' '.join(css.split()))
+    return css.replace(': ', ':').replace(';}', '}').strip()
+
+
+def minify_js(js):
+    """Drop indentation, blank lines and whole-line comments. Line breaks stay, so
+    automatic semicolon insertion works as before."""
+    lines = (line.strip() for line in js.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//')) + '\n'
+
+
+# ==================== BUILD ====================
+
+def _dist_dir(app):
+    return os.path.join(app.static_folder, DIST_DIR)
+
+
+def _built_dir(app):
+    return os.path.join(app.root_path, app.template_folder, BUILT_TEMPLATE_DIR)
+
+
+def _write_bundle(app, name, ext, content):
+    """Write one fingerprinted bundle; returns its path under the static folder"""
+    digest = hashlib.sha256(content.encode()).hexdigest()[:12]
+    filename = f'{name}.{digest}{ext}'
+    path = os.path.join(_dist_dir(app), filename)
+    if not os.path.exists(path):
+        _write_atomic(path, content)
+        precompress(path)
+    return f'{DIST_DIR}/{filename}'
+
+
+def build_page(app, name, source):
+    """Pre-render one page and split out its inline CSS/JS; returns its manifest entries"""
+    template = app.jinja_env.get_template(source)
+    context = {}
+    app.update_template_context(context)
+    title = ''.join(template.blocks['title'](template.new_context(context)))
+    content = ''.join(template.blocks['content'](template.new_context(context)))
+
+    blocks = {'style': [], 'script': []}
+    def extract(match):
+        kind, body = match.groups()
+        blocks[kind].append(body)
+        # The bundle is linked where the first block of its kind was
+        return f'\0{kind}\0' if len(blocks[kind]) == 1 else ''
+    content = INLINE_BLOCK.sub(extract, content)
+
+    entries = {}
+    links = {}
+    if blocks['style']:
+        entries[f'{name}.css'] = _write_bundle(app, name, '.css', minify_css('\n'.join(blocks['style'])))
+        links['style'] = f'<link rel="stylesheet" href="{{{{ asset_url(\'{name}.css\') }}}}">'
+    if blocks['script']:
+        entries[f'{name}.js'] = _write_bundle(app, name, '.js', minify_js(';\n'.join(blocks['script'])))
+        links['script'] = f'<script src="{{{{ asset_url(\'{name}.js\') }}}}"></script>'
+
+    # The markup is already rendered; only the bundle links are left for Jinja
+    pieces = []
+    for index, part in enumerate(PLACEHOLDER.split(content)):
+        if index % 2:
+            pieces.append(links[part])
+        elif part:
+            pieces.append('{% raw %}' + part + '{% endraw %}')
+    built = ('{% extends "base.html" %}\n'
+             '{% block title %}{% raw %}' + title + '{% endraw %}{% endblock title %}\n'
+             '{% block content %}' + ''.join(pieces) + '{% endblock content %}\n')
+    _write_atomic(os.path.join(_built_dir(app), f'{name}.html'), built)
+    return entries
+
+
+def build(app):
+    """Build every page in PAGES and write the manifest; returns it"""
+    os.makedirs(_dist_dir(app), exist_ok=True)
+    os.makedirs(_built_dir(app), exist_ok=True)
+    manifest = {}
+    with app.test_request_context('/'):
+        for name, source in PAGES.items():
+            manifest.update(build_page(app, name, source))
+    _write_atomic(os.path.join(_dist_dir(app), MANIFEST_FILENAME), json.dumps(manifest, indent=2, sort_keys=True))
+    return manifest
+
+
+# ==================== SERVING ====================
+
+def asset_url(name):
+    """URL of a bundle by its name in the manifest (e.g. 'crafts_map.js')"""
+    path = os.path.join(_dist_dir(current_app), MANIFEST_FILENAME)
+    mtime_ns = os.stat(path).st_mtime_ns
+    if _manifest['mtime_ns'] != mtime_ns:
+        with open(path, encoding='utf-8') as f:
+            _manifest.update(mtime_ns=mtime_ns, entries=json.load(f))
+    return url_for('static', filename=_manifest['entries'][name])
+
+
+def render_page(name):
+    """Render the built page, or its source template in debug mode or before a build"""
+    built = os.path.join(_built_dir(current_app), f'{name}.html')
+    if not current_app.debug and os.path.exists(built):
+        return render_template(f'{BUILT_TEMPLATE_DIR}/{name}.html')
+    return render_template(PAGES[name])
+
+
+# ==================== STATE SNAPSHOT ====================
+
+def state_snapshot():
+    """{state: {'count': n, 'crafts': [{'artId', 'name', 'image'}]}} over active artworks,
+    with each state's most liked artworks first"""
+    active = (Artwork.is_active == True, Artwork.state.isnot(None), Artwork.state != '')
+    counts = db.session.query(Artwork.state, func.count(Artwork.id)).filter(*active).group_by(Artwork.state)
+    states = {state: {'count': count, 'crafts': []} for state, count in counts}
+
+    rank = func.row_number().over(partition_by=Artwork.state,
+                                  order_by=(Artwork.likes_count.desc(), Artwork.id)).label('rank')
+    ranked = db.session.query(Artwork.id, Artwork.state, Artwork.title, Artwork.image, rank).filter(*active).subquery()
+    rows = db.session.query(ranked).filter(ranked.c.rank <= CRAFTS_PER_STATE).order_by(ranked.c.state, ranked.c.rank)
+    for row in rows:
+        states[row.state]['crafts'].append({'artId': row.id, 'name': row.title, 'image': row.image})
+    return states
+
+
+def write_state_snapshot(app):
+    snapshot = {'generated_at': datetime.utcnow().isoformat(timespec='seconds') + 'Z', 'states': state_snapshot()}
+    path = app.config['STATE_SNAPSHOT_PATH']
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _write_atomic(path, json.dumps(snapshot, separators=(',', ':')))
+
+
+def send_state_snapshot():
+    """The snapshot as a response, rebuilt first when it is STATE_SNAPSHOT_TTL seconds old.
+    Workers racing to rebuild it just replace the file with the same data."""
+    app = current_app
+    path = app.config['STATE_SNAPSHOT_PATH']
+    ttl = app.config['STATE_SNAPSHOT_TTL']
+    try:
+        stale = time.time() - os.path.getmtime(path) >= ttl
+    except OSError:
+        stale = True
+    if stale:
+        write_state_snapshot(app)
+    return send_asset(os.path.dirname(path), os.path.basename(path), max_age=ttl)
+
+
+def init_app(app):
+    app.config.setdefault('STATE_SNAPSHOT_PATH', os.path.join(app.root_path, 'logs', 'state_crafts.json'))
+    app.config.setdefault('STATE_SNAPSHOT_TTL', 300)
+    app.add_template_global(asset_url)
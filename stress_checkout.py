@@ -0,0 +1,129 @@
+"""
+Stress test checkout stock reservation: many customers buy the last units at once
+Every customer has the same artwork in their cart and all of them post /checkout/process
+together. Passes when the orders placed never add up to more than the stock there was
+and the artwork's stock_quantity ends at exactly what is left; exits 1 on overselling.
+Builds a throwaway SQLite database unless --database-url is given.
+The same race runs under pytest in tests/test_checkout_concurrency.py.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from werkzeug.security import generate_password_hash
+from models import db, User, Artwork, CartItem, Order, OrderItem
+
+PASSWORD = 'stress'
+SHIPPING = {'name': 'Stress Buyer', 'email': 'buyer@example.com', 'phone': '9999999999',
+            'address': '1 Market Road', 'city': 'Jaipur', 'state': 'Rajasthan', 'pincode': '302001'}
+
+
+def seed(customers, stock, quantity):
+    """One artwork with `stock` units, already in every customer's cart"""
+    password_hash = generate_password_hash(PASSWORD)  # hashed once; every buyer shares it
+    seller = User(username='stress_seller', email='seller@example.com', role='seller',
+                  password_hash=password_hash)
+    db.session.add(seller)
+    db.session.flush()
+    artwork = Artwork(title='Last Blue Pottery Vase', category='Pottery', price=999, user_id=seller.id,
+                      artist_name='Stress Seller', state='Rajasthan', stock_quantity=stock)
+    db.session.add(artwork)
+    db.session.flush()
+
+    usernames = []
+    for i in range(customers):
+        customer = User(username=f'buyer{i}', email=f'buyer{i}@example.com', role='customer',
+                        password_hash=password_hash)
+        db.session.add(customer)
+        db.session.flush()
+        db.session.add(CartItem(user_id=customer.id, artwork_id=artwork.id, quantity=quantity))
+        usernames.append(customer.username)
+    artwork.carts_count = customers
+    db.session.commit()
+    return artwork.id, usernames
+
+
+def buy(app, username, start, outcomes):
+    """Log in, wait for everyone, then check out once"""
+    client = app.test_client()
+    client.post('/login', data={'username': username, 'password': PASSWORD})
+    start.wait()
+    response = client.post('/checkout/process', data=SHIPPING)
+    location = response.headers.get('Location', '')
+    outcomes[username] = 'ordered' if '/order/' in location else 'rejected' if location.endswith('/cart') else 'error'
+
+
+def run(app, customers, stock, quantity):
+    """Seed, let every customer check out at once and count what happened (tables must exist)"""
+    with app.app_context():
+        artwork_id, usernames = seed(customers, stock, quantity)
+
+    outcomes = {}
+    start = threading.Barrier(len(usernames))
+    threads = [threading.Thread(target=buy, args=(app, username, start, outcomes)) for username in usernames]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        remaining = db.session.get(Artwork, artwork_id).stock_quantity
+        sold = db.session.query(db.func.coalesce(db.func.sum(OrderItem.quantity), 0)).filter(
+            OrderItem.artwork_id == artwork_id).scalar()
+        orders = Order.query.count()
+
+    # A buyer whose thread raised never recorded an outcome
+    counts = Counter(outcomes.get(username, 'error') for username in usernames)
+    return {'counts': counts, 'orders': orders, 'sold': sold, 'remaining': remaining, 'elapsed': elapsed,
+            'expected_sold': min(stock // quantity, customers) * quantity}
+
+
+def oversold(result, stock):
+    return result['sold'] > stock or result['remaining'] != stock - result['sold'] or result['remaining'] < 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--customers', type=int, default=40, help='concurrent buyers')
+    parser.add_argument('--stock', type=int, default=5, help='units in stock at the start')
+    parser.add_argument('--quantity', type=int, default=1, help='units each buyer orders')
+    parser.add_argument('--database-url', help='database to use (default: a temporary SQLite file)')
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix='visioncraft-stress-'), 'stress.db')
+    os.environ['DATABASE_URL'] = args.database_url or f'sqlite:///{db_path}'
+    from app import app  # must follow DATABASE_URL
+
+    with app.app_context():
+        db.create_all()
+    result = run(app, args.customers, args.stock, args.quantity)
+
+    counts = result['counts']
+    print("\n" + "=" * 70)
+    print(f"  {args.customers} buyers x {args.quantity} unit(s), {args.stock} in stock  ({result['elapsed']:.2f}s)")
+    print("=" * 70)
+    print(f"  Orders placed:   {counts['ordered']} ({result['orders']} in the database)")
+    print(f"  Rejected:        {counts['rejected']}")
+    print(f"  Errors:          {counts['error']}")
+    print(f"  Units sold:      {result['sold']}")
+    print(f"  Stock remaining: {result['remaining']}")
+
+    failed = oversold(result, args.stock)
+    if failed:
+        print("  FAIL: stock was oversold or lost")
+    elif result['sold'] < result['expected_sold']:
+        print(f"  OK, no overselling (only {result['sold']} of {result['expected_sold']} sellable units went; "
+              "see errors)")
+    else:
+        print("  OK, no overselling")
+    print("=" * 70 + "\n")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
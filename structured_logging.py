@@ -0,0 +1,201 @@
+"""
+JSON logging for VisionCraft
+Every record is one JSON object carrying the request id, user id, route and (for the
+per-request access line) latency. Request threads only put records on a queue; a
+listener thread per process does the formatting and file I/O. The log file rotates by
+size and at midnight UTC, and gunicorn workers can share it: rollover happens under a
+lock, and a worker whose file was rotated by another simply reopens it.
+"""
+import atexit
+import fcntl
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime, timedelta, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from flask import g, has_request_context, request, session
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+QUEUE_SIZE = 10000  # records held while the disk is slow; beyond this they are dropped
+
+# Attributes every LogRecord has; anything else was passed with extra= and is logged as a field
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'pid': record.process,
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS})
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamp records with the current request's id, user and route (runs in the request thread)"""
+
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            # The session, not current_user: loading the user could run a query mid-log
+            record.user_id = session.get('_user_id')
+            record.method = request.method
+            record.path = request.path
+            record.endpoint = request.endpoint
+        return True
+
+
+class BufferedQueueHandler(QueueHandler):
+    """Hands records to a per-process listener thread without ever blocking the caller"""
+
+    def __init__(self, *handlers):
+        super().__init__(queue.Queue(QUEUE_SIZE))
+        self.handlers = handlers
+        self.listener = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_listener(self):
+        # Threads don't survive a fork, so each gunicorn/job worker starts its own
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self.queue = queue.Queue(QUEUE_SIZE)
+            self.listener = QueueListener(self.queue, *self.handlers, respect_handler_level=True)
+            self.listener.start()
+            self._pid = os.getpid()
+
+    def prepare(self, record):
+        # Resolve the message and traceback now (args may change later) but keep the fields
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = ''.join(traceback.format_exception(*record.exc_info)).rstrip()
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+    def stop(self):
+        if self.listener is not None and self._pid == os.getpid():
+            self.listener.stop()
+
+
+class SharedRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler that several processes can append to and rotate safely,
+    rolling over at maxBytes or at midnight UTC, whichever comes first"""
+
+    def __init__(self, filename, maxBytes, backupCount):
+        super().__init__(filename, maxBytes=maxBytes, backupCount=backupCount, delay=True)
+        self._next_midnight = self._midnight_after(time.time())
+
+    @staticmethod
+    def _midnight_after(timestamp):
+        day = datetime.fromtimestamp(timestamp, timezone.utc).date() + timedelta(days=1)
+        return datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp()
+
+    def _reopen_if_rotated(self):
+        if self.stream is None:
+            return
+        try:
+            on_disk = os.stat(self.baseFilename)
+        except FileNotFoundError:
+            on_disk = None
+        opened = os.fstat(self.stream.fileno())
+        if on_disk is None or (on_disk.st_dev, on_disk.st_ino) != (opened.st_dev, opened.st_ino):
+            self.stream.close()
+            self.stream = self._open()
+
+    def emit(self, record):
+        self._reopen_if_rotated()
+        super().emit(record)
+
+    def shouldRollover(self, record):
+        if time.time() >= self._next_midnight:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        with open(self.baseFilename + '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self._reopen_if_rotated()
+            if self.stream is None:
+                self.stream = self._open()
+            # Another worker may have rotated while we waited for the lock
+            stat = os.fstat(self.stream.fileno())
+            due_by_time = (time.time() >= self._next_midnight
+                           and stat.st_size and stat.st_mtime < self._next_midnight)
+            if due_by_time or stat.st_size >= self.maxBytes:
+                super().doRollover()
+            self._next_midnight = self._midnight_after(time.time())
+
+
+# ==================== REQUEST HOOKS ====================
+
+def _start_request():
+    supplied = request.headers.get(REQUEST_ID_HEADER, '')
+    g.request_id = supplied if REQUEST_ID_PATTERN.match(supplied) else uuid.uuid4().hex
+    g.log_started = time.perf_counter()
+
+
+def _log_request(app):
+    def after_request(response):
+        response.headers[REQUEST_ID_HEADER] = g.get('request_id', '')
+        started = g.get('log_started')
+        latency_ms = round((time.perf_counter() - started) * 1000, 2) if started else None
+        app.logger.info('%s %s %s', request.method, request.path, response.status_code,
+                        extra={'event': 'request', 'status': response.status_code, 'latency_ms': latency_ms})
+        return response
+    return after_request
+
+
+def init_app(app):
+    """Route app.logger through a queue to a shared, rotating JSON log file"""
+    app.config.setdefault('LOG_FILE', os.path.join(app.root_path, 'logs', 'visioncraft.log'))
+    app.config.setdefault('LOG_MAX_BYTES', 50 * 1024 * 1024)
+    app.config.setdefault('LOG_BACKUP_COUNT', 14)
+    app.config.setdefault('LOG_LEVEL', 'INFO')
+    app.before_request(_start_request)
+    app.after_request(_log_request(app))
+
+    context_filter = RequestContextFilter()
+    for handler in app.logger.handlers:
+        handler.addFilter(context_filter)
+    if app.debug:
+        return
+
+    os.makedirs(os.path.dirname(app.config['LOG_FILE']), exist_ok=True)
+    file_handler = SharedRotatingFileHandler(app.config['LOG_FILE'], app.config['LOG_MAX_BYTES'],
+                                             app.config['LOG_BACKUP_COUNT'])
+    file_handler.setFormatter(JsonFormatter())
+    queue_handler = BufferedQueueHandler(file_handler)
+    queue_handler.addFilter(context_filter)
+    app.logger.addHandler(queue_handler)
+    atexit.register(queue_handler.stop)  # drain what is still queued
+    app.logger.setLevel(app.config['LOG_LEVEL'])
+    app.extensions['structured_logging'] = queue_handler
@@ -0,0 +1,142 @@
+"""
+In-memory typeahead index for artwork titles, artists and categories
+One sorted array of (prefix key, type, text) tuples per type, searched with bisect
+"""
+import bisect
+import threading
+import time
+from flask import current_app
+from models import Artwork
+
+SUGGEST_LIMIT = 8
+MAX_SCAN = 200
+REFRESH_INTERVAL = 600  # seconds; converges workers that missed another worker's edits
+KINDS = ('category', 'artist', 'title')  # lookup order: broad matches first
+
+
+def entries_for(title, artist_name, category):
+    """Index keys for one artwork: every word-aligned tail of each field, so 'pea' finds 'Madhubani Peacock'"""
+    entries = set()
+    for kind, value in (('title', title), ('artist', artist_name), ('category', category)):
+        text = ' '.join((value or '').split())
+        words = text.lower().split()
+        for i in range(len(words)):
+            entries.add((' '.join(words[i:]), kind, text))
+    return entries
+
+
+class SuggestIndex:
+    """Per-process prefix index kept current by the upload/edit/delete routes"""
+
+    def __init__(self, refresh_interval=REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._keys = {kind: [] for kind in KINDS}  # kind -> sorted (key, kind, text)
+        self._refcounts = {}   # entry -> number of artworks contributing it
+        self._by_artwork = {}  # artwork_id -> entries
+        self._built_at = None
+        self._refreshing = False
+
+    # ==================== BUILDING ====================
+
+    def rebuild(self):
+        """Load all active artworks and swap in a fresh index"""
+        by_artwork, refcounts = {}, {}
+        rows = Artwork.query.with_entities(
+            Artwork.id, Artwork.title, Artwork.artist_name, Artwork.category
+        ).filter_by(is_active=True)
+        for artwork_id, title, artist_name, category in rows:
+            entries = entries_for(title, artist_name, category)
+            by_artwork[artwork_id] = entries
+            for entry in entries:
+                refcounts[entry] = refcounts.get(entry, 0) + 1
+
+        keys = {kind: [] for kind in KINDS}
+        for entry in refcounts:
+            keys[entry[1]].append(entry)
+        for kind_keys in keys.values():
+            kind_keys.sort()
+
+        with self._lock:
+            self._keys, self._refcounts, self._by_artwork = keys, refcounts, by_artwork
+            self._built_at = time.monotonic()
+
+    def ensure_fresh(self):
+        """Build on first use; afterwards refresh stale indexes in the background"""
+        if self._built_at is None:
+            self.rebuild()
+        elif time.monotonic() - self._built_at > self.refresh_interval and not self._refreshing:
+            self._refreshing = True
+            app = current_app._get_current_object()
+            threading.Thread(target=self._background_rebuild, args=(app,), daemon=True).start()
+
+    def _background_rebuild(self, app):
+        try:
+            with app.app_context():
+                self.rebuild()
+        except Exception:
+            app.logger.exception('Suggest index refresh failed')
+        finally:
+            self._refreshing = False
+
+    # ==================== INCREMENTAL UPDATES ====================
+
+    def update_artwork(self, artwork):
+        """Re-index one artwork after upload or edit (removes it if inactive)"""
+        if self._built_at is None:
+            return  # Not built yet - the first build will read the current row
+        with self._lock:
+            self._remove(artwork.id)
+            if artwork.is_active:
+                self._add(artwork.id, entries_for(artwork.title, artwork.artist_name, artwork.category))
+
+    def discard_artwork(self, artwork_id):
+        """Drop one artwork, e.g. after a soft delete"""
+        if self._built_at is None:
+            return
+        with self._lock:
+            self._remove(artwork_id)
+
+    def _add(self, artwork_id, entries):
+        for entry in entries:
+            count = self._refcounts.get(entry, 0)
+            if count == 0:
+                bisect.insort(self._keys[entry[1]], entry)
+            self._refcounts[entry] = count + 1
+        self._by_artwork[artwork_id] = entries
+
+    def _remove(self, artwork_id):
+        for entry in self._by_artwork.pop(artwork_id, ()):
+            count = self._refcounts[entry] - 1
+            if count:
+                self._refcounts[entry] = count
+            else:
+                del self._refcounts[entry]
+                kind_keys = self._keys[entry[1]]
+                del kind_keys[bisect.bisect_left(kind_keys, entry)]
+
+    # ==================== LOOKUP ====================
+
+    def suggest(self, prefix, limit=SUGGEST_LIMIT):
+        """Distinct (text, type) suggestions whose field has a word starting with the prefix"""
+        prefix = ' '.join(prefix.lower().split())
+        if not prefix:
+            return []
+
+        results, seen = [], set()
+        with self._lock:
+            for kind in KINDS:
+                kind_keys = self._keys[kind]
+                start = bisect.bisect_left(kind_keys, (prefix,))
+                for key, _, text in kind_keys[start:start + MAX_SCAN]:
+                    if not key.startswith(prefix):
+                        break
+                    if (kind, text) not in seen:
+                        seen.add((kind, text))
+                        results.append({'text': text, 'type': kind})
+                        if len(results) == limit:
+                            return results
+        return results
+
+
+suggestions = SuggestIndex()
@@ -0,0 +1,99 @@
+"""
+Shared fixtures: the app on a throwaway SQLite file with caching off, so every request
+runs (and the query profiler counts) its real queries
+"""
+import os
+import tempfile
+
+import pytest
+
+TMP_DIR = tempfile.mkdtemp(prefix='visioncraft-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(TMP_DIR, 'test.db')}"
+os.environ['CACHE_BACKEND'] = 'null'
+os.environ['METRICS_DIR'] = os.path.join(TMP_DIR, 'metrics')
+
+from sqlalchemy import event  # noqa: E402  (must follow DATABASE_URL)
+from werkzeug.security import generate_password_hash  # noqa: E402
+from app import app as flask_app, db  # noqa: E402
+from models import User, Artwork, Like  # noqa: E402
+from view_counter import view_counter  # noqa: E402
+
+PASSWORD = 'secret'
+PASSWORD_HASH = generate_password_hash(PASSWORD)  # hashed once; every seeded user shares it
+CATEGORIES = ('Pottery', 'Painting', 'Textile', 'Woodwork')
+STATES = ('Rajasthan', 'Bihar', 'Kerala', 'Odisha')
+
+flask_app.config.update(
+    TESTING=True,
+    QUERY_PROFILING=True,
+    SESSION_COOKIE_SECURE=False,
+    VIEW_FLUSH_INTERVAL=3600,  # flushed by the fixture, never mid-request
+)
+
+
+@pytest.fixture
+def app():
+    """The app over empty tables. Requests push their own app context, so tests open
+    one only around direct database work."""
+    with flask_app.app_context():
+        db.create_all()
+    yield flask_app
+    view_counter.flush()
+    with flask_app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def add_user(username, role='customer'):
+    user = User(username=username, email=f'{username}@example.com', role=role, password_hash=PASSWORD_HASH)
+    db.session.add(user)
+    db.session.flush()
+    return user
+
+
+def add_catalog(seller, count, likers=()):
+    """`count` active artworks by seller across CATEGORIES and STATES; each liker likes
+    every other one. Returns the artworks; the caller commits."""
+    artworks = [Artwork(title=f'{CATEGORIES[i % len(CATEGORIES)]} piece {i}', category=CATEGORIES[i % len(CATEGORIES)],
+                        state=STATES[i % len(STATES)], price=500 + i, user_id=seller.id,
+                        artist_name=seller.username, description=f'Handmade piece number {i}')
+                for i in range(count)]
+    db.session.add_all(artworks)
+    db.session.flush()
+    for offset, liker in enumerate(likers):
+        for artwork in artworks[offset % 2::2]:
+            db.session.add(Like(user_id=liker.id, artwork_id=artwork.id))
+            artwork.likes_count += 1
+    return artworks
+
+
+def login(client, username):
+    """Log in and render one page, so the welcome flash is not left in the session"""
+    response = client.post('/login', data={'username': username, 'password': PASSWORD})
+    assert response.status_code == 302, response.status_code
+    client.get(response.headers['Location'])
+
+
+@pytest.fixture
+def count_queries(app):
+    """count_queries(fn) -> (statements fn() ran, its return value)"""
+    def count(fn):
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', record)
+        try:
+            result = fn()
+        finally:
+            event.remove(engine, 'before_cursor_execute', record)
+        return len(statements), result
+    return count
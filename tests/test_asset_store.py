@@ -0,0 +1,88 @@
+"""
+Asset GC against uploads of the same bytes: a blob is only unlinked when no upload
+could be using it
+"""
+import io
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+import asset_store
+from models import db, Asset
+
+CONTENT = b'blue pottery vase'
+GRACE = timedelta(minutes=5)
+
+
+@pytest.fixture
+def store(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'ASSET_STORE_DIR', str(tmp_path))
+    return tmp_path
+
+
+def upload(app):
+    """A committed upload whose only reference was dropped an hour ago; returns its blob path"""
+    with app.app_context():
+        url = asset_store.save_upload(io.BytesIO(CONTENT), '.jpg')
+        db.session.commit()
+        asset_store.release(url)
+        Asset.query.update({Asset.updated_at: datetime.utcnow() - timedelta(hours=1)})
+        db.session.commit()
+        return asset_store.local_path(url)
+
+
+def test_unreferenced_blob_is_removed(app, store):
+    path = upload(app)
+    with app.app_context():
+        stats = asset_store.collect_garbage(grace=GRACE)
+        assert Asset.query.count() == 0
+    assert stats['blobs'] == 1 and stats['bytes'] == len(CONTENT)
+    assert not os.path.exists(path)
+    assert os.listdir(store / asset_store.TMP_DIRNAME) == []
+
+
+def test_upload_placed_after_the_row_is_deleted_survives(app, store):
+    path = upload(app)
+
+    def reupload():
+        # What save_upload does once GC's DELETE is committed: its new row isn't
+        # committed yet, so GC can't see it, but the file is already back in place
+        with open(path + '.new', 'wb') as f:
+            f.write(CONTENT)
+        os.replace(path + '.new', path)
+
+    def after_commit(session):
+        # Only the DELETE's commit finds the blob set aside
+        if not os.path.exists(path):
+            reupload()
+
+    event.listen(Session, 'after_commit', after_commit)
+    try:
+        with app.app_context():
+            asset_store.collect_garbage(grace=GRACE)
+    finally:
+        event.remove(Session, 'after_commit', after_commit)
+    with open(path, 'rb') as f:
+        assert f.read() == CONTENT
+
+
+def test_blob_reacquired_before_the_delete_is_restored(app, store, monkeypatch):
+    path = upload(app)
+    set_aside = asset_store._set_aside
+
+    def set_aside_then_acquire(blob_path, tombstone):
+        moved = set_aside(blob_path, tombstone)
+        # An upload commits a new reference between the rename and GC's DELETE
+        Asset.query.update({Asset.ref_count: Asset.ref_count + 1})
+        db.session.commit()
+        return moved
+
+    monkeypatch.setattr(asset_store, '_set_aside', set_aside_then_acquire)
+    with app.app_context():
+        asset_store.collect_garbage(grace=GRACE)
+        assert Asset.query.one().ref_count == 1
+    with open(path, 'rb') as f:
+        assert f.read() == CONTENT
@@ -0,0 +1,36 @@
+"""
+Customers racing for the last units of an artwork never oversell it: every buyer posts
+/checkout/process at the same moment, against the suite's SQLite file
+"""
+import pytest
+
+import stress_checkout
+from models import Artwork
+
+
+@pytest.mark.parametrize('customers, stock, quantity', [
+    (12, 5, 1),   # more buyers than units
+    (10, 7, 2),   # one unit is left that nobody can take
+    (6, 10, 1),   # enough for everyone
+])
+def test_concurrent_checkouts_never_oversell(app, customers, stock, quantity):
+    result = stress_checkout.run(app, customers, stock, quantity)
+    counts = result['counts']
+
+    assert not stress_checkout.oversold(result, stock), result
+    assert counts['error'] == 0, result
+    assert result['sold'] == result['expected_sold'], result
+    assert counts['ordered'] == result['orders'] == result['sold'] // quantity
+    assert counts['rejected'] == customers - counts['ordered']
+
+
+def test_rejected_buyers_keep_their_cart(app):
+    result = stress_checkout.run(app, customers=4, stock=1, quantity=1)
+    assert result['counts']['ordered'] == 1
+
+    with app.app_context():
+        artwork = Artwork.query.one()
+        assert artwork.stock_quantity == 0
+        assert artwork.cart_items.count() == 3
+        assert artwork.carts_count == 3
+        assert artwork.orders_count == 1
@@ -0,0 +1,43 @@
+"""
+Seller export writers: CSV cells that a spreadsheet would run as a formula are escaped,
+NDJSON values are left alone
+"""
+import csv
+import io
+import json
+from datetime import date
+
+from exports import stream_csv, stream_ndjson
+
+COLUMNS = (('artwork_title', None), ('day', None), ('revenue', None))
+ROWS = [
+    ('=HYPERLINK("http://evil.example","Vase")', date(2024, 5, 1), -12.5),
+    ('+91 Blue Pottery', date(2024, 5, 2), 0),
+    ('-Madhubani-', date(2024, 5, 3), 10),
+    ('@SUM(A1:A9)', date(2024, 5, 4), 10),
+    ('\tTabbed', date(2024, 5, 5), 10),
+    ('\rReturned', date(2024, 5, 6), 10),
+    ('Plain = fine', date(2024, 5, 7), 10),
+]
+
+
+def test_csv_escapes_formula_cells():
+    rows = list(csv.reader(io.StringIO(''.join(stream_csv(COLUMNS, ROWS)))))
+    assert rows[0] == ['artwork_title', 'day', 'revenue']
+    assert [row[0] for row in rows[1:]] == [
+        '\'=HYPERLINK("http://evil.example","Vase")',
+        "'+91 Blue Pottery",
+        "'-Madhubani-",
+        "'@SUM(A1:A9)",
+        "'\tTabbed",
+        "'\rReturned",
+        'Plain = fine',
+    ]
+    # Only text is escaped: dates and negative numbers stay as they are
+    assert rows[1][1:] == ['2024-05-01', '-12.5']
+
+
+def test_ndjson_keeps_values():
+    records = [json.loads(line) for line in ''.join(stream_ndjson(COLUMNS, ROWS)).splitlines()]
+    assert [record['artwork_title'] for record in records] == [row[0] for row in ROWS]
+    assert records[0]['revenue'] == -12.5
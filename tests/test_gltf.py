@@ -0,0 +1,108 @@
+"""
+Upload-time model check: catches broken GLB/glTF files without reading the binary chunk
+"""
+import base64
+import builtins
+import json
+import struct
+
+import pytest
+
+import gltf
+from gltf import GltfError, check_file, to_glb
+
+POSITIONS = struct.pack('<9f', 0, 0, 0, 1, 0, 0, 0, 1, 0)
+
+
+def triangle_doc(buffer):
+    return {
+        'asset': {'version': '2.0'},
+        'buffers': [buffer],
+        'bufferViews': [{'buffer': 0, 'byteLength': len(POSITIONS)}],
+        'accessors': [{'bufferView': 0, 'componentType': 5126, 'type': 'VEC3', 'count': 3}],
+        'meshes': [{'primitives': [{'attributes': {'POSITION': 0}}]}],
+        'nodes': [{'mesh': 0}],
+        'scenes': [{'nodes': [0]}],
+    }
+
+
+def write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+@pytest.fixture
+def glb(tmp_path):
+    padding = b'\0' * (1024 * 1024)  # stands in for a big mesh/texture payload
+    return write(tmp_path, 'model.glb', to_glb(triangle_doc({'byteLength': len(POSITIONS)}), POSITIONS + padding))
+
+
+def test_valid_glb_passes_without_reading_its_binary_chunk(glb, monkeypatch):
+    read = []
+
+    class CountingFile:
+        def __init__(self, f):
+            self.f = f
+
+        def read(self, size=-1):
+            data = self.f.read(size)
+            read.append(len(data))
+            return data
+
+        def __getattr__(self, name):
+            return getattr(self.f, name)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            self.f.close()
+
+    monkeypatch.setattr(gltf, 'open', lambda *args: CountingFile(builtins.open(*args)), raising=False)
+    check_file(glb)
+    assert sum(read) < 4096
+    gltf.load_valid(glb)  # and the background job's full parse agrees
+
+
+def test_valid_gltf_with_embedded_buffer_passes(tmp_path):
+    uri = 'data:application/octet-stream;base64,' + base64.b64encode(POSITIONS).decode()
+    path = write(tmp_path, 'model.gltf', json.dumps(triangle_doc({'byteLength': len(POSITIONS), 'uri': uri})).encode())
+    check_file(path)
+
+
+@pytest.mark.parametrize('mangle, message', [
+    (lambda data: data[:10], 'Truncated GLB header'),
+    (lambda data: data[:-4], 'GLB length does not match file size'),
+    (lambda data: data[:8] + struct.pack('<I', len(data) + 100) + data[12:], 'GLB length does not match'),
+    (lambda data: data[:4] + struct.pack('<I', 1) + data[8:], 'Unsupported GLB version 1'),
+    (lambda data: data[:12] + struct.pack('<I', 1 << 30) + data[16:], 'GLB chunk runs past end of file'),
+])
+def test_broken_glb_is_rejected(tmp_path, glb, mangle, message):
+    with open(glb, 'rb') as f:
+        path = write(tmp_path, 'broken.glb', mangle(f.read()))
+    with pytest.raises(GltfError, match=message):
+        check_file(path)
+
+
+@pytest.mark.parametrize('buffer, message', [
+    ({'byteLength': 4096}, 'shorter than its byteLength'),
+    ({'byteLength': 36, 'uri': 'model.bin'}, 'External .bin files'),
+])
+def test_buffer_problems_are_rejected(tmp_path, buffer, message):
+    path = write(tmp_path, 'model.glb', to_glb(triangle_doc(buffer), POSITIONS))
+    with pytest.raises(GltfError, match=message):
+        check_file(path)
+
+
+def test_structure_is_validated(tmp_path):
+    doc = triangle_doc({'byteLength': len(POSITIONS)})
+    doc['meshes'][0]['primitives'][0]['attributes']['POSITION'] = 7
+    path = write(tmp_path, 'model.glb', to_glb(doc, POSITIONS))
+    with pytest.raises(GltfError, match='missing accessor 7'):
+        check_file(path)
+
+
+def test_not_a_model(tmp_path):
+    with pytest.raises(GltfError, match='Not a glTF or GLB file'):
+        check_file(write(tmp_path, 'model.gltf', b'\x89PNG not a model'))
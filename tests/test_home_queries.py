@@ -0,0 +1,44 @@
+"""
+/home must run the same number of queries however big the catalog is and however
+many artworks the visitor has liked (no per-card like or count lookups)
+"""
+import pytest
+
+from conftest import add_catalog, add_user, login
+from models import db
+
+SMALL_CATALOG = 3
+LARGE_CATALOG = 120
+LIKERS = 5
+
+
+def seed(app, count):
+    """A seller's catalog liked by LIKERS customers, the first of whom is 'shopper'"""
+    with app.app_context():
+        seller = add_user('maker', role='seller')
+        likers = [add_user('shopper')] + [add_user(f'fan{i}') for i in range(1, LIKERS)]
+        add_catalog(seller, count, likers)
+        db.session.commit()
+
+
+def home_queries(client, count_queries):
+    client.get('/home')  # warm-up: session identity and cart count
+    queries, response = count_queries(lambda: client.get('/home'))
+    assert response.status_code == 200
+    return queries
+
+
+@pytest.mark.parametrize('logged_in', [False, True], ids=['anonymous', 'customer'])
+def test_home_query_count_does_not_grow_with_catalog(app, count_queries, logged_in):
+    counts = {}
+    for count in (SMALL_CATALOG, LARGE_CATALOG):
+        seed(app, count)
+        client = app.test_client()
+        if logged_in:
+            login(client, 'shopper')
+        counts[count] = home_queries(client, count_queries)
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+
+    assert counts[SMALL_CATALOG] == counts[LARGE_CATALOG], counts
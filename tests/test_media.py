@@ -0,0 +1,40 @@
+"""
+/media serves stored blobs and their derived variants, and nothing else in the store
+"""
+import os
+
+import pytest
+
+SHA = 'ab' * 32
+
+
+@pytest.fixture
+def store(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'ASSET_STORE_DIR', str(tmp_path))
+    for name in (f'{SHA}.jpg', f'derived/{SHA}-480.webp', f'derived/.{SHA}-lod.glb.tmp',
+                 'uploads/0123456789abcdef0123456789abcdef/meta.json',
+                 'uploads/0123456789abcdef0123456789abcdef/0.part',
+                 'tmp/5f3a9c', f'tmp/{SHA}.jpg.gc'):
+        path = tmp_path / name
+        os.makedirs(path.parent, exist_ok=True)
+        path.write_bytes(b'data')
+    return tmp_path
+
+
+@pytest.mark.parametrize('name', [f'{SHA}.jpg', f'derived/{SHA}-480.webp'])
+def test_blobs_and_variants_are_served(client, store, name):
+    response = client.get(f'/media/{name}')
+    assert response.status_code == 200
+    assert response.data == b'data'
+
+
+@pytest.mark.parametrize('name', [
+    'uploads/0123456789abcdef0123456789abcdef/0.part',
+    'uploads/0123456789abcdef0123456789abcdef/meta.json',
+    'tmp/5f3a9c',
+    f'tmp/{SHA}.jpg.gc',
+    f'derived/.{SHA}-lod.glb.tmp',
+    f'{SHA}.jpg/../tmp/5f3a9c',
+])
+def test_uploads_and_temp_files_are_not_served(client, store, name):
+    assert client.get(f'/media/{name}').status_code == 404
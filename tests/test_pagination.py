@@ -0,0 +1,57 @@
+"""
+Crafted catalog cursors are rejected with a 400 instead of reaching the database
+"""
+import pytest
+
+from conftest import add_catalog, add_user
+from models import db
+from pagination import encode_token
+
+BAD_CURSORS = [
+    ('default', 'not base64 at all!'),
+    ('default', encode_token(['a', 'list'])),
+    ('default', encode_token({'s': 'default', 'v': 123, 'id': 1})),
+    ('default', encode_token({'s': 'default', 'v': 'yesterday', 'id': 1})),
+    ('default', encode_token({'s': 'default', 'v': None, 'id': 1})),
+    ('default', encode_token({'s': 'default', 'v': '2024-05-01T00:00:00', 'id': [1]})),
+    ('default', encode_token({'s': 'default', 'v': '2024-05-01T00:00:00'})),
+    ('likes', encode_token({'s': 'likes', 'v': None, 'id': 1})),
+    ('likes', encode_token({'s': 'likes', 'v': [1, 2], 'id': 1})),
+    ('likes', encode_token({'s': 'likes', 'v': {'x': 1}, 'id': 1})),
+    ('likes', encode_token({'s': 'likes', 'v': '5', 'id': 1})),
+    ('likes', encode_token({'s': 'likes', 'v': True, 'id': 1})),
+    ('likes', encode_token({'s': 'price-low', 'v': 500, 'id': 1})),  # from another sort
+]
+
+
+@pytest.fixture
+def catalog(app):
+    with app.app_context():
+        add_catalog(add_user('maker', role='seller'), 30)
+        db.session.commit()
+
+
+@pytest.mark.parametrize('sort, cursor', BAD_CURSORS)
+def test_api_rejects_malformed_cursor(client, catalog, sort, cursor):
+    response = client.get('/api/artworks', query_string={'sort': sort, 'cursor': cursor})
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+@pytest.mark.parametrize('sort, cursor', BAD_CURSORS)
+def test_search_falls_back_to_first_page_on_malformed_cursor(client, catalog, sort, cursor):
+    response = client.get('/search', query_string={'q': 'piece', 'cursor': cursor})
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('sort', ['default', 'price-low', 'price-high', 'rating', 'likes'])
+def test_cursors_walk_the_whole_catalog(client, catalog, sort):
+    seen, cursor = [], None
+    while True:
+        params = {'sort': sort, 'limit': 7, **({'cursor': cursor} if cursor else {})}
+        data = client.get('/api/artworks', query_string=params).get_json()
+        seen += [art['id'] for art in data['artworks']]
+        cursor = data['next_cursor']
+        if not cursor:
+            break
+    assert sorted(seen) == sorted(set(seen)) and len(seen) == 30
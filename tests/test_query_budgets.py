@@ -0,0 +1,98 @@
+"""
+Every route with a @query_budget is requested under TESTING over a catalog big enough
+for an N+1 to show, so going over budget raises QueryBudgetExceeded and fails here
+"""
+import functools
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+import analytics
+from conftest import add_catalog, add_user, login
+from models import db
+from pagination import SORT_KEYS
+from query_profiler import QueryBudgetExceeded, query_budget
+
+CATALOG_SIZE = 60
+
+PUBLIC_ROUTES = [
+    '/home',
+    '/home?category=Pottery&sort=likes',
+    '/api/artworks',
+    '/api/artworks?state=Kerala&limit=50',
+    '/api/artworks?sort=price-high',
+    '/art/{art_id}',
+    '/search?q=pottery',
+    '/search?q=handmade piece',
+    '/api/search/suggest?q=po',
+]
+
+SELLER_ROUTES = [
+    '/seller/analytics',
+    '/api/seller/analytics/timeseries',
+    '/api/seller/analytics/timeseries?bucket=week&start=2024-01-01',
+]
+
+
+@pytest.fixture
+def catalog(app):
+    """A seller's catalog liked by several customers, with its analytics rollup built"""
+    with app.app_context():
+        seller = add_user('maker', role='seller')
+        likers = [add_user('shopper')] + [add_user(f'fan{i}') for i in range(1, 5)]
+        artworks = add_catalog(seller, CATALOG_SIZE, likers)
+        db.session.commit()
+        art_id = artworks[0].id
+        analytics.backfill()
+    return {'art_id': art_id}
+
+
+def get_ok(client, route, catalog):
+    response = client.get(route.format(**catalog))
+    assert response.status_code == 200, (route, response.status_code)
+    assert 'Server-Timing' in response.headers
+
+
+@pytest.mark.parametrize('route', PUBLIC_ROUTES)
+def test_public_route_anonymous(client, catalog, route):
+    get_ok(client, route, catalog)
+
+
+@pytest.mark.parametrize('route', PUBLIC_ROUTES)
+def test_public_route_customer(client, catalog, route):
+    login(client, 'shopper')
+    get_ok(client, route, catalog)
+
+
+@pytest.mark.parametrize('route', SELLER_ROUTES)
+def test_seller_route(client, catalog, route):
+    login(client, 'maker')
+    get_ok(client, route, catalog)
+
+
+def test_over_budget_raises(app, client, catalog, monkeypatch):
+    view = app.view_functions['api_artworks']
+    monkeypatch.setitem(app.view_functions, 'api_artworks', query_budget(0)(functools.wraps(view)(
+        lambda **view_args: view(**view_args))))
+
+    with pytest.raises(QueryBudgetExceeded, match='api_artworks ran'):
+        client.get('/api/artworks')
+
+
+def test_routes_use_real_sort_modes():
+    # An unknown sort silently falls back to the default one and budgets the wrong query
+    for route in PUBLIC_ROUTES:
+        if 'sort=' in route:
+            assert route.split('sort=')[1].split('&')[0] in SORT_KEYS, route
+
+
+def test_failed_statement_leaves_no_start_time_behind(app):
+    with app.test_request_context('/home'):
+        app.preprocess_request()
+        connection = db.session.connection()
+        with pytest.raises(OperationalError):
+            db.session.execute(text('SELECT * FROM no_such_table'))
+        assert connection.info.get('query_started') == []
+        db.session.rollback()
+        db.session.remove()
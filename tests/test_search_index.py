@@ -0,0 +1,57 @@
+"""
+A worker that cached the ILIKE fallback before the search table existed starts using
+the table once it appears, without a restart
+"""
+import pytest
+from sqlalchemy import text
+
+import search_index
+from conftest import add_catalog, add_user
+from models import db
+
+
+@pytest.fixture
+def backends(app, monkeypatch):
+    """A private backend cache; drops the search table (db.drop_all() doesn't know it)"""
+    monkeypatch.setattr(search_index, '_backends', {})
+    yield search_index._backends
+    with app.app_context():
+        db.session.execute(text('DROP TABLE IF EXISTS artwork_search'))
+        db.session.commit()
+
+
+def create_table_elsewhere():
+    """What `flask rebuild-search-index` does in another process: this one's cache is untouched"""
+    db.session.execute(text(
+        "CREATE VIRTUAL TABLE artwork_search USING fts5(title, artist_name, category, description)"))
+    db.session.commit()
+
+
+def search_rows():
+    return db.session.execute(text('SELECT rowid, title FROM artwork_search ORDER BY rowid')).all()
+
+
+def test_index_writes_recheck_a_cached_fallback(app, backends):
+    with app.app_context():
+        artwork, = add_catalog(add_user('maker', role='seller'), 1)
+        db.session.commit()
+        assert search_index.get_backend() == 'like'
+
+        create_table_elsewhere()
+        search_index.index_artwork(artwork)
+        db.session.commit()
+        assert search_rows() == [(artwork.id, artwork.title)]
+
+        search_index.remove_artwork(artwork.id)
+        db.session.commit()
+        assert search_rows() == []
+
+
+def test_searches_recheck_a_cached_fallback_after_the_interval(app, backends, monkeypatch):
+    with app.app_context():
+        assert search_index.get_backend() == 'like'
+        create_table_elsewhere()
+        assert search_index.get_backend() == 'like'  # within BACKEND_RECHECK_SECONDS
+
+        monkeypatch.setattr(search_index, 'BACKEND_RECHECK_SECONDS', 0)
+        assert search_index.get_backend() == 'fts5'
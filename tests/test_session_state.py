@@ -0,0 +1,46 @@
+"""
+A logged-in session follows the user row on every request: deleting or demoting the
+account takes effect immediately, not when a cached snapshot expires
+"""
+from conftest import add_user, login
+from models import db, User
+
+
+def test_role_change_applies_on_the_next_request(app, client):
+    with app.app_context():
+        add_user('shopper')
+        db.session.commit()
+    login(client, 'shopper')
+    assert client.get('/cart').status_code == 200
+
+    with app.app_context():
+        User.query.filter_by(username='shopper').update({User.role: 'seller'})
+        db.session.commit()
+    response = client.get('/cart')
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/seller/analytics')
+
+
+def test_deleted_user_is_logged_out(app, client):
+    with app.app_context():
+        add_user('shopper')
+        db.session.commit()
+    login(client, 'shopper')
+    assert client.get('/cart').status_code == 200
+
+    with app.app_context():
+        db.session.delete(User.query.filter_by(username='shopper').one())
+        db.session.commit()
+    response = client.get('/cart')
+    assert response.status_code == 302
+    assert '/login' in response.headers['Location']
+
+
+def test_cart_count_is_cached_in_the_session(app, client):
+    with app.app_context():
+        add_user('shopper')
+        db.session.commit()
+    login(client, 'shopper')
+    client.get('/orders')
+    with client.session_transaction() as session:
+        assert session['_cart_count']['count'] == 0
@@ -0,0 +1,48 @@
+"""
+Write-behind view counter for artwork pages
+Views are buffered in memory and flushed to Artwork.views in batched UPDATEs
+"""
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import update, bindparam
+from models import db, Artwork, ArtworkDailyStat
+from write_behind import WriteBehindBuffer
+
+
+class ViewCounter(WriteBehindBuffer):
+    """Buffers view increments per process (VIEW_FLUSH_INTERVAL / VIEW_FLUSH_THRESHOLD).
+    At most one flush interval (or one threshold's worth) of views is lost on a crash."""
+
+    config_prefix = 'VIEW'
+
+    def record(self, artwork_id):
+        """Count one view without touching the database"""
+        self.put(artwork_id)
+
+    def pending(self, artwork_id):
+        """Views recorded in this process but not yet written"""
+        return self._batch.get(artwork_id, 0)
+
+    def _new_batch(self):
+        return Counter()
+
+    def _append(self, batch, artwork_id):
+        batch[artwork_id] += 1
+
+    def _merge(self, batch, failed):
+        batch.update(failed)
+
+    def _write(self, batch):
+        stmt = update(Artwork).where(Artwork.id == bindparam('artwork_id')).values(
+            views=Artwork.views + bindparam('increment')
+        )
+        params = [{'artwork_id': artwork_id, 'increment': count} for artwork_id, count in batch.items()]
+        db.session.connection().execute(stmt, params)
+        
+        # Same transaction: today's rollup row gets the views too
+        today = datetime.utcnow().date()
+        ArtworkDailyStat.add_counts({(artwork_id, today): {'views': count} for artwork_id, count in batch.items()})
+        db.session.commit()
+
+
+view_counter = ViewCounter()
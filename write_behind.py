@@ -0,0 +1,102 @@
+"""
+Base class for in-memory write-behind buffers flushed by a background thread
+"""
+import atexit
+import os
+import threading
+
+
+class WriteBehindBuffer:
+    """Collects items in memory and hands them to _write() in batches.
+    A per-process daemon thread flushes every `<PREFIX>_FLUSH_INTERVAL` seconds, or early
+    once `<PREFIX>_FLUSH_THRESHOLD` items are pending; a final flush runs at exit.
+    Subclasses set config_prefix and implement _new_batch/_append/_merge/_write."""
+
+    config_prefix = None
+    default_interval = 5.0
+    default_threshold = 1000
+
+    def __init__(self, app=None):
+        self.app = None
+        self._lock = threading.Lock()
+        self._batch = self._new_batch()
+        self._size = 0
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault(f'{self.config_prefix}_FLUSH_INTERVAL', self.default_interval)
+        app.config.setdefault(f'{self.config_prefix}_FLUSH_THRESHOLD', self.default_threshold)
+        self.app = app
+        atexit.register(self.flush)
+
+    # ==================== SUBCLASS HOOKS ====================
+
+    def _new_batch(self):
+        """Return an empty batch container"""
+        raise NotImplementedError
+
+    def _append(self, batch, item):
+        """Add one item to a batch"""
+        raise NotImplementedError
+
+    def _merge(self, batch, failed):
+        """Fold a batch that failed to write back into the current one"""
+        raise NotImplementedError
+
+    def _write(self, batch):
+        """Persist a batch; runs inside an app context"""
+        raise NotImplementedError
+
+    # ==================== BUFFERING ====================
+
+    def put(self, item):
+        """Buffer one item without touching the database"""
+        with self._lock:
+            self._append(self._batch, item)
+            self._size += 1
+            over_threshold = self._size >= self.app.config[f'{self.config_prefix}_FLUSH_THRESHOLD']
+        self._ensure_flusher()
+        if over_threshold:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write everything buffered so far; returns the number of items written"""
+        with self._lock:
+            batch, size = self._batch, self._size
+            self._batch, self._size = self._new_batch(), 0
+        if not size:
+            return 0
+
+        try:
+            with self.app.app_context():
+                self._write(batch)
+        except Exception:
+            # Keep the items so the next flush retries them
+            with self._lock:
+                self._merge(self._batch, batch)
+                self._size += size
+            self.app.logger.exception(f'{type(self).__name__} flush failed')
+            return 0
+        return size
+
+    def _ensure_flusher(self):
+        # Threads don't survive a fork, so gunicorn workers each start their own
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=f'{self.config_prefix.lower()}-flush',
+                                            daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.app.config[f'{self.config_prefix}_FLUSH_INTERVAL'])
+            self._wakeup.clear()
+            self.flush()